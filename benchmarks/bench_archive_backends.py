@@ -0,0 +1,81 @@
+"""比较各压缩包后端在一个 main_assets 样本上的吞吐量与压缩率.
+
+用法: python benchmarks/bench_archive_backends.py <main_assets 目录> [--repeat N]
+
+对每个可用后端分别用 store / fast / max 以及压缩计划（按文件选择模式）压缩整个目录，
+输出耗时、MB/s 和压缩后大小占原始大小的比例. 压缩包写到临时目录，不修改样本.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from assetmanager.archive_backends import BACKENDS, ArchiveBackend
+from assetmanager.compression_planner import Mode, list_folder, plan_paths
+
+console = Console()
+
+
+def _run(
+    backend: ArchiveBackend, folder: Path, batches: list[tuple[Mode, list[str]]], repeat: int
+) -> tuple[float, int]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = Path(tmp) / f"bench{backend.suffix}"
+            start = time.perf_counter()
+            for mode, members in batches:
+                backend.update(archive, folder, members, mode)
+            best = min(best, time.perf_counter() - start)
+            size = archive.stat().st_size
+    return best, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最快的一次")
+    args = parser.parse_args()
+    folder: Path = args.folder.resolve()
+    files, _ = list_folder(folder)
+    names = [p.relative_to(folder).as_posix() for p in files]
+    total = sum(p.stat().st_size for p in files)
+    plan_start = time.perf_counter()
+    plan = plan_paths(folder, files)
+    plan_seconds = time.perf_counter() - plan_start
+    planned = [
+        (mode, [p.path.relative_to(folder).as_posix() for p in group])
+        for mode, group in plan.groups().items()
+    ]
+    console.print(
+        f"样本：{folder}，{len(files)} 个文件，{total / 1024 / 1024:.1f} MB；"
+        f"制定压缩计划耗时 {plan_seconds:.2f}s"
+    )
+
+    table = Table("后端", "模式", "耗时 (s)", "MB/s", "压缩后 (MB)", "比例")
+    for backend_cls in BACKENDS.values():
+        backend = backend_cls()
+        if not backend.available():
+            console.print(f"跳过不可用的后端：{backend.name}")
+            continue
+        variants = [(mode.value, [(mode, names)]) for mode in Mode] + [("planned", planned)]
+        for label, batches in variants:
+            seconds, size = _run(backend, folder, batches, args.repeat)
+            table.add_row(
+                backend.name,
+                label,
+                f"{seconds:.2f}",
+                f"{total / 1024 / 1024 / seconds:.1f}" if seconds > 0 else "-",
+                f"{size / 1024 / 1024:.1f}",
+                f"{size / max(total, 1):.1%}",
+            )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""比较 merge-images 的两种拼图方式：进程内 Pillow 与 ImageMagick.
+
+用法: python benchmarks/bench_montage.py <图片目录> [--limit N] [--repeat N] [--workers N]
+
+不使用缩略图缓存，每种方式重复若干次取最快的一次. 输出写到临时目录.
+没有安装 ImageMagick（magick、montage）时只测试 Pillow.
+"""
+
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from assetmanager.file_organizer import is_image_file
+from assetmanager.merge_images import create_thumbnail_montage
+
+console = Console()
+
+
+def _run(images: list[Path], engine: str, workers: int | None, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            output = create_thumbnail_montage(images, output_dir=tmp, engine=engine, workers=workers)
+            best = min(best, time.perf_counter() - start)
+            size = output.stat().st_size if output.exists() else 0
+    return best, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--limit", type=int, default=200, help="最多使用多少张图片")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式重复次数，取最快的一次")
+    parser.add_argument("--workers", type=int, default=None, help="Pillow 并行解码的线程数")
+    args = parser.parse_args()
+    images = sorted(p for p in args.folder.rglob("*") if is_image_file(str(p)))[: args.limit]
+    console.print(f"样本：{args.folder}，{len(images)} 张图片")
+
+    engines = ["pillow"]
+    if shutil.which("magick") and shutil.which("montage"):
+        engines.append("magick")
+    else:
+        console.print("未安装 ImageMagick，跳过 magick")
+    table = Table("方式", "耗时 (s)", "张/秒", "输出 (MB)")
+    for engine in engines:
+        seconds, size = _run(images, engine, args.workers, args.repeat)
+        table.add_row(engine, f"{seconds:.2f}", f"{len(images) / seconds:.1f}", f"{size / 1024 / 1024:.1f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""比较缩略图生成方式的单张耗时和峰值内存.
+
+用法: python benchmarks/bench_thumbnails.py <图片目录> [--size 512] [--limit N]
+
+- full: 完整解码后缩放
+- pil-thumbnail: 原来的 Image.thumbnail()
+- shared: assetmanager.thumbnails.load_thumbnail（draft / reduce 后缩放）
+
+每张图片在单独的子进程中处理，峰值内存为该进程处理前后 ru_maxrss 的差
+（Windows 上没有 resource 模块，只输出耗时）.
+"""
+
+import argparse
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from statistics import median
+
+from PIL import Image
+from rich.console import Console
+from rich.table import Table
+
+from assetmanager.file_organizer import is_image_file
+from assetmanager.thumbnails import fit_size, load_thumbnail
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+console = Console()
+
+
+def _full(path: Path, size: int) -> None:
+    with Image.open(path) as img:
+        img.load()
+        img.resize(fit_size(img.size, size), Image.Resampling.LANCZOS)
+
+
+def _pil_thumbnail(path: Path, size: int) -> None:
+    with Image.open(path) as img:
+        img.thumbnail(fit_size(img.size, size))
+
+
+def _shared(path: Path, size: int) -> None:
+    load_thumbnail(path, size)
+
+
+METHODS: dict[str, Callable[[Path, int], None]] = {
+    "full": _full,
+    "pil-thumbnail": _pil_thumbnail,
+    "shared": _shared,
+}
+
+
+def _peak_rss() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(method: str, path: Path, size: int) -> tuple[float, int] | None:
+    before = _peak_rss()
+    start = time.perf_counter()
+    try:
+        METHODS[method](path, size)
+    except (OSError, ValueError):
+        # 例如 Image.thumbnail() 不支持 16 位灰度
+        return None
+    return time.perf_counter() - start, _peak_rss() - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--limit", type=int, default=50, help="最多测试多少张图片")
+    args = parser.parse_args()
+    images = sorted(p for p in args.folder.rglob("*") if is_image_file(str(p)))[: args.limit]
+    console.print(f"样本：{args.folder}，{len(images)} 张图片，缩略图长边 {args.size}")
+
+    table = Table("方式", "单张耗时中位数 (ms)", "总耗时 (s)", "峰值内存中位数 (MB)", "峰值内存最大 (MB)", "失败")
+    for method in METHODS:
+        results = []
+        failed = 0
+        for path in images:
+            # 每张图片一个新进程，ru_maxrss 不受之前图片的影响
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(_measure, method, path, args.size).result()
+            if result is None:
+                failed += 1
+            else:
+                results.append(result)
+        if not results:
+            table.add_row(method, "-", "-", "-", "-", str(failed))
+            continue
+        seconds = [r[0] for r in results]
+        peaks = [r[1] / 1024 / 1024 for r in results]
+        table.add_row(
+            method,
+            f"{median(seconds) * 1000:.1f}",
+            f"{sum(seconds):.2f}",
+            f"{median(peaks):.1f}" if resource else "-",
+            f"{max(peaks):.1f}" if resource else "-",
+            str(failed),
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
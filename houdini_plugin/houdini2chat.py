@@ -6,10 +6,11 @@
 import hou
 from pathlib import Path
 import requests
-from typing import List, Optional
+from typing import Iterator, Optional
 
 BASE_URL = "http://localhost:41595/api"
 LIBRARY_PATH = Path(r"F:\eagle_librarys\Illusion.library\images")
+PAGE_SIZE = 1000
 HDA_PATH = Path(r"D:\scoop\apps\houdini2chat\current\sop_rendermagix.houdini_2_chat.0.1.0.hdalc")
 
 prompt = """Example Prompts:
@@ -26,22 +27,31 @@ def log(msg: str):
     print(msg)
 
 
-def safe_request(url: str, params: dict):
-    try:
-        resp = requests.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get("status") == "success":
-            return data.get("data", [])
-        log(f"❌ API 返回错误: {data}")
-        return []
-    except Exception as e:
-        log(f"❌ 请求失败: {e}")
-        return []
+def list_items_in_folder(folder_id: str) -> Iterator[dict]:
+    """逐页产出文件夹中的全部项目，请求失败时记录错误并停止.
 
-
-def list_items_in_folder(folder_id: str) -> List[dict]:
-    return safe_request(f"{BASE_URL}/item/list", {"folders": folder_id, "limit": 10000, "offset": 0})
+    hython 自带的 Python 里通常没有安装 assetmanager，所以这里不用 EagleClient，
+    只依赖 requests：复用一个 Session，按页码（Eagle 的 offset）顺序翻页.
+    """
+    with requests.Session() as session:
+        page = 0
+        while True:
+            params = {"folders": folder_id, "limit": PAGE_SIZE, "offset": page}
+            try:
+                resp = session.get(f"{BASE_URL}/item/list", params=params, timeout=30)
+                resp.raise_for_status()
+                data = resp.json()
+            except (requests.RequestException, ValueError) as e:
+                log(f"❌ 请求失败: {e}")
+                return
+            if data.get("status") != "success":
+                log(f"❌ API 返回错误: {data}")
+                return
+            items = data.get("data", [])
+            yield from items
+            if len(items) < PAGE_SIZE:
+                return
+            page += 1
 
 
 def load_hip_file(hip_path: Path) -> bool:
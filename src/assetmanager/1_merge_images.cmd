@@ -1,5 +1,5 @@
 @REM Quick montage for thumbnails
-@REM Need ImageMagick: scoop install main/ImageMagick
+@REM ImageMagick is optional (--engine magick): scoop install main/ImageMagick
 
 @echo off
 setlocal
@@ -0,0 +1,228 @@
+"""压缩包后端：compress 与 set-private-images 共用.
+
+- SevenZipBackend: 调用外部 7z，压缩率最好，支持多线程
+- ZipBackend: 进程内 zipfile，不需要安装 7-Zip，也没有每次启动子进程的开销
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from .archive_listing import Member, list_7z
+from .compression_planner import Mode
+
+COPY_BUFFER = 1024 * 1024
+# 7z u 的更新规则：压缩包中已有但这次没列出的条目保留，列出的文件总是重新压缩
+UPDATE_SWITCH = "-up1q1r2x2y2z2w2"
+
+
+class ArchiveError(RuntimeError):
+    """写入或读取压缩包失败."""
+
+
+class ArchiveBackend(ABC):
+    """压缩包后端接口. members 为相对 folder 的 posix 路径.
+
+    缺少任何一个抽象方法的子类在实例化时就会报错，不会等到压缩途中才发现.
+    """
+
+    name = ""
+    suffix = ""
+    # 单个压缩任务能否利用多个线程，决定调度时给它分几个槽位
+    multithreaded = False
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def update(
+        self,
+        archive: Path,
+        folder: Path,
+        members: list[str],
+        mode: Mode,
+        *,
+        solid: bool = False,
+        threads: int | None = None,
+    ) -> None:
+        """把 members 加入 archive（已存在的同名条目被替换，其它条目保留）；失败抛出 ArchiveError."""
+
+    @abstractmethod
+    def read(self, archive: Path, name: str) -> bytes | None:
+        """读取单个条目，不存在时返回 None."""
+
+    @abstractmethod
+    def members(self, archive: Path) -> list[Member]:
+        """列出条目（含 CRC），不解压."""
+
+    @abstractmethod
+    def test(self, archive: Path) -> str | None:
+        """流式解压并检查每个条目的 CRC，返回错误信息；通过返回 None."""
+
+
+class SevenZipBackend(ArchiveBackend):
+    name = "7z"
+    suffix = ".7z"
+    multithreaded = True
+    MODES = {Mode.STORE: ["-mx=0"], Mode.FAST: ["-mx=1"], Mode.MAX: ["-mx=9"]}
+
+    def available(self) -> bool:
+        return shutil.which("7z") is not None
+
+    def update(
+        self,
+        archive: Path,
+        folder: Path,
+        members: list[str],
+        mode: Mode,
+        *,
+        solid: bool = False,
+        threads: int | None = None,
+    ) -> None:
+        args = [*self.MODES[mode], "-ms=on" if solid else "-ms=off"]
+        if threads is not None:
+            args.append(f"-mmt={threads}")
+        # 在 folder 中运行并传相对路径，压缩包内保留子目录结构；文件列表写入临时文件，避免命令行过长
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt", delete=False) as f:
+            f.write("\n".join(members))
+        try:
+            result = subprocess.run(
+                ["7z", "u", str(archive), f"@{f.name}", "-scsUTF-8", UPDATE_SWITCH, *args],
+                cwd=folder,
+                check=False,
+                capture_output=True,
+                text=True,
+                errors="replace",
+            )
+        finally:
+            os.unlink(f.name)
+        if result.returncode != 0:
+            raise ArchiveError(result.stderr.strip())
+
+    def read(self, archive: Path, name: str) -> bytes | None:
+        result = subprocess.run(["7z", "e", "-so", str(archive), name], check=False, capture_output=True)
+        return result.stdout if result.returncode == 0 and result.stdout else None
+
+    def members(self, archive: Path) -> list[Member]:
+        try:
+            return list_7z(archive)
+        except subprocess.CalledProcessError as e:
+            raise ArchiveError(f"无法读取压缩包列表：{archive}") from e
+
+    def test(self, archive: Path) -> str | None:
+        result = subprocess.run(
+            ["7z", "t", str(archive)], check=False, capture_output=True, text=True, errors="replace"
+        )
+        if result.returncode != 0:
+            return result.stderr.strip() or result.stdout.strip() or "7z t 失败"
+        return None
+
+
+class ZipBackend(ArchiveBackend):
+    """进程内 zip. max 用 deflate 9 而不是 LZMA，保证系统自带的解压工具也能打开."""
+
+    name = "zip"
+    suffix = ".zip"
+    MODES = {
+        Mode.STORE: (zipfile.ZIP_STORED, None),
+        Mode.FAST: (zipfile.ZIP_DEFLATED, 1),
+        Mode.MAX: (zipfile.ZIP_DEFLATED, 9),
+    }
+
+    def update(
+        self,
+        archive: Path,
+        folder: Path,
+        members: list[str],
+        mode: Mode,
+        *,
+        solid: bool = False,
+        threads: int | None = None,
+    ) -> None:
+        # zip 没有固实压缩，也是单线程，忽略 solid/threads
+        method, level = self.MODES[mode]
+        # 先写临时文件再改名替换，中途失败或中断时原压缩包保持完整
+        tmp = archive.with_name(f"{archive.name}.tmp")
+        try:
+            replaced = set(members)
+            existing = set()
+            if archive.exists():
+                with zipfile.ZipFile(archive) as zf:
+                    existing = {name.rstrip("/") for name in zf.namelist()}
+            if existing & replaced:
+                self._rewrite(archive, tmp, replaced)
+            elif existing:
+                shutil.copyfile(archive, tmp)
+            with zipfile.ZipFile(tmp, "a" if existing else "w") as zf:
+                for name in members:
+                    path = folder / name
+                    if path.is_dir():
+                        zf.mkdir(name)
+                    else:
+                        zf.write(path, name, compress_type=method, compresslevel=level)
+            os.replace(tmp, archive)
+        except (OSError, zipfile.BadZipFile) as e:
+            raise ArchiveError(str(e)) from e
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    @staticmethod
+    def _rewrite(archive: Path, tmp: Path, dropped: set[str]) -> None:
+        # zip 不能原地替换条目：把其余条目按原压缩方式写入新文件
+        with zipfile.ZipFile(archive) as old, zipfile.ZipFile(tmp, "w") as new:
+            for info in old.infolist():
+                if info.filename.rstrip("/") in dropped:
+                    continue
+                if info.is_dir():
+                    new.mkdir(info)
+                    continue
+                with old.open(info) as src, new.open(info, "w") as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER)
+
+    def read(self, archive: Path, name: str) -> bytes | None:
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                return zf.read(name)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return None
+
+    def members(self, archive: Path) -> list[Member]:
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                return [
+                    Member(i.filename.rstrip("/"), i.file_size, i.is_dir(), f"{i.CRC:08X}")
+                    for i in zf.infolist()
+                ]
+        except (OSError, zipfile.BadZipFile) as e:
+            raise ArchiveError(str(e)) from e
+
+    def test(self, archive: Path) -> str | None:
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                bad = zf.testzip()
+        except (OSError, zipfile.BadZipFile) as e:
+            return str(e)
+        return f"CRC 错误：{bad}" if bad is not None else None
+
+
+BACKENDS: dict[str, type[ArchiveBackend]] = {b.name: b for b in (SevenZipBackend, ZipBackend)}
+
+
+def get_backend(name: str | None = None) -> ArchiveBackend:
+    """按名字取后端；None 表示自动选择：装了 7z 就用 7z，否则用进程内 zip."""
+    if name is not None:
+        return BACKENDS[name]()
+    seven_zip = SevenZipBackend()
+    return seven_zip if seven_zip.available() else ZipBackend()
+
+
+def backend_for(archive: Path) -> ArchiveBackend:
+    """已有的压缩包按扩展名选择后端."""
+    for backend in BACKENDS.values():
+        if archive.suffix.lower() == backend.suffix:
+            return backend()
+    raise ArchiveError(f"不支持的压缩包格式：{archive}")
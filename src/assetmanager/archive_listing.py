@@ -0,0 +1,133 @@
+"""压缩包目录预读：只读取 zip 中央目录 / `7z l` 列表，并按 (路径, 大小, mtime) 缓存."""
+
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import zipfile
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from rich.console import Console
+
+from .cache import cache_dir
+from .structure_validator import DEFAULT_JUNK_RULES, JunkRules
+
+console = Console()
+
+
+@dataclass
+class Member:
+    name: str
+    size: int
+    is_dir: bool
+    # 7z 列表中的 CRC32（大写十六进制）；zip 列表和缓存中不保存
+    crc: str | None = None
+
+
+@dataclass
+class ArchiveListing:
+    archive: Path
+    members: list[Member]
+
+    def unpacked_size(self, rules: JunkRules = DEFAULT_JUNK_RULES) -> int:
+        """解压后的大小（不含会被过滤掉的无用条目）."""
+        return sum(m.size for m in self.members if not rules.is_junk_member(m.name))
+
+    def only_junk(self, rules: JunkRules = DEFAULT_JUNK_RULES) -> bool:
+        """只包含 __MACOSX/.DS_Store 之类的无用条目（目录条目不计）."""
+        files = [m for m in self.members if not m.is_dir]
+        return bool(files) and all(rules.is_junk_member(m.name) for m in files)
+
+
+def member_name(info: zipfile.ZipInfo) -> str:
+    # 未设置 UTF-8 标志的文件名按 cp437 解码，中文 Windows 打包的 zip 实际是 GBK
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("gbk")
+    except UnicodeError:
+        return info.filename
+
+
+def list_zip(path: Path) -> list[Member]:
+    with zipfile.ZipFile(path) as zf:
+        return [Member(member_name(i), i.file_size, i.is_dir()) for i in zf.infolist()]
+
+
+def list_7z(path: Path) -> list[Member]:
+    result = subprocess.run(
+        ["7z", "l", "-slt", "-sccUTF-8", str(path)],
+        check=True,
+        capture_output=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    # 分隔线之前是压缩包自身的信息，之后每个空行分隔的块是一个条目
+    _, _, body = result.stdout.partition("\n----------\n")
+    members = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(" = ", 1) for line in block.splitlines() if " = " in line)
+        if "Path" not in fields:
+            continue
+        is_dir = fields.get("Folder") == "+" or fields.get("Attributes", "").startswith("D")
+        size = int(fields.get("Size") or 0)
+        members.append(Member(fields["Path"], size, is_dir, fields.get("CRC") or None))
+    return members
+
+
+class ListingCache:
+    """按 (路径, 大小, mtime) 缓存压缩包的条目列表，可在多线程中共用."""
+
+    def __init__(self, db_path: Path | None = None) -> None:
+        self.db = sqlite3.connect(db_path or cache_dir() / "listings.sqlite", check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " members TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.commit()
+            self.db.close()
+
+    def get(self, path: Path) -> ArchiveListing:
+        st = path.stat()
+        key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            row = self.db.execute(
+                "SELECT members FROM listings WHERE path = ? AND size = ? AND mtime_ns = ?", key
+            ).fetchone()
+        if row is not None:
+            return ArchiveListing(path, [Member(*m) for m in json.loads(row[0])])
+        members = list_zip(path) if path.suffix.lower() == ".zip" else list_7z(path)
+        encoded = json.dumps([[m.name, m.size, m.is_dir] for m in members], ensure_ascii=False)
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)", (*key, encoded))
+            self.db.commit()
+        return ArchiveListing(path, members)
+
+
+def list_archives(
+    archives: Iterable[Path], cache: ListingCache, workers: int | None = None
+) -> dict[Path, ArchiveListing]:
+    """并行读取压缩包列表；读取失败（损坏、不支持）的压缩包不在结果中."""
+
+    def read(path: Path) -> ArchiveListing | None:
+        try:
+            return cache.get(path)
+        except (OSError, zipfile.BadZipFile, subprocess.CalledProcessError) as e:
+            console.print(f"⚠️ 无法读取压缩包列表: {path} - {e}")
+            return None
+
+    archives = list(archives)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        listings = pool.map(read, archives)
+    return {a: listing for a, listing in zip(archives, listings, strict=True) if listing}
@@ -0,0 +1,84 @@
+"""压缩包清单：记录 main_assets 压缩包中各条目的大小和哈希，用于增量更新.
+
+清单作为一个条目写在压缩包内（而不是旁边的文件），main_assets 中仍然只有一个压缩包.
+"""
+
+import hashlib
+import json
+import zlib
+from pathlib import Path
+from typing import Any
+
+from .archive_backends import ArchiveBackend, ArchiveError
+
+MANIFEST_NAME = ".assetmanager-manifest.json"
+MANIFEST_VERSION = 1
+HASH_ALGORITHM = "sha256"
+READ_BUFFER = 1024 * 1024
+
+Entry = dict[str, Any]
+
+
+def file_entry(path: Path) -> Entry:
+    """读一遍文件，同时计算 SHA-256（判断是否变化）和 CRC32（与 7z 记录的 CRC 对比）."""
+    digest = hashlib.new(HASH_ALGORITHM)
+    crc = 0
+    size = 0
+    with path.open("rb") as f:
+        while chunk := f.read(READ_BUFFER):
+            digest.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+    return {"size": size, HASH_ALGORITHM: digest.hexdigest(), "crc32": f"{crc:08X}"}
+
+
+def read_manifest(archive: Path, backend: ArchiveBackend) -> dict[str, Entry]:
+    """读取压缩包内的清单；没有清单的旧压缩包返回空字典（所有文件都视为有变化）."""
+    data = backend.read(archive, MANIFEST_NAME)
+    if data:
+        try:
+            members: dict[str, Entry] = json.loads(data)["members"]
+        except (ValueError, KeyError):
+            pass
+        else:
+            return members
+    return {}
+
+
+def is_unchanged(entry: Entry | None, current: Entry) -> bool:
+    if entry is None:
+        return False
+    return bool(entry["size"] == current["size"] and entry[HASH_ALGORITHM] == current[HASH_ALGORITHM])
+
+
+def write_manifest(path: Path, members: dict[str, Entry]) -> None:
+    data = {"version": MANIFEST_VERSION, "members": dict(sorted(members.items()))}
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+def verify_archive(archive: Path, backend: ArchiveBackend) -> list[str]:
+    """校验压缩包，返回发现的问题（为空表示通过）.
+
+    先流式解压检查完整性（如 7z t，不读原始文件），再把压缩包记录的各条目 CRC 与
+    压缩时读取原始文件算出的 CRC（清单中）对比.
+    """
+    error = backend.test(archive)
+    if error is not None:
+        return [f"完整性检查失败：{error}"]
+    manifest = read_manifest(archive, backend)
+    if not manifest:
+        return ["压缩包中没有清单"]
+    try:
+        listed = {m.name.replace("\\", "/"): m for m in backend.members(archive) if not m.is_dir}
+    except ArchiveError as e:
+        return [str(e)]
+    problems = []
+    for name, entry in manifest.items():
+        member = listed.get(name)
+        if member is None:
+            problems.append(f"缺少条目：{name}")
+        elif member.size != entry["size"]:
+            problems.append(f"大小不一致：{name}")
+        elif "crc32" in entry and (member.crc or "00000000") != entry["crc32"]:
+            problems.append(f"CRC 不一致：{name}")
+    return problems
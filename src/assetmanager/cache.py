@@ -0,0 +1,25 @@
+"""本地缓存目录（索引、哈希等持久化数据）."""
+
+import hashlib
+import os
+from pathlib import Path
+
+
+def cache_dir() -> Path:
+    """返回缓存目录，可用环境变量 ASSETMANAGER_CACHE_DIR 覆盖."""
+    override = os.environ.get("ASSETMANAGER_CACHE_DIR")
+    if override:
+        path = Path(override)
+    elif os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        path = Path(os.environ["LOCALAPPDATA"]) / "assetmanager"
+    else:
+        path = Path.home() / ".cache" / "assetmanager"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def cache_file(kind: str, root: Path, suffix: str = ".sqlite") -> Path:
+    """按根目录生成缓存文件路径，避免在素材库中写入额外文件."""
+    raw = str(Path(root).resolve()).encode("utf-8")
+    key = hashlib.sha1(raw, usedforsecurity=False).hexdigest()[:16]
+    return cache_dir() / f"{kind}-{key}{suffix}"
@@ -1,81 +1,162 @@
 """AssetManager CLI."""
 
+import json
+import sys
+from enum import Enum
+
 import typer
 from rich.console import Console
 from pathlib import Path
-from .file_organizer import organize_files
+from .file_organizer import organize_files, organize_paths, organize_root, organize_tree, read_path_list
+from .move_plan import MovePlan, MovePlanError, recover, report, run_plan
 from .structure_validator import (
-    validate_structure, fix_duplicate_named_dirs, delete_useless_files_and_dirs, delete_empty_dirs
+    validate_structure, group_findings, fix_duplicate_named_dirs, delete_useless_files_and_dirs,
+    delete_empty_dirs, DEFAULT_JUNK_RULES, JunkRules
 )
+from .tree_snapshot import TreeSnapshot
+from .tree_index import TreeIndex
+from .dedup import find_duplicates, link_duplicates
+from .extractor import InsufficientSpaceError, extract_all
+from .scheduler import parse_size
 from .compressor import process as compress_main_assets
+from .archive_backends import ArchiveBackend, get_backend
+from .thumbnail_cache import ThumbnailCache
 from .eagle_api import list_items_in_folder, check_item_files, TRASH_FOLDER_ID
 from pathlib import Path
-from PIL import Image
-import subprocess
 
 console = Console()
+err_console = Console(stderr=True)
 app = typer.Typer()
 
+
+def _check_size(value: str | None) -> str | None:
+    """大小参数（如 2G、512M）在解析命令行时就校验，格式不对时给出用法错误."""
+    try:
+        parse_size(value)
+    except ValueError as e:
+        raise typer.BadParameter(str(e)) from None
+    return value
+
+
+WORKERS_OPTION = typer.Option(1, "--workers", min=1, help="并行列目录的线程数，网络共享盘上可适当调大")
+JOBS_OPTION = typer.Option(None, "--jobs", min=1, help="同时运行的任务数上限（CPU 密集与 I/O 密集任务分别计数）")
+IO_LIMIT_OPTION = typer.Option(None, "--io-limit", callback=_check_size, help="每个磁盘同时处理的数据量上限，如 2G、512M")
+JUNK_OPTION = typer.Option(None, "--junk", help="额外视为无用的文件/目录名，可多次指定，支持通配符")
+DRY_RUN_OPTION = typer.Option(False, "--dry-run", help="只打印移动计划，不修改任何文件")
+ROLLBACK_OPTION = typer.Option(False, "--rollback", help="撤销上次中断的移动计划中已完成的操作")
+THUMBNAIL_CACHE_OPTION = typer.Option("1G", "--thumbnail-cache", callback=_check_size, help="缩略图缓存的容量上限，如 1G、512M；0 表示不使用缓存")
+
+
+class BackendName(str, Enum):
+    auto = "auto"
+    seven_zip = "7z"
+    zip = "zip"
+
+
+BACKEND_OPTION = typer.Option(
+    BackendName.auto, "--backend", help="压缩后端：7z（外部程序）、zip（进程内）；auto 表示装了 7z 就用 7z"
+)
+
+
+class MontageEngine(str, Enum):
+    pillow = "pillow"
+    magick = "magick"
+
+
+class MontageLayout(str, Enum):
+    single = "single"
+    pages = "pages"
+    dzi = "dzi"
+
 @app.command()
-def extract(path: str) -> None:
-    """多轮解压目录中的所有压缩文件，并在最后整理."""
-    from .structure_validator import delete_useless_files_and_dirs, fix_duplicate_named_dirs, delete_empty_dirs
-    import os, concurrent.futures, subprocess
-    from pathlib import Path
-    COMPRESS_EXTENSIONS = {".zip", ".7z", ".rar"}
-    def _find_archive_files(path: Path):
-        return [f for f in path.rglob("*") if f.is_file() and f.suffix.lower() in COMPRESS_EXTENSIONS]
-    def extract_file(file: Path):
-        out_dir = file.with_name(file.stem)
-        if not out_dir.exists():
-            out_dir.mkdir(parents=True)
-        try:
-            result = subprocess.run([
-                "7z", "x", "-y", str(file), f"-o{out_dir!s}"],
-                check=False, capture_output=True, text=True)
-            if result.returncode == 0:
-                console.print(f"✅ 解压完成: {file.name}")
-                file.unlink()
-                console.print(f"🗑️ 已删除压缩包: {file}")
-            else:
-                console.print(f"❌ 解压失败: {file}")
-                console.print(result.stderr)
-        except Exception as e:
-            console.print(f"❌ 异常解压: {file} - {e}")
-    def _extract_round(path: Path) -> int:
-        archive_files = _find_archive_files(path)
-        if not archive_files:
-            return 0
-        console.print(f"共找到 {len(archive_files)} 个压缩包，开始多线程解压...")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            list(executor.map(extract_file, archive_files))
-        return len(archive_files)
-    target = Path(path)
+def extract(
+    path: str,
+    jobs: int | None = JOBS_OPTION,
+    io_limit: str | None = IO_LIMIT_OPTION,
+    force: bool = typer.Option(False, "--force", help="预计磁盘空间不足时仍然解压"),
+    junk: list[str] | None = JUNK_OPTION,
+) -> None:
+    """解压目录中的所有压缩文件（含嵌套），并在最后整理.
+
+    任务按压缩包大小从大到小调度，并输出每个任务的吞吐量.
+    解压前先读取各压缩包的文件列表：只含 __MACOSX/.DS_Store 等无用文件的压缩包直接删除，
+    并根据解压后大小检查磁盘空间.
+    无用文件在解压时就被过滤（规则与 arrange 的清理步骤相同），因此解压后不再执行清理步骤.
+    """
+    rules = DEFAULT_JUNK_RULES.extended(junk)
     console.print("📦 开始批量解压...")
-    total_round = 0
-    total_archives = 0
-    while True:
-        extracted = _extract_round(target)
-        if extracted == 0:
-            break
-        total_round += 1
-        total_archives += extracted
-    console.print(f"📦 解压完成，共 {total_round} 轮，处理压缩包 {total_archives} 个")
-    arrange(path)
+    try:
+        total_archives, max_depth = extract_all(
+            Path(path), jobs, parse_size(io_limit), rules, force=force
+        )
+    except InsufficientSpaceError as e:
+        console.print(f"❌ {e}")
+        raise typer.Exit(1) from e
+    console.print(f"📦 解压完成，处理压缩包 {total_archives} 个，最大嵌套 {max_depth} 层")
+    _arrange(Path(path), workers=1, rules=rules, cleanup=False)
 
 @app.command()
-def arrange(path: str) -> None:
-    """整理目录."""
-    path_ = Path(path)
-    console.print("🧹 开始清理无用文件...")
-    delete_useless_files_and_dirs(path_)
+def arrange(
+    path: str,
+    workers: int = WORKERS_OPTION,
+    junk: list[str] | None = JUNK_OPTION,
+    dry_run: bool = DRY_RUN_OPTION,
+    rollback: bool = ROLLBACK_OPTION,
+) -> None:
+    """整理目录.
+
+    先生成完整的移动/删除计划再执行；中断后再次运行会继续执行，加 --rollback 撤销.
+    """
+    if _recover(Path(path), rollback):
+        return
+    _arrange(Path(path), workers, DEFAULT_JUNK_RULES.extended(junk), dry_run=dry_run)
+
+
+def _arrange(
+    path_: Path, workers: int, rules: JunkRules, *, cleanup: bool = True, dry_run: bool = False
+) -> None:
+    # 只遍历一次目录树，后续步骤在快照上生成计划，不修改磁盘
+    snapshot = TreeSnapshot(path_, workers)
+    plan = MovePlan()
+    if cleanup:
+        console.print("🧹 开始清理无用文件...")
+        delete_useless_files_and_dirs(path_, snapshot, rules, plan)
     console.print("📁 合并重复目录...")
-    fix_duplicate_named_dirs(path_)
-    delete_empty_dirs(path_)
-    console.print("✅ 所有操作已完成")
+    fix_duplicate_named_dirs(path_, snapshot, plan)
+    delete_empty_dirs(path_, snapshot, plan)
+    try:
+        result = run_plan(plan, path_, dry_run=dry_run)
+    except MovePlanError as e:
+        console.print(f"❌ 计划中有冲突，未做任何修改：\n{e}")
+        raise typer.Exit(1) from e
+    if result is not None:
+        report(result)
+        if result.complete:
+            console.print("✅ 所有操作已完成")
+
+
+def _recover(root: Path, rollback: bool) -> bool:
+    """处理 root 上次中断的移动计划，返回 True 表示本次不再继续."""
+    result = recover(root, rollback=rollback)
+    if result is None:
+        if rollback:
+            console.print("没有需要撤销的移动计划")
+        return rollback
+    console.print("↩️ 已撤销上次中断的操作" if rollback else "♻️ 已继续执行上次中断的操作")
+    report(result)
+    return True
 
 @app.command()
-def categorize(paths: list[Path] = typer.Argument(None)) -> None:
+def categorize(
+    paths: list[Path] = typer.Argument(None),
+    recursive: bool = typer.Option(False, "--recursive", "-r", help="文件夹模式下同时整理所有子目录"),
+    from_file: str | None = typer.Option(None, "--from-file", help="从列表文件读取要整理的文件（- 为标准输入），每项以 NUL 或换行分隔"),
+    root: Path | None = typer.Option(None, "--root", help="--from-file 时移动计划的根目录（中断后按它继续或撤销）；默认为列表文件所在目录，标准输入时为当前目录"),
+    workers: int = WORKERS_OPTION,
+    strip_suffix: list[str] | None = typer.Option(None, "--strip-suffix", help="分组时忽略的文件名后缀，可多次指定；默认 _preview、_thumbnail"),
+    dry_run: bool = DRY_RUN_OPTION,
+    rollback: bool = ROLLBACK_OPTION,
+) -> None:
     r"""用于快速将素材分类到 main_assets 和 thumbnail 目录中.
 
     被 categorization.bat 调用 接收单个文件/多个文件/单个文件夹
@@ -99,21 +180,67 @@ def categorize(paths: list[Path] = typer.Argument(None)) -> None:
     3.在每个新目录中创建main_assets和thumbnails两个目录
     4.将每个分组中的图片文件移动到thumbnails目录中，将其他文件移动到main_assets目录中
 
-    当接收单个文件夹时：
-    将文件夹中的所有文件视为多文件处理，主要是为了绕开windows向.cmd文件传递参数长度有限制的问题
+    当接收文件夹时：
+    每个文件夹中的文件按多文件处理（分组只在同一目录内进行），--recursive 时包括所有子目录，
+    已含 main_assets 等目录的文件夹视为已整理，跳过.
+
+    分组时文件名忽略大小写、Unicode 规范化形式（NFC/NFD）和 --strip-suffix 指定的后缀，
+    因此 Rock.PNG、rock_preview.png 与 rock.zprj 归为一组；这样合并的分组会逐个列出原因.
+
+    文件很多时用 --from-file 传入列表（如 find -print0 的输出），不受命令行长度限制；
+    列表边读边执行，不会整个读入内存.
+
+    所有移动先生成计划，校验没有冲突后才执行. --dry-run 只打印计划；
+    中断后再次运行会继续执行，加 --rollback 撤销.
     """
     selected = paths if paths is not None else []
-    dirs = [p for p in selected if p.is_dir()]
-    files = [p for p in selected if p.is_file()]
-    if dirs and not files:
-        dir_path = Path(dirs[0])
-        files_in_dir = [str(p) for p in dir_path.iterdir() if p.is_file()]
-        organize_files(selected_items=files_in_dir)
+    if from_file is not None:
+        if root is None:
+            root = Path.cwd() if from_file == "-" else Path(from_file).resolve().parent
+        roots = [root]
+    elif selected:
+        dirs = [p for p in selected if p.is_dir()]
+        files = [p for p in selected if p.is_file()]
+        roots = dirs if dirs and not files else [organize_root([str(p) for p in selected])]
     else:
-        organize_files(selected_items=[str(p) for p in files])
+        return
+    recovered = [_recover(root, rollback) for root in roots]
+    if any(recovered):
+        return
+    try:
+        if from_file is not None:
+            organize_paths(
+                read_path_list(from_file), roots[0], dry_run=dry_run, strip_suffixes=strip_suffix
+            )
+        elif dirs and not files:
+            for dir_path in dirs:
+                organize_tree(
+                    dir_path,
+                    recursive=recursive,
+                    workers=workers,
+                    dry_run=dry_run,
+                    strip_suffixes=strip_suffix,
+                )
+        else:
+            organize_files(
+                selected_items=[str(p) for p in files], dry_run=dry_run, strip_suffixes=strip_suffix
+            )
+    except MovePlanError as e:
+        console.print(f"❌ 计划中有冲突，未做任何修改：\n{e}")
+        raise typer.Exit(1) from e
+
+class ReportFormat(str, Enum):
+    text = "text"
+    jsonl = "jsonl"
+
 
 @app.command()
-def validate(path: str) -> None:
+def validate(
+    path: str,
+    incremental: bool = typer.Option(False, "--incremental", help="使用持久化索引，只重新扫描 mtime 变化的目录"),
+    workers: int = WORKERS_OPTION,
+    report_format: ReportFormat = typer.Option(ReportFormat.text, "--format", help="text: 汇总后输出；jsonl: 每发现一个问题立即输出一行 JSON"),
+) -> None:
     """
     验证目录结构并按问题类型分类返回.
 
@@ -128,21 +255,83 @@ def validate(path: str) -> None:
       - thumbnail 仅允许 1 个文件
       - main_assets_others 可选且可包含多个文件
     返回：问题分类到目录列表的映射
+
+    --incremental: 记录每个目录的 mtime、子目录和验证结果，下次只重新列出发生变化的目录
+    --format jsonl: 每行一个 {"category": ..., "path": ...}，边遍历边输出，内存占用不随问题数增长
     """
 
     root = Path(path)
     VIDEO_EXTENSIONS = {".mp4", ".srt", ".mkv", ".avi", ".mov", ".wmv", ".flv", ".webm"}
     videos = [f for f in root.iterdir() if f.suffix.lower() in VIDEO_EXTENSIONS]
-    for video in videos:
-        console.print(f"❌ 目录中存在视频文件: {video}")
-    report = validate_structure(root)
-    console.print(report)
+    index = TreeIndex(root) if incremental else None
+    findings = index.validate(workers) if index else validate_structure(root, workers=workers)
+    try:
+        if report_format is ReportFormat.jsonl:
+            for video in videos:
+                _write_jsonl("video_in_root", video)
+            for category, folder in findings:
+                _write_jsonl(category, folder)
+        else:
+            for video in videos:
+                console.print(f"❌ 目录中存在视频文件: {video}")
+            console.print(group_findings(findings))
+    finally:
+        if index:
+            index.close()
+            err_console.print(f"📇 索引复用 {index.reused} 个目录，重新扫描 {index.rescanned} 个目录")
+
+
+def _write_jsonl(category: str, path: Path) -> None:
+    sys.stdout.write(json.dumps({"category": category, "path": str(path)}, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
 
 @app.command()
-def compress(root: Path) -> None:
-    """压缩 main_assets 文件夹中的内容（不包含文件夹本身）."""
+def compress(
+    root: Path,
+    jobs: int | None = JOBS_OPTION,
+    io_limit: str | None = IO_LIMIT_OPTION,
+    cores: int | None = typer.Option(
+        None, "--cores", min=1, help="按核数调度 7z 线程（默认全部核）；指定后忽略 --jobs"
+    ),
+    verify: bool = typer.Option(False, "--verify", help="校验新压缩包（7z t + CRC）通过后才删除原始文件"),
+    backend: BackendName = BACKEND_OPTION,
+) -> None:
+    """压缩 main_assets 文件夹中的内容（不包含文件夹本身）.
+
+    默认把所有核在同时压缩的文件夹之间分配：大文件夹的 7z 多线程，小文件夹单线程并发.
+    每个文件夹完成后输出实际吞吐量（MB/s）. --verify 时校验吞吐量单独汇总.
+    """
     # TODO：历史遗留代码。现添加了 main_assets_others 目录，考虑还要不要压缩
-    compress_main_assets(root)
+    compress_main_assets(root, jobs, parse_size(io_limit), cores, verify, _backend(backend))
+
+@app.command()
+def dedup(
+    root: Path,
+    link: bool = typer.Option(False, "--link", help="用硬链接替换重复文件（默认只报告）"),
+    workers: int = WORKERS_OPTION,
+) -> None:
+    """查找 main_assets 中内容完全相同的文件.
+
+    先按文件大小分组，再比较首尾块哈希，只有仍然相同的文件才计算全文件哈希；
+    哈希按 (路径, 大小, mtime) 缓存，重复运行只读取变化过的文件.
+    """
+    payloads = [
+        (node.path, node.size) for node in TreeSnapshot(root, workers).walk()
+        if not node.is_dir and node.parent is not None and node.parent.name == "main_assets"
+    ]
+    groups = find_duplicates(payloads, workers=workers)
+    wasted = 0
+    for group in groups:
+        size = group[0].stat().st_size
+        wasted += size * (len(group) - 1)
+        console.print(f"🔁 {len(group)} 个相同文件（{size / 1024 / 1024:.1f} MB）:")
+        for p in group:
+            console.print(f"    {p}")
+    console.print(f"共 {len(groups)} 组重复文件，可节省 {wasted / 1024 / 1024:.1f} MB")
+    if link:
+        freed = sum(link_duplicates(group) for group in groups)
+        console.print(f"✅ 已用硬链接替换，释放 {freed / 1024 / 1024:.1f} MB")
+
 
 @app.command()
 def validate_trash_items():
@@ -157,83 +346,64 @@ def validate_trash_items():
         print("✅ 验证通过，所有目录都有 3 个文件")
 
 @app.command()
-def merge_images(paths: list[Path] = typer.Argument(None)) -> None:
-    """合并 main_assets 文件夹中的图片文件为一个图片文件."""
+def merge_images(
+    paths: list[Path] = typer.Argument(None),
+    thumbnail_cache: str = THUMBNAIL_CACHE_OPTION,
+    engine: MontageEngine = typer.Option(MontageEngine.pillow, "--engine", help="pillow: 进程内并行解码；magick: 调用 ImageMagick"),
+    workers: int | None = typer.Option(None, "--workers", min=1, help="并行解码图片的线程数（默认全部核，仅 pillow）"),
+    layout: MontageLayout = typer.Option(MontageLayout.single, "--layout", help="single: 一张图片；pages: 按 --page-size 分页；dzi: Deep Zoom 切片（仅 pillow）"),
+    page_size: int = typer.Option(8192, "--page-size", min=1, help="分页时每页的最大边长（像素）"),
+) -> None:
+    """合并 main_assets 文件夹中的图片文件为一个图片文件.
+
+    图片很多时用 --layout pages 或 dzi，内存占用与图片数量无关.
+    """
     from .merge_images import create_thumbnail_montage
-    create_thumbnail_montage(paths)
+
+    cache = _thumbnail_cache(thumbnail_cache)
+    try:
+        create_thumbnail_montage(
+            paths, cache=cache, engine=engine.value, workers=workers,
+            layout=layout.value, page_size=page_size,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+def _thumbnail_cache(max_size: str) -> ThumbnailCache | None:
+    max_bytes = parse_size(max_size)
+    return ThumbnailCache(max_bytes=max_bytes) if max_bytes else None
+
+def _backend(name: BackendName) -> ArchiveBackend:
+    return get_backend(None if name is BackendName.auto else name.value)
 
 @app.command()
-def set_private_images(path: Path) -> None:
+def set_private_images(
+    path: Path,
+    backend: BackendName = BACKEND_OPTION,
+    workers: int | None = typer.Option(None, "--workers", min=1, help="生成缩略图的进程数（默认全部核）"),
+    thumbnail_cache: str = THUMBNAIL_CACHE_OPTION,
+) -> None:
     """
     遍历文件夹中的所有图片
     对每张图片，生成缩略图
-    将原图用7zip压缩为7z格式，放到 原图片名/main_assets中
+    将原图压缩（7z 或 zip 格式，见 --backend），放到 原图片名/main_assets中
     将缩略图放到 原图片名/thumbnail 中
     将原图片删除
-    """
-    # 支持的图片格式
-    from .file_organizer import is_image_file
 
-    image_files = [
-        p for p in path.rglob("*")
-        if is_image_file(str(p)) and "thumbnail" not in p.parts and "main_assets" not in p.parts
-    ]
+    缩略图在多个进程中并行生成，原图压缩在单独的 I/O 线程中进行.
+    按内容缓存生成的缩略图，重跑时未变化的图片不再解码.
+    """
+    from .private_images import find_images, set_private_images as run_pipeline
 
-    for img_path in image_files:
-        if not is_image_file(str(img_path)):
-            continue
-
-        print(f"Processing: {img_path.name}")
-
-        # 创建相关文件夹
-        base_name = img_path.stem
-        main_assets_dir = img_path.parent / base_name / "main_assets"
-        thumbnail_dir = img_path.parent / base_name / "thumbnail"
-        main_assets_dir.mkdir(parents=True, exist_ok=True)
-        thumbnail_dir.mkdir(parents=True, exist_ok=True)
-
-        # 生成缩略图
-        try:
-            with Image.open(img_path) as img:
-                width, height = img.size
-                aspect_ratio = width / height
-
-                # 根据图片方向设置缩放尺寸
-                if aspect_ratio > 1:  # 横图
-                    new_width = 512
-                    new_height = int(512 / aspect_ratio)
-                else:  # 竖图或方图
-                    new_height = 512
-                    new_width = int(512 * aspect_ratio)
-
-                img.thumbnail((new_width, new_height))
-                thumbnail_path = thumbnail_dir / img_path.name
-                img.save(thumbnail_path)
-                print(f"Thumbnail saved to: {thumbnail_path}")
-        except Exception as e:
-            print(f"❌ Error creating thumbnail for {img_path}: {e}")
-            continue
-
-        # 压缩原图为 7z
-        try:
-            output_7z = main_assets_dir / f"{img_path.stem}.priv"
-            subprocess.run(
-                ["7z", "a", str(output_7z), str(img_path)],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-            print(f"Compressed to: {output_7z}")
-        except subprocess.CalledProcessError as e:
-            print(f"❌ 7z compression failed for {img_path}: {e}")
-            continue
-
-        # 删除原图
-        try:
-            img_path.unlink()
-            print(f"Deleted original: {img_path}")
-        except Exception as e:
-            print(f"❌ Error deleting {img_path}: {e}")
+    cache = _thumbnail_cache(thumbnail_cache)
+    try:
+        ok, failed = run_pipeline(find_images(path), _backend(backend), workers, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    hits = f"，缓存命中 {cache.hits} 张" if cache is not None else ""
+    console.print(f"✅ 完成 {ok} 张图片，失败 {failed} 张{hits}")
 
 
 # TODO: 在eagle以外为".zprj", ".zpac" 生成缩略图，不通过eagle生成
@@ -0,0 +1,207 @@
+"""压缩计划：按文件内容选择 store / fast / max，避免对已压缩的数据浪费 -mx=9 的 CPU 时间.
+
+每个文件先看文件头（PNG/JPG/zip/视频等已压缩格式直接存储），
+其余文件抽取几个块用 LZMA 试压缩，按压缩率和耗时估算整文件的结果.
+"""
+
+import lzma
+import os
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import cache
+from pathlib import Path
+
+
+class Mode(str, Enum):
+    STORE = "store"
+    FAST = "fast"
+    MAX = "max"
+
+
+SAMPLE_BLOCK = 32 * 1024
+SAMPLE_BLOCKS = 3
+# 小于该大小的文件不试压缩，直接用 max（耗时可以忽略）
+SMALL_FILE = 16 * 1024
+# zlib 快速试压缩后仍保留这么多，视为不可压缩
+INCOMPRESSIBLE_RATIO = 0.97
+# max 模式至少要省下这么多才值得压缩
+MIN_GAIN = 0.05
+# max 比 fast 至少多省这么多才值得用 max
+MAX_EXTRA_GAIN = 0.03
+# 固实压缩至少要比分别压缩小这么多才启用
+SOLID_GAIN = 0.05
+SOLID_SAMPLE_FILES = 8
+# 试压缩只处理几十 KB，字典不需要 7z 那么大，也避免每次分配上百 MB 内存
+_TRIAL_DICT = 1024 * 1024
+
+# 已压缩格式的文件头，每项为偏移和魔数
+COMPRESSED_MAGIC = (
+    (0, b"\x89PNG\r\n\x1a\n"),
+    (0, b"\xff\xd8\xff"),  # JPEG
+    (0, b"GIF8"),
+    (8, b"WEBP"),
+    (0, b"PK\x03\x04"),  # zip 及 docx/unitypackage 等
+    (0, b"7z\xbc\xaf\x27\x1c"),
+    (0, b"Rar!\x1a\x07"),
+    (0, b"\x1f\x8b"),  # gzip
+    (0, b"\xfd7zXZ\x00"),
+    (0, b"BZh"),
+    (0, b"\x28\xb5\x2f\xfd"),  # zstd
+    (4, b"ftyp"),  # mp4/mov/heic
+    (0, b"\x1a\x45\xdf\xa3"),  # mkv/webm
+    (0, b"OggS"),
+    (0, b"ID3"),
+    (0, b"fLaC"),
+)
+
+
+def is_compressed_format(head: bytes) -> bool:
+    return any(head[offset:offset + len(magic)] == magic for offset, magic in COMPRESSED_MAGIC)
+
+
+def _lzma_trial(data: bytes, preset: int) -> tuple[int, float]:
+    """返回 (压缩后大小, CPU 秒数)."""
+    filters = [{"id": lzma.FILTER_LZMA2, "preset": preset, "dict_size": _TRIAL_DICT}]
+    start = time.thread_time()
+    size = len(lzma.compress(data, format=lzma.FORMAT_RAW, filters=filters))
+    return size, time.thread_time() - start
+
+
+@cache
+def _max_cost_per_byte() -> float:
+    """不可压缩数据上 max 模式每字节的 CPU 秒数，用来估算跳过试压缩的文件."""
+    data = os.urandom(SAMPLE_BLOCK * SAMPLE_BLOCKS)
+    _, seconds = _lzma_trial(data, 9)
+    return seconds / len(data)
+
+
+def _sample(path: Path, size: int) -> bytes:
+    """从文件头、中、尾各取一块."""
+    if size <= SAMPLE_BLOCK * SAMPLE_BLOCKS:
+        return path.read_bytes()
+    step = (size - SAMPLE_BLOCK) // (SAMPLE_BLOCKS - 1)
+    chunks = []
+    with path.open("rb") as f:
+        for i in range(SAMPLE_BLOCKS):
+            f.seek(i * step)
+            chunks.append(f.read(SAMPLE_BLOCK))
+    return b"".join(chunks)
+
+
+@dataclass
+class FilePlan:
+    path: Path
+    size: int
+    mode: Mode
+    # 按所选模式 / 全部用 max 时的预计压缩后大小和 CPU 秒数
+    est_size: int
+    est_size_max: int
+    est_cpu: float
+    est_cpu_max: float
+
+
+def plan_file(path: Path, size: int | None = None) -> FilePlan:
+    size = path.stat().st_size if size is None else size
+    if size < SMALL_FILE:
+        return FilePlan(path, size, Mode.MAX, size, size, 0.0, 0.0)
+    sample = _sample(path, size)
+    scale = size / len(sample) if sample else 0.0
+    if is_compressed_format(sample[:16]) or (
+        len(zlib.compress(sample, 1)) >= len(sample) * INCOMPRESSIBLE_RATIO
+    ):
+        cpu_max = size * _max_cost_per_byte()
+        return FilePlan(path, size, Mode.STORE, size, size, 0.0, cpu_max)
+    fast_size, fast_cpu = _lzma_trial(sample, 1)
+    max_size, max_cpu = _lzma_trial(sample, 9)
+    est = {
+        Mode.STORE: (size, 0.0),
+        Mode.FAST: (int(fast_size * scale), fast_cpu * scale),
+        Mode.MAX: (int(max_size * scale), max_cpu * scale),
+    }
+    ratio_fast, ratio_max = fast_size / len(sample), max_size / len(sample)
+    if 1 - ratio_max < MIN_GAIN:
+        mode = Mode.STORE
+    elif ratio_fast - ratio_max < MAX_EXTRA_GAIN:
+        mode = Mode.FAST
+    else:
+        mode = Mode.MAX
+    return FilePlan(path, size, mode, est[mode][0], est[Mode.MAX][0], est[mode][1], est[Mode.MAX][1])
+
+
+def _solid_pays_off(files: list[FilePlan], preset: int) -> bool:
+    """把几个文件的开头拼在一起试压缩，明显小于分别压缩时才启用固实压缩."""
+    if len(files) < 2:
+        return False
+    samples = []
+    for plan in files[:SOLID_SAMPLE_FILES]:
+        with plan.path.open("rb") as f:
+            samples.append(f.read(SAMPLE_BLOCK))
+    separate = sum(_lzma_trial(s, preset)[0] for s in samples)
+    joint, _ = _lzma_trial(b"".join(samples), preset)
+    return joint <= separate * (1 - SOLID_GAIN)
+
+
+@dataclass
+class FolderPlan:
+    folder: Path
+    files: list[FilePlan]
+    # 各模式是否使用固实压缩
+    solid: dict[Mode, bool] = field(default_factory=dict)
+    # 没有文件的目录，需要单独加入压缩包
+    empty_dirs: list[Path] = field(default_factory=list)
+
+    def groups(self) -> dict[Mode, list[FilePlan]]:
+        groups: dict[Mode, list[FilePlan]] = defaultdict(list)
+        for plan in self.files:
+            groups[plan.mode].append(plan)
+        return dict(groups)
+
+    @property
+    def size(self) -> int:
+        return sum(p.size for p in self.files)
+
+    @property
+    def est_size(self) -> int:
+        return sum(p.est_size for p in self.files)
+
+    @property
+    def est_size_max(self) -> int:
+        return sum(p.est_size_max for p in self.files)
+
+    @property
+    def est_cpu(self) -> float:
+        return sum(p.est_cpu for p in self.files)
+
+    @property
+    def est_cpu_max(self) -> float:
+        return sum(p.est_cpu_max for p in self.files)
+
+
+def plan_folder(folder: Path, exclude: Path | None = None) -> FolderPlan:
+    """为 folder 下的所有文件（递归）制定压缩计划，路径按名字排序."""
+    files, empty_dirs = list_folder(folder, exclude)
+    return plan_paths(folder, files, empty_dirs)
+
+
+def list_folder(folder: Path, exclude: Path | None = None) -> tuple[list[Path], list[Path]]:
+    """返回 folder 下的 (文件, 空目录)，按名字排序."""
+    files: list[Path] = []
+    empty_dirs: list[Path] = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames.sort()
+        current = Path(dirpath)
+        if current != folder and not dirnames and not filenames:
+            empty_dirs.append(current)
+        files.extend(current / name for name in sorted(filenames) if current / name != exclude)
+    return files, empty_dirs
+
+
+def plan_paths(folder: Path, files: list[Path], empty_dirs: list[Path] | None = None) -> FolderPlan:
+    plan = FolderPlan(folder, [plan_file(p) for p in files], empty_dirs=list(empty_dirs or ()))
+    for mode, group in plan.groups().items():
+        if mode is not Mode.STORE:
+            plan.solid[mode] = _solid_pays_off(group, 9 if mode is Mode.MAX else 1)
+    return plan
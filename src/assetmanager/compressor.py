@@ -1,45 +1,138 @@
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
+import os
 import shutil
-import subprocess
-from multiprocessing import Pool
 
-ARCHIVE_SUFFIX = ".7z"
-ARCHIVE_LEVEL = "-mx=9"
+from .archive_backends import BACKENDS, ArchiveBackend, ArchiveError, backend_for, get_backend
+from .archive_manifest import (
+    MANIFEST_NAME, file_entry, is_unchanged, read_manifest, verify_archive, write_manifest
+)
+from .compression_planner import FolderPlan, Mode, list_folder, plan_paths
+from .scheduler import CPU, IO, Job, JobScheduler, device_of
+from .tree_snapshot import TreeNode, TreeSnapshot
+
 TARGET_FOLDER_NAME = "main_assets"
+DEFAULT_JOBS = 3
+# LZMA2 多线程按块切分输入，小于这个量的数据多给线程也用不上
+BYTES_PER_THREAD = 128 * 1024 * 1024
 
 def log(message: str) -> None:
     print(message)
 
+def existing_archive(folder: Path) -> Path | None:
+    """folder 中已有的压缩包（任一后端的格式）."""
+    for backend in BACKENDS.values():
+        archive = folder / f"{folder.parent.name}{backend.suffix}"
+        if archive.is_file():
+            return archive
+    return None
+
 def should_compress(folder: Path) -> bool:
     if not folder.is_dir():
         return False
-    files = list(folder.iterdir())
-    if len(files) <= 1:
+    zip_name = existing_archive(folder)
+    others = [item for item in folder.iterdir() if item != zip_name]
+    if zip_name is not None:
+        # 压缩包旁边有新加入的文件时增量更新，否则无需处理
+        if not others:
+            log(f"[跳过] {zip_name} 已是最新")
+            return False
+        return True
+    if len(others) <= 1:
         log(f"[跳过] {folder} 不需要压缩（文件数 <= 1）")
         return False
-    zip_name = folder / f"{folder.parent.name}{ARCHIVE_SUFFIX}"
-    if zip_name.exists():
-        log(f"[跳过] {zip_name} 已存在")
-        return False
     return True
 
-def compress_folder(folder: Path) -> None:
+def _member_name(folder: Path, path: Path) -> str:
+    return path.relative_to(folder).as_posix()
+
+@dataclass
+class Compressed:
+    plan: FolderPlan
+    archive: Path
+    # 本次新建（而不是更新）的压缩包，校验失败时可以直接删除
+    created: bool
+    backend: ArchiveBackend
+
+def compress_folder(
+    folder: Path,
+    threads: int | None = None,
+    verify: bool = False,
+    backend: ArchiveBackend | None = None,
+) -> Compressed | None:
+    """压缩（或增量更新）folder. verify=True 时不清理原始文件，由 verify_folder 校验后清理.
+
+    新压缩包使用 backend（默认自动选择），已有的压缩包按其格式选择后端.
+    """
     if not should_compress(folder):
-        return
-    zip_name = folder / f"{folder.parent.name}{ARCHIVE_SUFFIX}"
-    content_to_compress = [str(item) for item in folder.iterdir()]
-    log(f"[压缩中] {folder}")
+        return None
+    zip_name = existing_archive(folder)
+    existed = zip_name is not None
+    if zip_name is None:
+        backend = backend or get_backend()
+        zip_name = folder / f"{folder.parent.name}{backend.suffix}"
+    else:
+        backend = backend_for(zip_name)
     try:
-        result = subprocess.run([
-            "7z", "a", str(zip_name), *content_to_compress, "-r", ARCHIVE_LEVEL
-        ], check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.returncode != 0:
-            log(f"[失败] 压缩失败：{folder}\n错误信息：{result.stderr}")
-            return
+        # 压缩包已存在时只处理与清单不一致的文件，相同的文件直接清理
+        previous = read_manifest(zip_name, backend) if existed else {}
+        files, empty_dirs = list_folder(folder, exclude=zip_name)
+        # 上次中断可能留下清单文件，它不是素材的一部分
+        files = [p for p in files if p != folder / MANIFEST_NAME]
+        names = {p: _member_name(folder, p) for p in files}
+        entries = {names[p]: file_entry(p) for p in files}
+        changed = [p for p in files if not is_unchanged(previous.get(names[p]), entries[names[p]])]
+        if existed and not changed:
+            log(f"[跳过] {zip_name} 已包含全部文件")
+            _cleanup_original_files(folder, zip_name)
+            return None
+        plan = plan_paths(folder, changed, empty_dirs)
+        groups = plan.groups()
+        summary = "，".join(f"{mode.value} {len(files)}" for mode, files in groups.items())
+        action = "更新中" if existed else "压缩中"
+        log(f"[{action}] {folder}（{summary}）")
+        # 每种模式单独更新一次；更新时可能重写压缩包，预计压缩后小的组先写，减少重复拷贝
+        ordered = sorted(groups.items(), key=lambda item: sum(p.est_size for p in item[1]))
+        batches = [(mode, [_member_name(folder, p.path) for p in files]) for mode, files in ordered]
+        if plan.empty_dirs:
+            batches.append((Mode.STORE, [_member_name(folder, d) for d in plan.empty_dirs]))
+        write_manifest(folder / MANIFEST_NAME, previous | entries)
+        batches.append((Mode.STORE, [MANIFEST_NAME]))
+        for mode, members in batches:
+            try:
+                backend.update(
+                    zip_name, folder, members, mode, solid=plan.solid.get(mode, False), threads=threads
+                )
+            except ArchiveError as e:
+                log(f"[失败] 压缩失败：{folder}\n错误信息：{e}")
+                _discard(folder, zip_name, existed)
+                return None
         log(f"[成功] 压缩完成：{zip_name}")
-        _cleanup_original_files(folder, zip_name)
+        if not verify:
+            _cleanup_original_files(folder, zip_name)
+        return Compressed(plan, zip_name, not existed, backend)
     except Exception as e:
         log(f"[异常] 压缩异常：{folder}，原因：{e}")
+        _discard(folder, zip_name, existed)
+        return None
+
+def verify_folder(compressed: Compressed) -> bool:
+    problems = verify_archive(compressed.archive, compressed.backend)
+    if problems:
+        log(f"[校验失败] {compressed.archive}，保留原始文件：" + "；".join(problems))
+        if compressed.created:
+            compressed.archive.unlink(missing_ok=True)
+        return False
+    log(f"[校验通过] {compressed.archive}")
+    _cleanup_original_files(compressed.plan.folder, compressed.archive)
+    return True
+
+def _discard(folder: Path, zip_name: Path, existed: bool) -> None:
+    # 更新失败时原有的压缩包保持不变，只删除本次新建的
+    (folder / MANIFEST_NAME).unlink(missing_ok=True)
+    if not existed:
+        zip_name.unlink(missing_ok=True)
 
 def _cleanup_original_files(folder: Path, zip_file: Path) -> None:
     try:
@@ -54,11 +147,105 @@ def _cleanup_original_files(folder: Path, zip_file: Path) -> None:
     except Exception as e:
         log(f"[清理失败] {folder}，原因：{e}")
 
-def process(root: Path) -> None:
-    folders = [f for f in root.rglob(TARGET_FOLDER_NAME) if f.is_dir()]
+def _tree_size(node: TreeNode) -> int:
+    stack, total = [node], 0
+    while stack:
+        current = stack.pop()
+        total += current.size
+        stack.extend(current.children.values())
+    return total
+
+def threads_for(size: int, total: int, cores: int) -> int:
+    """按文件夹占总数据量的比例分配核数，但不超过 LZMA2 能用上的线程数."""
+    share = -(-cores * size // max(total, 1))
+    usable = -(-size // BYTES_PER_THREAD)
+    return max(1, min(share, usable, cores))
+
+def process(
+    root: Path,
+    jobs: int | None = None,
+    io_limit: int | None = None,
+    cores: int | None = None,
+    verify: bool = False,
+    backend: ArchiveBackend | None = None,
+) -> None:
+    """压缩所有 main_assets.
+
+    未指定 jobs 时按核数调度：cores（默认全部核）在同时运行的文件夹之间分配，
+    大文件夹的 7z 用多线程（-mmt），小文件夹各用一个线程、多个同时压缩.
+    只指定 jobs 时同时压缩 jobs 个文件夹，7z 使用默认线程数.
+    verify=True 时每个压缩包完成后在同一个调度器中排入校验任务，校验通过才删除原始文件.
+    backend 为新建压缩包使用的后端，默认装了 7z 就用 7z，否则用进程内 zip.
+    """
+    # 一次遍历同时得到 main_assets 目录和各自的大小，供调度器按大小排序
+    folders = [
+        (node.path, _tree_size(node)) for node in TreeSnapshot(root).walk()
+        if node.is_dir and node.name == TARGET_FOLDER_NAME
+    ]
     if not folders:
         log("[信息] 未找到任何 main_assets 文件夹。")
         return
     log(f"[发现] 共找到 {len(folders)} 个 main_assets 文件夹，开始处理...")
-    with Pool(processes=3) as pool:
-        pool.map(compress_folder, folders)
+    device = device_of(root)
+    backend = backend or get_backend()
+    if jobs is not None and cores is None:
+        scheduler = JobScheduler(jobs, io_limit)
+        for folder, size in folders:
+            scheduler.submit(Job(
+                str(folder), size, partial(compress_folder, folder, None, verify, backend), CPU, device
+            ))
+    else:
+        cores = cores or os.cpu_count() or DEFAULT_JOBS
+        total = sum(size for _, size in folders)
+        log(f"[调度] 共 {cores} 个核，后端 {backend.name}，在文件夹之间按大小分配线程")
+        scheduler = JobScheduler(cores, io_limit)
+        for folder, size in folders:
+            threads = threads_for(size, total, cores) if backend.multithreaded else 1
+            scheduler.submit(Job(
+                f"{folder}（{threads} 线程）", size,
+                partial(compress_folder, folder, threads, verify, backend),
+                CPU, device, slots=threads,
+            ))
+    results: list[Compressed] = []
+    checks: list[Job] = []
+    for job in scheduler.as_completed():
+        if job.context.get("verify"):
+            checks.append(job)
+        elif job.result is not None:
+            results.append(job.result)
+            if verify:
+                archive = job.result.archive
+                scheduler.submit(Job(
+                    f"[校验] {archive}", archive.stat().st_size,
+                    partial(verify_folder, job.result), IO, device, context={"verify": True},
+                ))
+    _summary([r.plan for r in results])
+    if checks:
+        _verify_summary(checks)
+
+def _verify_summary(checks: list[Job]) -> None:
+    failed = sum(1 for job in checks if job.result is not True)
+    size = sum(job.size for job in checks)
+    elapsed = sum(job.elapsed for job in checks)
+    rate = size / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+    log(
+        f"[校验] {len(checks)} 个压缩包，失败 {failed} 个；"
+        f"共 {size / 1024 / 1024:.1f} MB，耗时 {elapsed:.1f}s，{rate:.1f} MB/s"
+    )
+
+def _summary(plans: list[FolderPlan]) -> None:
+    if not plans:
+        return
+    counts = {mode: 0 for mode in Mode}
+    for plan in plans:
+        for mode, files in plan.groups().items():
+            counts[mode] += len(files)
+    size = sum(p.size for p in plans)
+    est_size, est_size_max = sum(p.est_size for p in plans), sum(p.est_size_max for p in plans)
+    saved_cpu = sum(p.est_cpu_max for p in plans) - sum(p.est_cpu for p in plans)
+    extra = est_size - est_size_max
+    log(f"[计划] store {counts[Mode.STORE]} / fast {counts[Mode.FAST]} / max {counts[Mode.MAX]} 个文件")
+    log(
+        f"[计划] 与全部 -mx=9 相比预计节省 CPU {saved_cpu:.1f}s，"
+        f"体积多 {extra / 1024 / 1024:.1f} MB（占原始大小的 {extra / max(size, 1):.2%}）"
+    )
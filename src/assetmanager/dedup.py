@@ -0,0 +1,211 @@
+"""基于内容哈希的重复文件检测：先按大小分组，再比较首尾块哈希，最后才计算全文件哈希."""
+
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from rich.console import Console
+
+from .cache import cache_dir
+
+PARTIAL_BLOCK = 64 * 1024
+HASH_ALGORITHM = "sha256"
+COMMIT_EVERY = 200
+console = Console()
+
+
+def _stat_key(path: Path) -> tuple[str, int, int]:
+    st = path.stat()
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+class HashCache:
+    """按 (路径, 大小, mtime) 缓存文件哈希，文件变化后自动失效. 可在多线程中共用."""
+
+    def __init__(self, db_path: Path | None = None) -> None:
+        self.db = sqlite3.connect(db_path or cache_dir() / "hashes.sqlite", check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " partial TEXT,"
+            " full TEXT)"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.commit()
+            self.db.close()
+
+    def _cached(self, key: tuple[str, int, int], column: str) -> str | None:
+        with self._lock:
+            row = self.db.execute(
+                f"SELECT {column} FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?", key
+            ).fetchone()
+        return row[0] if row else None
+
+    def _store(self, key: tuple[str, int, int], **values: str) -> None:
+        path, size, mtime_ns = key
+        with self._lock:
+            row = self.db.execute(
+                "SELECT partial, full FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?", key
+            ).fetchone()
+            partial, full = row if row else (None, None)
+            self.db.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, values.get("partial", partial), values.get("full", full)),
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self.db.commit()
+                self._pending = 0
+
+    def partial_hash(self, path: Path) -> str:
+        """文件大小 + 首尾各 PARTIAL_BLOCK 字节的哈希；小文件直接等于全文件哈希."""
+        key = _stat_key(path)
+        cached = self._cached(key, "partial")
+        if cached is not None:
+            return cached
+        size = key[1]
+        if size <= 2 * PARTIAL_BLOCK:
+            return self.full_hash(path)
+        digest = hashlib.new(HASH_ALGORITHM)
+        digest.update(size.to_bytes(8, "little"))
+        with path.open("rb") as f:
+            digest.update(f.read(PARTIAL_BLOCK))
+            f.seek(-PARTIAL_BLOCK, os.SEEK_END)
+            digest.update(f.read(PARTIAL_BLOCK))
+        value = digest.hexdigest()
+        self._store(key, partial=value)
+        return value
+
+    def full_hash(self, path: Path) -> str:
+        key = _stat_key(path)
+        cached = self._cached(key, "full")
+        if cached is not None:
+            return cached
+        with path.open("rb") as f:
+            value = hashlib.file_digest(f, HASH_ALGORITHM).hexdigest()
+        if key[1] <= 2 * PARTIAL_BLOCK:
+            self._store(key, partial=value, full=value)
+        else:
+            self._store(key, full=value)
+        return value
+
+
+_default_cache: HashCache | None = None
+
+
+def default_cache() -> HashCache:
+    """进程内共用的哈希缓存，在第一次使用时按当时的缓存目录打开."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HashCache()
+    return _default_cache
+
+
+@atexit.register
+def reset_default_cache() -> None:
+    """关闭共用的哈希缓存，下次使用时按当时的缓存目录重新打开（切换缓存目录、测试隔离时调用）."""
+    global _default_cache
+    if _default_cache is not None:
+        _default_cache.close()
+        _default_cache = None
+
+
+def files_identical(a: Path, b: Path, cache: HashCache | None = None) -> bool:
+    """大小不同直接判定不同；否则依次比较首尾块哈希与全文件哈希."""
+    if a.stat().st_size != b.stat().st_size:
+        return False
+    if os.path.samefile(a, b):
+        return True
+    cache = cache if cache is not None else default_cache()
+    if cache.partial_hash(a) != cache.partial_hash(b):
+        return False
+    return cache.full_hash(a) == cache.full_hash(b)
+
+
+def _split_by(
+    groups: Iterable[list[Path]], key: Callable[[Path], str], workers: int
+) -> list[list[Path]]:
+    candidates = list(groups)
+    flat = [p for group in candidates for p in group]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        digests = dict(zip(flat, pool.map(_safe(key), flat), strict=True))
+    result: list[list[Path]] = []
+    for group in candidates:
+        by_digest: dict[str, list[Path]] = defaultdict(list)
+        for p in group:
+            digest = digests[p]
+            if digest is not None:
+                by_digest[digest].append(p)
+        result.extend(g for g in by_digest.values() if len(g) > 1)
+    return result
+
+
+def _safe(key: Callable[[Path], str]) -> Callable[[Path], str | None]:
+    def wrapper(path: Path) -> str | None:
+        try:
+            return key(path)
+        except OSError as e:
+            console.print(f"⚠️ 无法读取文件: {path} - {e}")
+            return None
+
+    return wrapper
+
+
+def find_duplicates(
+    files: Iterable[tuple[Path, int]], cache: HashCache | None = None, workers: int = 1
+) -> list[list[Path]]:
+    """返回内容完全相同的文件分组（每组按路径排序）. files 为 (路径, 大小).
+
+    只有大小相同的文件才读取首尾块，首尾块也相同的才计算全文件哈希.
+    已经互为硬链接的文件视为同一个文件.
+    """
+    cache = cache if cache is not None else default_cache()
+    by_size: dict[int, list[Path]] = defaultdict(list)
+    for path, size in files:
+        # 空文件没有去重价值
+        if size > 0:
+            by_size[size].append(path)
+    groups = [g for g in by_size.values() if len(g) > 1]
+    groups = _split_by(groups, cache.partial_hash, workers)
+    groups = _split_by(groups, cache.full_hash, workers)
+    result = []
+    for group in groups:
+        by_inode: dict[tuple[int, int], Path] = {}
+        for p in sorted(group):
+            st = p.stat()
+            by_inode.setdefault((st.st_dev, st.st_ino), p)
+        if len(by_inode) > 1:
+            result.append(sorted(by_inode.values()))
+    result.sort()
+    return result
+
+
+def link_duplicates(group: list[Path]) -> int:
+    """用第一个文件的硬链接替换组内其它文件，返回释放的字节数."""
+    keep, *others = group
+    freed = 0
+    for dup in others:
+        tmp = dup.with_name(f"{dup.name}.dedup-tmp")
+        try:
+            size = dup.stat().st_size
+            os.link(keep, tmp)
+            os.replace(tmp, dup)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            console.print(f"❌ 无法建立硬链接: {dup} -> {keep} - {e}")
+            continue
+        freed += size
+        console.print(f"🔗 {dup} -> {keep}")
+    return freed
@@ -1,20 +1,106 @@
-import requests
+"""Eagle 本地 API：复用连接的客户端，自动分页并发获取项目列表."""
+
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
 
 BASE_URL = "http://localhost:41595/api"
 TRASH_FOLDER_ID = "MFDVSSH14GC83"
 LIBRARY_PATH = Path(r"F:\eagle_librarys\Illusion.library\images")
+PAGE_SIZE = 1000
+CONCURRENCY = 4
+TIMEOUT = 30
+# item/list 返回的一个项目（JSON 对象）
+Item = dict[str, Any]
+
+
+class EagleApiError(RuntimeError):
+    """API 返回的 status 不是 success."""
+
+
+class EagleClient:
+    """Eagle API 客户端. 所有请求共用一个 Session，连接池大小与并发数相同.
+
+    项目列表按 offset 自动分页，最多同时请求 concurrency 页，按顺序逐个产出项目，
+    内存只保留正在请求的几页.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        *,
+        page_size: int = PAGE_SIZE,
+        concurrency: int = CONCURRENCY,
+        timeout: float = TIMEOUT,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> "EagleClient":
+        return self
 
-def list_items_in_folder(folder_id):
-    url = f"{BASE_URL}/item/list"
-    params = {"folders": folder_id, "limit": 10000, "offset": 0}
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    if data.get("status") == "success":
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def get(self, endpoint: str, params: dict[str, Any] | None = None) -> Any:
+        """请求 endpoint（如 "item/list"）并返回 data 字段."""
+        response = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") != "success":
+            raise EagleApiError(f"API 返回错误: {data}")
         return data.get("data", [])
-    else:
-        raise RuntimeError(f"API 返回错误: {data}")
+
+    def _page(self, params: dict[str, Any], page: int) -> list[Item]:
+        # Eagle 的 offset 是页码（从 0 开始），不是跳过的条目数
+        params = {**params, "limit": self.page_size, "offset": page}
+        items: list[Item] = self.get("item/list", params)
+        return items
+
+    def iter_items(self, **params: Any) -> Iterator[Item]:
+        """逐个产出 item/list 的全部结果，params 为其它过滤条件（如 folders、tags）.
+
+        某一页不满 page_size 即为最后一页；此前多请求的页为空，最多浪费 concurrency - 1 次请求.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            pending: list[Future[list[Item]]] = [
+                pool.submit(self._page, params, page) for page in range(self.concurrency)
+            ]
+            next_page = self.concurrency
+            while pending:
+                items = pending.pop(0).result()
+                yield from items
+                if len(items) < self.page_size:
+                    break
+                pending.append(pool.submit(self._page, params, next_page))
+                next_page += 1
+        finally:
+            # 调用方提前停止消费或出错时，丢弃尚未开始的请求
+            pool.shutdown(cancel_futures=True)
+
+    def list_items_in_folder(self, folder_id: str) -> Iterator[Item]:
+        return self.iter_items(folders=folder_id)
+
+
+def list_items_in_folder(folder_id: str) -> Iterator[Item]:
+    """逐个产出文件夹中的全部项目（不再限制为前 10000 个）."""
+    with EagleClient() as client:
+        yield from client.list_items_in_folder(folder_id)
+
 
 def check_item_files(items):
     problems = []
@@ -0,0 +1,314 @@
+"""批量解压：.zip 在进程内流式解压，.7z/.rar 交给 7z；解出的嵌套压缩包直接放回任务队列."""
+
+import os
+import shutil
+import subprocess
+import time
+import zipfile
+from pathlib import Path, PurePosixPath, PureWindowsPath
+
+from rich.console import Console
+
+from .archive_listing import ListingCache, list_archives, member_name
+from .cache import cache_file
+from .journal import Journal
+from .scheduler import CPU, IO, Job, JobScheduler, device_of
+from .structure_validator import DEFAULT_JUNK_RULES, JunkRules, merge_directories
+from .tree_snapshot import TreeSnapshot
+
+COMPRESS_EXTENSIONS = {".zip", ".7z", ".rar"}
+COPY_BUFFER = 1024 * 1024
+STAGING_SUFFIX = ".extracting"
+# zipfile 能在进程内解压的压缩方式，其余（如 Deflate64）交给 7z
+ZIP_METHODS = {zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA}
+console = Console()
+
+
+def is_archive(path: Path) -> bool:
+    return path.suffix.lower() in COMPRESS_EXTENSIONS
+
+
+def find_archives(path: Path) -> list[Path]:
+    return [
+        node.path for node in TreeSnapshot(path).walk()
+        if not node.is_dir and is_archive(node.path)
+        # 跳过中断后残留的临时解压目录
+        and not any(_is_staging(part) for part in node.path.relative_to(path).parts)
+    ]
+
+
+def _is_staging(name: str) -> bool:
+    return name.startswith(".") and name.endswith(STAGING_SUFFIX)
+
+
+def _member_target(out_dir: Path, name: str) -> Path | None:
+    # 拒绝绝对路径、盘符（C:\x、C:x、\\server\share）和 .. （zip slip）
+    if PureWindowsPath(name).anchor or PurePosixPath(name).anchor:
+        return None
+    parts = [p for p in PureWindowsPath(name).parts if p not in {"", "."}]
+    if not parts or ".." in parts:
+        return None
+    return out_dir.joinpath(*parts)
+
+
+def _restore_mtime(target: Path, info: zipfile.ZipInfo) -> None:
+    try:
+        mtime = time.mktime((*info.date_time, 0, 0, -1))
+    except (OverflowError, ValueError):
+        return
+    os.utime(target, (mtime, mtime))
+
+
+class UnsupportedZip(Exception):
+    """zip 使用了加密或 zipfile 不支持的压缩方式，需要交给 7z."""
+
+
+class InsufficientSpaceError(RuntimeError):
+    """预计解压后的大小超过了可用磁盘空间."""
+
+
+def extract_zip(file: Path, out_dir: Path, rules: JunkRules = DEFAULT_JUNK_RULES) -> None:
+    with zipfile.ZipFile(file) as zf:
+        infos = zf.infolist()
+        if any(i.flag_bits & 0x1 or i.compress_type not in ZIP_METHODS for i in infos):
+            raise UnsupportedZip(file)
+        for info in infos:
+            name = member_name(info)
+            # 无用条目直接跳过，不落盘
+            if rules.is_junk_member(name):
+                continue
+            target = _member_target(out_dir, name)
+            if target is None:
+                console.print(f"⚠️ 跳过不安全的路径: {file.name} -> {name}")
+                continue
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(info) as src, target.open("wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER)
+            _restore_mtime(target, info)
+
+
+def extract_7z(file: Path, out_dir: Path, rules: JunkRules = DEFAULT_JUNK_RULES) -> bool:
+    result = subprocess.run(
+        ["7z", "x", "-y", str(file), f"-o{out_dir!s}", *rules.seven_zip_excludes()],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        console.print(f"❌ 解压失败: {file}")
+        console.print(result.stderr)
+        return False
+    return True
+
+
+def _staging_dir(file: Path) -> Path:
+    # 用完整文件名，a.zip 和 a.7z 解压到同一个目录时也不会共用临时目录
+    return file.with_name(f".{file.name}{STAGING_SUFFIX}")
+
+
+def _publish(staging: Path, out_dir: Path) -> None:
+    """把解压完成的临时目录移动到最终位置；目标已存在时合并."""
+    if not out_dir.exists():
+        staging.rename(out_dir)
+        return
+    for item in list(staging.iterdir()):
+        target = out_dir / item.name
+        if item.is_dir() and target.is_dir():
+            merge_directories(item, target)
+        elif item.is_file() and target.is_file():
+            # 与 7z -y 一致，覆盖同名文件
+            os.replace(item, target)
+        else:
+            shutil.move(str(item), str(target))
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def _drop_junk_archive(file: Path, journal: Journal | None) -> None:
+    console.print(f"🗑️ 压缩包只包含无用文件，跳过并删除: {file}")
+    file.unlink(missing_ok=True)
+    _record(journal, file, "done")
+
+
+def extract_file(
+    file: Path,
+    journal: Journal | None = None,
+    listings: ListingCache | None = None,
+    rules: JunkRules = DEFAULT_JUNK_RULES,
+) -> list[Path] | None:
+    """解压单个压缩包并删除它，返回解出的嵌套压缩包；失败返回 None.
+
+    先解压到临时目录，完成后再移动到 out_dir，中断时 out_dir 中不会留下半成品.
+    """
+    out_dir = file.with_name(file.stem)
+    staging = _staging_dir(file)
+    if listings is not None:
+        try:
+            if listings.get(file).only_junk(rules):
+                _drop_junk_archive(file, journal)
+                return []
+        except (OSError, zipfile.BadZipFile, subprocess.CalledProcessError):
+            # 读不出列表时照常解压，由解压步骤报告错误
+            pass
+    _record(journal, file, "started")
+    try:
+        # 上次中断留下的半成品
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        ok = True
+        if file.suffix.lower() == ".zip":
+            try:
+                extract_zip(file, staging, rules)
+            except (UnsupportedZip, zipfile.BadZipFile, NotImplementedError):
+                ok = extract_7z(file, staging, rules)
+        else:
+            ok = extract_7z(file, staging, rules)
+        if not ok:
+            shutil.rmtree(staging, ignore_errors=True)
+            _record(journal, file, "failed")
+            return None
+        # 只扫描本次解出的临时目录：out_dir 可能已有其他压缩包（或同名的 a.7z）解出的内容
+        found = [p.relative_to(staging) for p in find_archives(staging)]
+        _publish(staging, out_dir)
+        console.print(f"✅ 解压完成: {file.name}")
+        # 嵌套压缩包在删除原包之前记入日志，两者之间中断时，恢复时不会因为原包已不存在而漏掉它们
+        nested = [out_dir / rel for rel in found if (out_dir / rel).is_file()]
+        for archive in nested:
+            _record(journal, archive, "queued")
+        _record(journal, file, "published")
+        file.unlink()
+        console.print(f"🗑️ 已删除压缩包: {file}")
+    except Exception as e:
+        console.print(f"❌ 异常解压: {file} - {e}")
+        _record(journal, file, "failed")
+        return None
+    _record(journal, file, "done")
+    return nested
+
+
+def _record(journal: Journal | None, archive: Path, state: str) -> None:
+    if journal is not None:
+        journal.append({"archive": str(archive), "state": state})
+
+
+def _resume_queue(journal: Journal) -> list[Path]:
+    """从日志中找出未完成且仍存在的压缩包；已解压发布、只差删除的压缩包直接删除."""
+    states: dict[str, str] = {}
+    for record in journal.replay():
+        states[record["archive"]] = record["state"]
+    pending = []
+    for archive, state in states.items():
+        path = Path(archive)
+        if state == "published":
+            # 内容已在最终位置，嵌套压缩包也已记入日志，不需要重新解压
+            path.unlink(missing_ok=True)
+            _record(journal, path, "done")
+        elif state != "done" and path.exists():
+            pending.append(path)
+    return pending
+
+
+def _extract_job(
+    file: Path, depth: int, journal: Journal, listings: ListingCache, rules: JunkRules
+) -> Job:
+    try:
+        size = file.stat().st_size
+    except OSError:
+        size = 0
+    # zip 在进程内解压基本是 I/O 密集；7z/rar 的 LZMA 等解码占用 CPU
+    kind = IO if file.suffix.lower() == ".zip" else CPU
+    return Job(
+        file.name,
+        size,
+        lambda: extract_file(file, journal, listings, rules),
+        kind,
+        device_of(file),
+        context={"depth": depth},
+    )
+
+
+def _preflight(
+    root: Path,
+    archives: list[Path],
+    listings: ListingCache,
+    jobs: int | None,
+    journal: Journal,
+    rules: JunkRules,
+    *,
+    force: bool,
+) -> list[Path]:
+    """并行预读压缩包列表：删除只含无用文件的压缩包，并检查磁盘空间是否足够."""
+    known = list_archives(archives, listings, jobs)
+    remaining = []
+    for archive in archives:
+        listing = known.get(archive)
+        if listing is not None and listing.only_junk(rules):
+            _drop_junk_archive(archive, journal)
+        else:
+            remaining.append(archive)
+    # 嵌套压缩包的大小此时未知，只估算第一层
+    needed = sum(known[a].unpacked_size(rules) for a in remaining if a in known)
+    free = shutil.disk_usage(root).free
+    console.print(f"📏 预计解压后 {needed / 1024**3:.2f} GB，可用空间 {free / 1024**3:.2f} GB")
+    if needed > free and not force:
+        raise InsufficientSpaceError(
+            f"磁盘空间不足：预计需要 {needed / 1024**3:.2f} GB，可用 {free / 1024**3:.2f} GB"
+        )
+    return remaining
+
+
+def extract_all(
+    root: Path,
+    jobs: int | None = None,
+    io_limit: int | None = None,
+    rules: JunkRules = DEFAULT_JUNK_RULES,
+    *,
+    force: bool = False,
+) -> tuple[int, int]:
+    """解压 root 下所有压缩包（含嵌套），返回 (处理的压缩包数, 最大嵌套层数).
+
+    进度写入日志（archive -> 状态），被中断后再次运行时直接从日志恢复队列：
+    已完成的跳过，未完成的清空临时目录后重新解压，不需要重新扫描整棵树.
+    解压前先并行预读各压缩包的列表（带缓存），跳过只含无用文件的压缩包并检查磁盘空间；
+    force=True 时空间不足也继续. rules 中的无用条目在解压时直接过滤，不会写入磁盘.
+    """
+    journal = Journal(cache_file("extract-journal", root, ".jsonl"))
+    archives = _resume_queue(journal)
+    if archives:
+        console.print(f"♻️ 从上次中断处继续，剩余 {len(archives)} 个压缩包")
+    else:
+        archives = find_archives(root)
+        for archive in archives:
+            _record(journal, archive, "queued")
+    listings = ListingCache()
+    try:
+        archives = _preflight(root, archives, listings, jobs, journal, rules, force=force)
+    except InsufficientSpaceError:
+        listings.close()
+        journal.close()
+        raise
+    if not archives:
+        listings.close()
+        journal.discard()
+        return 0, 0
+    console.print(f"共找到 {len(archives)} 个压缩包，开始多线程解压...")
+    total = 0
+    max_depth = 0
+    queued = set(archives)
+    scheduler = JobScheduler(jobs, io_limit)
+    for archive in archives:
+        scheduler.submit(_extract_job(archive, 1, journal, listings, rules))
+    for job in scheduler.as_completed():
+        depth = job.context["depth"]
+        total += 1
+        max_depth = max(max_depth, depth)
+        for nested in job.result or []:
+            # 解压到已存在的目录时，可能扫到本来就在队列里的压缩包
+            if nested not in queued:
+                queued.add(nested)
+                scheduler.submit(_extract_job(nested, depth + 1, journal, listings, rules))
+    listings.close()
+    journal.discard()
+    return total, max_depth
@@ -1,12 +1,29 @@
-import shutil
+import os
+import sys
+import unicodedata
 from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from functools import partial
 from pathlib import Path
+from typing import BinaryIO
 
 from rich.console import Console
 
+from .move_plan import TRASH_NAME, MovePlan, MoveResult, report, run_plan
+from .tree_snapshot import parallel_walk
+
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+ASSET_DIRS = ("main_assets", "thumbnail", "main_assets_others")
+# 每生成这么多个操作就执行一次，计划和日志的大小不随文件总数增长
+CHUNK_OPS = 50_000
+# 分组时忽略的文件名后缀：rock_preview.png 与 rock.zprj 归为一组
+DEFAULT_STRIP_SUFFIXES = ("_preview", "_thumbnail")
+READ_BLOCK = 1 << 20
 console = Console()
 
+# 一个分组：所在目录、分组名和组内的文件
+Group = tuple[Path, str, list[Path]]
+
 
 def ensure_dir(path: Path | str) -> None:
     Path(path).mkdir(parents=True, exist_ok=True)
@@ -20,88 +37,323 @@ def is_image_file(filename: str) -> bool:
     return Path(filename).suffix.lower() in IMAGE_EXTENSIONS
 
 
-def organize_files(selected_items: list[str]) -> None:
+class GroupIndex:
+    """按 (所在目录, 分组键) 索引文件；同一组中原始文件名不同时可以说明原因."""
+
+    def __init__(self, strip_suffixes: Iterable[str] | None = None) -> None:
+        suffixes = DEFAULT_STRIP_SUFFIXES if strip_suffixes is None else strip_suffixes
+        # 先匹配长的后缀，_thumbnail_preview 不会只去掉 _preview
+        self.strip_suffixes = sorted(
+            {unicodedata.normalize("NFC", s).casefold() for s in suffixes if s}, key=len, reverse=True
+        )
+        self.groups: dict[tuple[Path, str], list[Path]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def add(self, path: Path) -> None:
+        self.groups[path.parent, self.key(get_name_without_ext(path.name))].append(path)
+
+    def update(self, paths: Iterable[Path]) -> "GroupIndex":
+        for path in paths:
+            self.add(path)
+        return self
+
+    def _split(self, stem: str) -> tuple[str, str | None]:
+        """NFC 规范化并去掉后缀，返回 (剩余部分, 去掉的后缀)."""
+        stem = unicodedata.normalize("NFC", stem)
+        for suffix in self.strip_suffixes:
+            if len(stem) > len(suffix) and stem[-len(suffix):].casefold() == suffix:
+                return stem[: -len(suffix)], suffix
+        return stem, None
+
+    def key(self, stem: str) -> str:
+        return self._split(stem)[0].strip().casefold()
+
+    def name(self, files: list[Path]) -> str:
+        """分组目录名：优先取非图片文件（主文件）的文件名，保留原来的大小写."""
+        main = [f for f in files if not is_image_file(f.name)] or files
+        return self._split(get_name_without_ext(min(main).name))[0].strip()
+
+    def reasons(self, stem: str, name: str) -> list[str]:
+        """stem 与分组名 name 不同的原因."""
+        reasons = []
+        if unicodedata.normalize("NFC", stem) != stem:
+            reasons.append("Unicode 规范化（NFD→NFC）")
+        base, suffix = self._split(stem)
+        if suffix is not None:
+            reasons.append(f"去掉后缀 {suffix}")
+        if base.strip() != base:
+            reasons.append("首尾空格")
+        if base.strip() != name:
+            reasons.append("大小写")
+        return reasons
+
+    def __iter__(self) -> Iterator[Group]:
+        for (parent, _), files in self.groups.items():
+            files.sort()
+            yield parent, self.name(files), files
+
+    def collisions(self) -> Iterator[tuple[Path, list[tuple[Path, list[str]]]]]:
+        """原始文件名不完全相同、经规范化才归为一组的分组：(分组目录, [(文件, 原因)])."""
+        for parent, name, files in self:
+            stems = [get_name_without_ext(f.name) for f in files]
+            if len(set(stems)) > 1:
+                yield parent / name, [(f, self.reasons(stem, name)) for f, stem in zip(files, stems)]
+
+
+def organize_root(selected_items: list[str]) -> Path:
+    """移动计划的根目录（日志按它区分）：所选条目所在目录的公共父目录."""
+    return Path(os.path.commonpath([str(Path(p).parent) for p in selected_items]))
+
+
+def organize_files(
+    selected_items: list[str],
+    *,
+    dry_run: bool = False,
+    strip_suffixes: Iterable[str] | None = None,
+) -> None:
+    """先生成移动计划，校验后一次性执行；dry_run 时只打印计划.
+
+    strip_suffixes 为分组时忽略的文件名后缀，默认 DEFAULT_STRIP_SUFFIXES.
+    """
     selected_items_list = list(selected_items) if selected_items is not None else []
     if not selected_items_list:
         return
+    root = organize_root(selected_items_list)
     if len(selected_items_list) == 1:
-        _handle_single_path(Path(selected_items_list[0]))
-        return
-    _handle_multiple(selected_items_list)
+        plan = _plan_single_path(Path(selected_items_list[0]))
+        if plan is None:
+            return
+        result = run_plan(plan, root, dry_run=dry_run)
+    else:
+        groups = _group_selected_files(selected_items_list, strip_suffixes)
+        result = run_groups(groups, root, dry_run=dry_run)
+    if result is not None:
+        report(result)
+
+
+def organize_paths(
+    paths: Iterable[Path],
+    root: Path,
+    *,
+    dry_run: bool = False,
+    strip_suffixes: Iterable[str] | None = None,
+) -> None:
+    """按列表中的路径分组整理，不再逐个 stat（列表文件、标准输入）.
+
+    paths 可以是 read_path_list 的生成器：边读边分组，每 CHUNK_OPS 个路径执行一次，
+    内存不随列表长度增长. root 为移动计划的根目录（日志按它区分）.
+    不存在的路径在执行时作为移动失败报告.
+    """
+    result = run_groups(_stream_groups(paths, strip_suffixes), Path(root), dry_run=dry_run)
+    if result is not None:
+        report(result)
+
+
+def organize_tree(
+    root: Path,
+    *,
+    recursive: bool = False,
+    workers: int = 1,
+    dry_run: bool = False,
+    strip_suffixes: Iterable[str] | None = None,
+) -> None:
+    """把 root（recursive 时包括所有子目录）中的文件按目录、文件名分组整理.
+
+    每个目录只 scandir 一次，workers 个线程并行列目录；边遍历边生成计划，
+    每 CHUNK_OPS 个操作执行一次.
+    已经整理过的目录（含 main_assets 等子目录）不再处理.
+    """
+    visit = partial(_scan_groups, recursive=recursive, strip_suffixes=strip_suffixes)
+    groups = (
+        group
+        for _, index in parallel_walk(Path(root), visit, workers)
+        for group in _report_collisions(index)
+    )
+    result = run_groups(groups, Path(root), dry_run=dry_run)
+    if result is not None:
+        report(result)
+
+
+def run_groups(groups: Iterable[Group], root: Path, *, dry_run: bool = False) -> MoveResult | None:
+    """按块生成并执行分组的移动计划；某一块未完成时停止，日志保留以便继续或撤销."""
+    total = MoveResult()
+    plan = MovePlan()
+    count = 0
+    for base_dir, name, files in groups:
+        _plan_group(plan, base_dir, name, files)
+        count += 1
+        if len(plan) >= CHUNK_OPS:
+            if not _run_chunk(plan, root, dry_run, total):
+                break
+            plan = MovePlan()
+    else:
+        if plan.ops:
+            _run_chunk(plan, root, dry_run, total)
+    console.print(f"处理 {count} 个分组")
+    return None if dry_run else total
+
 
+def _run_chunk(plan: MovePlan, root: Path, dry_run: bool, total: MoveResult) -> bool:
+    result = run_plan(plan, root, dry_run=dry_run)
+    if result is None:
+        return True
+    total.moved += result.moved
+    total.copied += result.copied
+    total.deleted += result.deleted
+    total.failed.extend(result.failed)
+    total.complete = result.complete
+    return result.complete
 
-def _handle_single_path(file_path: Path) -> None:
+
+def _plan_single_path(file_path: Path) -> MovePlan | None:
     if not file_path.exists():
         console.print(f"错误: 文件不存在 {file_path}")
-        return
+        return None
     if file_path.suffix.lower() in IMAGE_EXTENSIONS:
         raise ValueError("单个文件时，不能是图片文件")
 
     if file_path.is_file():
         parent_dir = file_path.parent
-        _ensure_asset_dirs(parent_dir)
-        dst_path = parent_dir / "main_assets" / file_path.name
-        fast_move(str(file_path), str(dst_path))
+        plan = MovePlan()
+        _ensure_asset_dirs(plan, parent_dir)
+        plan.add(file_path, parent_dir / "main_assets" / file_path.name)
+        others = [p for p in parent_dir.iterdir() if p != file_path and p.name not in ASSET_DIRS]
         # 如果parent_dir直接子文件下只有一张图片，把它移动到thumbnail
-        image_files = [p for p in parent_dir.iterdir() if p.is_file() and is_image_file(p.name)]
+        image_files = [p for p in others if p.is_file() and is_image_file(p.name)]
         if len(image_files) == 1:  # 只有一张图片
-            img_file = image_files[0]
-            dst_img_path = parent_dir / "thumbnail" / img_file.name
-            fast_move(str(img_file), str(dst_img_path))
-        # 把除了 main_assets 和 thumbnail 以外的文件及文件夹都移动到 main_assets
-        for p in parent_dir.iterdir():
-            if p.name not in {"main_assets", "thumbnail", "main_assets_others"}:
-                dst_other_path = parent_dir / "main_assets_others" / p.name
-                fast_move(str(p), str(dst_other_path))
-
-    else:
-        console.print(f"跳过目录: {file_path}")
+            plan.add(image_files[0], parent_dir / "thumbnail" / image_files[0].name)
+            others.remove(image_files[0])
+        # 把除了 main_assets 和 thumbnail 以外的文件及文件夹都移动到 main_assets_others
+        for p in others:
+            plan.add(p, parent_dir / "main_assets_others" / p.name)
+        return plan
 
+    console.print(f"跳过目录: {file_path}")
+    return None
 
-def _ensure_asset_dirs(base_dir: Path) -> None:
-    ensure_dir(base_dir / "main_assets")
-    ensure_dir(base_dir / "thumbnail")
-    ensure_dir(base_dir / "main_assets_others")
 
-
-def fast_move(src: str, dst: str) -> None:
-    dst_path = Path(dst)
-    ensure_dir(dst_path.parent)
-    try:
-        shutil.move(src, dst)
-        console.print(f"移动: {src} -> {dst}")
-    except Exception as e:
-        console.print(f"移动失败: {src} -> {dst}, 错误: {e}")
+def _ensure_asset_dirs(plan: MovePlan, base_dir: Path) -> None:
+    plan.ensure(*(base_dir / name for name in ASSET_DIRS))
 
 
-def _group_selected_files(selected_items_list: list[str]) -> dict[str, list[Path]]:
-    groups: dict[str, list[Path]] = defaultdict(list)
+def _group_selected_files(
+    selected_items_list: list[str], strip_suffixes: Iterable[str] | None = None
+) -> Iterator[Group]:
+    files = []
     for item in selected_items_list:
         item_path = Path(item)
-        if not item_path.exists():
+        # 一次 stat 同时判断是否存在、是否为文件
+        try:
+            is_file = item_path.is_file()
+        except OSError:
+            is_file = False
+        if is_file:
+            files.append(item_path)
+        elif item_path.is_dir():
+            console.print(f"跳过目录: {item_path}")
+        else:
             console.print(f"警告: 文件不存在 {item_path}")
-            continue
-        if item_path.is_file():
-            name_no_ext = get_name_without_ext(item_path.name)
-            groups[name_no_ext].append(item_path)
+    return _group_paths(files, strip_suffixes)
+
+
+def _group_paths(paths: Iterable[Path], strip_suffixes: Iterable[str] | None = None) -> Iterator[Group]:
+    """按 (所在目录, 规范化的文件名) 分组，不访问磁盘."""
+    return _report_collisions(GroupIndex(strip_suffixes).update(paths))
+
+
+def _stream_groups(
+    paths: Iterable[Path], strip_suffixes: Iterable[str] | None = None
+) -> Iterator[Group]:
+    """每读满 CHUNK_OPS 个路径就产出这一块的分组.
+
+    只在换目录时分块（find 的输出中同一目录的文件是连续的），同一组的文件不会被拆开.
+    """
+    index = GroupIndex(strip_suffixes)
+    count = 0
+    parent = None
+    for path in paths:
+        if count >= CHUNK_OPS and path.parent != parent:
+            yield from _report_collisions(index)
+            index = GroupIndex(strip_suffixes)
+            count = 0
+        index.add(path)
+        count += 1
+        parent = path.parent
+    yield from _report_collisions(index)
+
+
+def _report_collisions(index: GroupIndex) -> Iterator[Group]:
+    """输出经规范化才合并的分组及原因，再产出全部分组."""
+    for group_dir, files in index.collisions():
+        console.print(f"合并为一组 {group_dir}:", markup=False, highlight=False)
+        for path, reasons in files:
+            why = f"（{'、'.join(reasons)}）" if reasons else ""
+            console.print(f"  {path.name}{why}", markup=False, highlight=False)
+    return iter(index)
+
+
+def _scan_groups(
+    directory: Path, *, recursive: bool, strip_suffixes: Iterable[str] | None = None
+) -> tuple[GroupIndex, list[Path]]:
+    """scandir 一次：按文件名分组目录中的文件，并返回需要继续遍历的子目录.
+
+    DirEntry 的类型来自目录项本身，大部分文件系统上不需要额外 stat.
+    """
+    index = GroupIndex(strip_suffixes)
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in ASSET_DIRS:
+                        return GroupIndex(), []
+                    if recursive and entry.name != TRASH_NAME:
+                        subdirs.append(Path(entry.path))
+                elif entry.is_file():
+                    index.add(Path(entry.path))
+    except OSError as e:
+        console.print(f"警告: 无法读取目录 {directory}: {e}")
+        return GroupIndex(), []
+    return index, sorted(subdirs)
+
+
+def _plan_group(plan: MovePlan, base_dir: Path, name_no_ext: str, files: list[Path]) -> None:
+    new_dir = base_dir / name_no_ext.strip()
+    _ensure_asset_dirs(plan, new_dir)
+    for file_path in files:
+        filename = file_path.name
+        if is_image_file(filename):
+            dst_path = new_dir / "thumbnail" / filename
         else:
-            console.print(f"跳过目录: {item_path}")
-    return groups
-
-
-def _handle_multiple(selected_items_list: list[str]) -> None:
-    groups = _group_selected_files(selected_items_list)
-    for name_no_ext, files in groups.items():
-        if not files:
-            continue
-        base_dir = files[0].parent
-        new_dir = base_dir / name_no_ext.strip()
-        _ensure_asset_dirs(new_dir)
-        console.print(f"处理分组: {name_no_ext}")
-        for file_path in files:
-            filename = file_path.name
-            if is_image_file(filename):
-                dst_path = new_dir / "thumbnail" / filename
-            else:
-                dst_path = new_dir / "main_assets" / filename
-            fast_move(str(file_path), str(dst_path))
+            dst_path = new_dir / "main_assets" / filename
+        plan.add(file_path, dst_path)
+
+
+def read_path_list(source: str | Path) -> Iterator[Path]:
+    """逐块读取路径列表（"-" 为标准输入）：按 NUL 分隔（find -print0），没有 NUL 时按行分隔."""
+    if str(source) == "-":
+        yield from _split_paths(sys.stdin.buffer)
+        return
+    with open(source, "rb") as stream:
+        yield from _split_paths(stream)
+
+
+def _split_paths(stream: BinaryIO) -> Iterator[Path]:
+    sep = None
+    rest = b""
+    while block := stream.read(READ_BLOCK):
+        if sep is None:
+            sep = b"\0" if b"\0" in block else b"\n"
+        *items, rest = (rest + block).split(sep)
+        yield from _decode_paths(items, sep)
+    yield from _decode_paths([rest], sep)
+
+
+def _decode_paths(items: list[bytes], sep: bytes | None) -> Iterator[Path]:
+    for item in items:
+        if sep == b"\n":
+            item = item.rstrip(b"\r")
+        if item:
+            yield Path(os.fsdecode(item))
@@ -0,0 +1,60 @@
+"""只追加、每条记录 fsync 的 JSON Lines 日志，用于中断后恢复."""
+
+import json
+import os
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+
+class Journal:
+    """崩溃安全的追加日志. 写入中途崩溃留下的半行在回放时被忽略."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._repair()
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def _repair(self) -> None:
+        # 截掉上次崩溃留下的半行，否则新记录会接在它后面
+        if not self.path.exists():
+            return
+        with self.path.open("rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def append(self, record: dict[str, Any], *, sync: bool = True) -> None:
+        """追加一条记录. sync=False 时只写入系统缓冲区，由之后的 sync() 统一落盘."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def sync(self) -> None:
+        with self._lock:
+            os.fsync(self._file.fileno())
+
+    def replay(self) -> Iterator[dict[str, Any]]:
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    break
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def discard(self) -> None:
+        """任务全部完成后删除日志."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -1,23 +1,337 @@
 from pathlib import Path
-from math import floor, sqrt
+from math import ceil, floor, log2, sqrt
 from subprocess import run
 from datetime import datetime
 from typing import List
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from dataclasses import dataclass
+import os
 import tempfile
 import shutil
 
-def create_thumbnail_montage(image_paths: List[Path], output_dir: str = ".", tmp_dir: str | None = None):
+from PIL import Image, ImageFile
+
+from .thumbnail_cache import ThumbnailCache
+from .thumbnails import to_8bit
+
+# 4096x4096 的大图只取左上角
+CROP_SIZE = 4096
+CROP_BOX = (0, 0, 512, 512)
+CROP_GEOMETRY = "512x512+0+0"
+LAYOUTS = ("single", "pages", "dzi")
+JPEG_QUALITY = 90
+JPEG_MAX_SIZE = 65500
+DZI_TILE = 256
+# Deep Zoom 最高层每次画出的区域边长，须为 DZI_TILE 的整数倍
+DZI_BLOCK = DZI_TILE * 16
+
+
+def _output_file(output_dir: str, layout: str = "single") -> Path:
+    """按时间命名并占用输出位置：单张图片先创建空文件，分页目录、Deep Zoom 的 _files 目录直接创建.
+
+    同一秒内已有输出（或另一次拼图同时在运行）时依次加 _1、_2 后缀.
+    """
+    directory = Path(output_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    base = f"montage_{datetime.now():%Y%m%d_%H%M%S}"
+    n = 0
+    while True:
+        stem = base if n == 0 else f"{base}_{n}"
+        n += 1
+        try:
+            if layout == "pages":
+                (directory / stem).mkdir()
+                return directory / stem
+            if layout == "dzi":
+                (directory / f"{stem}_files").mkdir()
+                return directory / f"{stem}.dzi"
+            (directory / f"{stem}.jpg").open("x").close()
+            return directory / f"{stem}.jpg"
+        except FileExistsError:
+            continue
+
+
+def create_thumbnail_montage(
+    image_paths: List[Path],
+    output_dir: str = ".",
+    tmp_dir: str | None = None,
+    cache: ThumbnailCache | None = None,
+    engine: str = "pillow",
+    workers: int | None = None,
+    layout: str = "single",
+    page_size: int = 8192,
+) -> Path:
     """
-    使用 ImageMagick 将一组图片拼成缩略图蒙太奇。
+    将一组图片拼成缩略图蒙太奇，返回输出文件路径。
 
     image_paths: 图片文件路径列表
     output_dir: 输出目录
-    tmp_dir: 临时文件目录，默认自动创建
+    tmp_dir: 临时文件目录，默认自动创建（仅 magick）
+    cache: 缩略图缓存，命中时不再解码原图裁剪
+    engine: pillow（进程内，默认）或 magick（调用 ImageMagick）
+    workers: 并行解码的线程数（仅 pillow）
+    layout: single 输出一张图片；pages 按 page_size 分成多页（目录）；
+        dzi 输出 Deep Zoom 切片金字塔（.dzi + _files 目录）. 后两种内存占用与图片数量无关（仅 pillow）
+    page_size: 每页的最大边长（像素）
     """
-
     if not image_paths:
         raise ValueError("请提供至少一张图片路径。")
+    if engine == "magick":
+        if layout != "single":
+            raise ValueError("magick 只支持输出单张拼图")
+        return _montage_magick(image_paths, output_dir, tmp_dir, cache)
+    if engine != "pillow":
+        raise ValueError(f"未知的拼图方式：{engine}")
+    if layout not in LAYOUTS:
+        raise ValueError(f"未知的输出方式：{layout}")
+    return _montage_pillow(image_paths, output_dir, cache, workers, layout, page_size)
+
+
+def _tile_size(img_path: Path) -> tuple[int, int]:
+    """只读文件头，不解码像素."""
+    with Image.open(img_path) as img:
+        width, height = img.size
+    if (width, height) == (CROP_SIZE, CROP_SIZE):
+        return CROP_BOX[2] - CROP_BOX[0], CROP_BOX[3] - CROP_BOX[1]
+    return width, height
+
+
+def _limit_decoding(img: ImageFile.ImageFile, bottom: int) -> None:
+    """按行从上到下存储的格式（非交错 PNG、未压缩 TIFF）只解码到 bottom 行；其它格式不变."""
+    if img.info.get("interlace"):
+        return
+    tiles = []
+    for tile in img.tile:
+        if tile.extents is None:
+            return
+        x0, y0, x1, y1 = tile.extents
+        args = tile.args if isinstance(tile.args, tuple) else (tile.args,)
+        # raw 的第三个参数为行序，负数表示从下往上存储（如 BMP）
+        if tile.codec_name not in {"zip", "raw"} or (len(args) > 2 and args[2] < 0):
+            return
+        if y0 < bottom:
+            tiles.append(tile._replace(extents=(x0, y0, x1, min(y1, bottom))))
+    img.tile = tiles
+
+
+def _as_tile(img: Image.Image) -> Image.Image:
+    """转换为可贴到 RGB 画布上的新图片（不与 img 共享数据，原文件可以关闭）."""
+    img = to_8bit(img)
+    return img.convert("RGBA" if img.has_transparency_data else "RGB")
+
+
+def _load_tile(
+    img_path: Path, tmp_dir: Path, index: int, cache: ThumbnailCache | None
+) -> Image.Image:
+    with Image.open(img_path) as img:
+        if img.size != (CROP_SIZE, CROP_SIZE):
+            return _as_tile(img)
+        cached = tmp_dir / f"crop_{index}.png"
+        key = cache.key(img_path, f"crop-{CROP_GEOMETRY}", cached.suffix) if cache else None
+        if cache is not None and key is not None and cache.get(key, cached):
+            with Image.open(cached) as cached_tile:
+                return _as_tile(cached_tile)
+        _limit_decoding(img, CROP_BOX[3])
+        tile = _as_tile(img.crop(CROP_BOX))
+    if cache is not None and key is not None:
+        tile.save(cached)
+        cache.put(key, cached)
+    return tile
+
+
+@dataclass
+class _Grid:
+    """montage -geometry +0+0 的布局：格子为所有图片的最大宽高，图片在格子中居中."""
+
+    sizes: List[tuple[int, int]]
+    cols: int
+    cell_w: int
+    cell_h: int
+
+    @classmethod
+    def for_sizes(cls, sizes: List[tuple[int, int]], cols: int | None = None) -> "_Grid":
+        cols = cols or max(1, floor(sqrt(len(sizes))))
+        return cls(sizes, cols, max(w for w, _ in sizes), max(h for _, h in sizes))
+
+    @property
+    def width(self) -> int:
+        return min(self.cols, len(self.sizes)) * self.cell_w
+
+    @property
+    def height(self) -> int:
+        return ceil(len(self.sizes) / self.cols) * self.cell_h
+
+    def origin(self, index: int) -> tuple[int, int]:
+        w, h = self.sizes[index]
+        x = index % self.cols * self.cell_w + (self.cell_w - w) // 2
+        y = index // self.cols * self.cell_h + (self.cell_h - h) // 2
+        return x, y
+
+    def cells(self, box: tuple[int, int, int, int]) -> List[int]:
+        """与 box (left, top, right, bottom) 相交的格子."""
+        left, top, right, bottom = box
+        cols = range(left // self.cell_w, min(self.cols, ceil(right / self.cell_w)))
+        rows = range(top // self.cell_h, ceil(bottom / self.cell_h))
+        return [i for r in rows for c in cols if (i := r * self.cols + c) < len(self.sizes)]
+
+
+class _Renderer:
+    """在线程池中解码图片并贴到画布上，同时最多 workers * 2 张已解码但未贴上的图片."""
+
+    def __init__(
+        self, paths: List[Path], pool: ThreadPoolExecutor, workers: int, tmp_dir: Path,
+        cache: ThumbnailCache | None,
+    ):
+        self.paths = paths
+        self.pool = pool
+        self.workers = workers
+        self.tmp_dir = tmp_dir
+        self.cache = cache
+
+    def render(self, grid: _Grid, box: tuple[int, int, int, int], first: int = 0) -> Image.Image:
+        """画出 grid 中 box 区域；grid 的第 i 格对应 paths[first + i]."""
+        left, top, right, bottom = box
+        canvas = Image.new("RGB", (right - left, bottom - top))
+
+        def paste(index: int, future: Future[Image.Image]) -> None:
+            tile = future.result()
+            x, y = grid.origin(index)
+            canvas.paste(tile, (x - left, y - top), tile if tile.mode == "RGBA" else None)
+
+        pending: deque[tuple[int, Future[Image.Image]]] = deque()
+        for index in grid.cells(box):
+            if len(pending) >= self.workers * 2:
+                paste(*pending.popleft())
+            path = self.paths[first + index]
+            future = self.pool.submit(_load_tile, path, self.tmp_dir, first + index, self.cache)
+            pending.append((index, future))
+        while pending:
+            paste(*pending.popleft())
+        return canvas
+
+
+def _montage_pillow(
+    image_paths: List[Path],
+    output_dir: str,
+    cache: ThumbnailCache | None,
+    workers: int | None,
+    layout: str,
+    page_size: int,
+) -> Path:
+    workers = workers or os.cpu_count() or 1
+    output = _output_file(output_dir, layout)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool, tempfile.TemporaryDirectory() as tmp:
+            sizes = list(pool.map(_tile_size, image_paths))
+            renderer = _Renderer(image_paths, pool, workers, Path(tmp), cache)
+            if layout == "pages":
+                _write_pages(renderer, sizes, output, page_size)
+            elif layout == "dzi":
+                _write_deep_zoom(renderer, _Grid.for_sizes(sizes), output)
+            else:
+                grid = _Grid.for_sizes(sizes)
+                if max(grid.width, grid.height) > JPEG_MAX_SIZE:
+                    raise ValueError(
+                        f"拼图尺寸 {grid.width}x{grid.height} 超过 JPEG 上限，请使用 --layout pages 或 dzi"
+                    )
+                canvas = renderer.render(grid, (0, 0, grid.width, grid.height))
+                canvas.save(output, quality=JPEG_QUALITY)
+    except BaseException:
+        # 不留下占位的空文件或写了一半的目录
+        if output.is_dir():
+            shutil.rmtree(output, ignore_errors=True)
+        else:
+            output.unlink(missing_ok=True)
+            shutil.rmtree(output.with_name(f"{output.stem}_files"), ignore_errors=True)
+        raise
+    print(f"拼图完成！输出文件：{output}")
+    return output
+
+
+def _write_pages(
+    renderer: _Renderer, sizes: List[tuple[int, int]], output_dir: Path, page_size: int
+) -> Path:
+    """按固定大小分页写入已创建的 output_dir，每页只保留一张画布；格子大小所有页相同."""
+    grid = _Grid.for_sizes(sizes)
+    cols = max(1, page_size // grid.cell_w)
+    per_page = cols * max(1, page_size // grid.cell_h)
+    for page, first in enumerate(range(0, len(sizes), per_page), start=1):
+        page_grid = _Grid(sizes[first:first + per_page], cols, grid.cell_w, grid.cell_h)
+        canvas = renderer.render(page_grid, (0, 0, page_grid.width, page_grid.height), first)
+        canvas.save(output_dir / f"page_{page:03d}.jpg", quality=JPEG_QUALITY)
+    return output_dir
+
+
+def _write_deep_zoom(renderer: _Renderer, grid: _Grid, dzi: Path) -> Path:
+    """写出 Deep Zoom 金字塔（.dzi + _files/层级/列_行.jpg）.
+
+    最高层按 DZI_BLOCK 大小的区域逐块画出再切片，低层由上一层的 2x2 个切片缩小得到，
+    内存占用与图片数量无关.
+    """
+    width, height = grid.width, grid.height
+    tiles_dir = dzi.with_name(f"{dzi.stem}_files")
+    top_level = ceil(log2(max(width, height, 2)))
+
+    level_dir = tiles_dir / str(top_level)
+    # _files 目录已由 _output_file 创建
+    level_dir.mkdir()
+    for block_top in range(0, height, DZI_BLOCK):
+        for block_left in range(0, width, DZI_BLOCK):
+            right = min(block_left + DZI_BLOCK, width)
+            bottom = min(block_top + DZI_BLOCK, height)
+            block = renderer.render(grid, (block_left, block_top, right, bottom))
+            for y in range(0, block.height, DZI_TILE):
+                for x in range(0, block.width, DZI_TILE):
+                    box = (x, y, min(x + DZI_TILE, block.width), min(y + DZI_TILE, block.height))
+                    tile = block.crop(box)
+                    col, row = (block_left + x) // DZI_TILE, (block_top + y) // DZI_TILE
+                    tile.save(level_dir / f"{col}_{row}.jpg", quality=JPEG_QUALITY)
+
+    for level in range(top_level - 1, -1, -1):
+        upper_dir, level_dir = level_dir, tiles_dir / str(level)
+        level_dir.mkdir()
+        width, height = ceil(width / 2), ceil(height / 2)
+        for row in range(ceil(height / DZI_TILE)):
+            for col in range(ceil(width / DZI_TILE)):
+                tile = _downsample_tile(upper_dir, col, row)
+                tile.save(level_dir / f"{col}_{row}.jpg", quality=JPEG_QUALITY)
+
+    dzi.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008"'
+        f' Format="jpg" Overlap="0" TileSize="{DZI_TILE}">\n'
+        f'  <Size Width="{grid.width}" Height="{grid.height}"/>\n'
+        "</Image>\n",
+        encoding="utf-8",
+    )
+    return dzi
+
+
+def _downsample_tile(upper_dir: Path, col: int, row: int) -> Image.Image:
+    """把上一层的 2x2 个切片拼起来缩小一半."""
+    children: dict[tuple[int, int], Image.Image] = {}
+    for dx in (0, 1):
+        for dy in (0, 1):
+            path = upper_dir / f"{col * 2 + dx}_{row * 2 + dy}.jpg"
+            if path.exists():
+                with Image.open(path) as upper:
+                    children[dx, dy] = upper.convert("RGB")
+    width = sum(children[dx, 0].width for dx in (0, 1) if (dx, 0) in children)
+    height = sum(children[0, dy].height for dy in (0, 1) if (0, dy) in children)
+    canvas = Image.new("RGB", (width, height))
+    for (dx, dy), child in children.items():
+        canvas.paste(child, (dx * DZI_TILE, dy * DZI_TILE))
+    return canvas.reduce(2)
+
 
+def _montage_magick(
+    image_paths: List[Path],
+    output_dir: str = ".",
+    tmp_dir: str | None = None,
+    cache: ThumbnailCache | None = None,
+) -> Path:
+    """使用 ImageMagick 拼图，每张图片启动一次 magick identify，大图再启动一次 magick convert."""
     # 临时目录
     if tmp_dir is None:
         tmp_dir_obj = Path(tempfile.mkdtemp())
@@ -38,10 +352,14 @@ def create_thumbnail_montage(image_paths: List[Path], output_dir: str = ".", tmp
             )
             width, height = map(int, result.stdout.split())
 
-            if width == 4096 and height == 4096:
+            if width == CROP_SIZE and height == CROP_SIZE:
                 print(f"检测到大图：{img_path}，裁剪左上角 512x512")
                 tmpfile = tmp_dir_obj / f"crop_{count}.png"
-                run(["magick", "convert", str(img_path), "-crop", "512x512+0+0", "+repage", str(tmpfile)])
+                key = cache.key(img_path, f"crop-{CROP_GEOMETRY}", tmpfile.suffix) if cache else None
+                if cache is None or key is None or not cache.get(key, tmpfile):
+                    run(["magick", "convert", str(img_path), "-crop", CROP_GEOMETRY, "+repage", str(tmpfile)])
+                    if cache is not None and key is not None and tmpfile.exists():
+                        cache.put(key, tmpfile)
                 filelist.append(tmpfile)
             else:
                 filelist.append(img_path)
@@ -50,14 +368,14 @@ def create_thumbnail_montage(image_paths: List[Path], output_dir: str = ".", tmp
         cols = max(1, floor(sqrt(count)))
 
         # 输出文件名
-        now = datetime.now()
-        output_file = Path(output_dir) / f"montage_{now:%Y%m%d_%H%M%S}.jpg"
+        output_file = _output_file(output_dir)
 
         # 调用 ImageMagick montage
         montage_cmd = ["montage", *map(str, filelist), "-geometry", "+0+0", "-tile", f"{cols}x", "-background", "none", str(output_file)]
         run(montage_cmd)
 
         print(f"拼图完成！输出文件：{output_file}")
+        return output_file
 
     finally:
         # 清理临时目录（如果是自动创建的）
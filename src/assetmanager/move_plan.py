@@ -0,0 +1,453 @@
+"""移动计划：先收集全部操作，校验后再一次性执行，可恢复、可撤销.
+
+计划是有序的操作列表（移动、删除、删除空目录），可以序列化为 JSON.
+执行前先把计划写入日志，每完成一个操作记录它的序号（每批统一 fsync）；
+中断后再次运行时按日志跳过已完成的操作继续执行，或按相反顺序撤销它们.
+不按磁盘状态推断：同名目录逐层上移时，后面的操作会改变前面操作的源和目标.
+删除的文件先移到根目录下的回收目录，全部完成后才真正删除，因此也能撤销.
+
+每个目标目录只创建一次；每对 (源目录, 目标目录) 只比较一次设备号，
+同一设备上直接 os.rename，跨设备的移动交给线程池复制后删除.
+进度汇总显示，不再每个文件输出一行.
+"""
+
+import errno
+import os
+import shutil
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
+
+from .cache import cache_file
+from .journal import Journal
+
+COPY_WORKERS = 4
+MOVE = "move"
+DELETE = "delete"
+RMDIR = "rmdir"
+TRASH_NAME = ".assetmanager-trash"
+console = Console()
+
+
+class MovePlanError(RuntimeError):
+    """计划中有冲突，未执行任何操作."""
+
+
+@dataclass
+class MoveOp:
+    kind: str
+    src: Path
+    dst: Path | None = None
+
+    def to_record(self) -> dict[str, str]:
+        record = {"op": self.kind, "src": str(self.src)}
+        if self.dst is not None:
+            record["dst"] = str(self.dst)
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict[str, str]) -> "MoveOp":
+        dst = record.get("dst")
+        return cls(record["op"], Path(record["src"]), Path(dst) if dst is not None else None)
+
+
+@dataclass
+class MoveResult:
+    moved: int = 0
+    copied: int = 0
+    deleted: int = 0
+    failed: list[tuple[Path, Path | None, str]] = field(default_factory=list)
+    # 有失败时后续操作不再执行，日志保留以便继续或撤销
+    complete: bool = True
+
+
+@dataclass
+class MovePlan:
+    ops: list[MoveOp] = field(default_factory=list)
+    # 即使没有文件移入也要创建的目录
+    dirs: set[Path] = field(default_factory=set)
+    # 目标 -> (操作序号, 源)，用于把计划中的路径反推回磁盘上的位置
+    _sources: dict[Path, tuple[int, Path]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        for i, op in enumerate(self.ops):
+            if op.kind == MOVE and op.dst is not None:
+                self._sources[op.dst] = (i, op.src)
+
+    def add(self, src: Path, dst: Path) -> None:
+        self._sources[Path(dst)] = (len(self.ops), Path(src))
+        self.ops.append(MoveOp(MOVE, Path(src), Path(dst)))
+
+    def delete(self, path: Path) -> None:
+        self.ops.append(MoveOp(DELETE, Path(path)))
+
+    def rmdir(self, path: Path) -> None:
+        self.ops.append(MoveOp(RMDIR, Path(path)))
+
+    def ensure(self, *dirs: Path) -> None:
+        self.dirs.update(Path(d) for d in dirs)
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def origin(self, path: Path, before: int | None = None) -> Path:
+        """计划中位于 path 的文件在执行前的磁盘位置，沿已记录的移动（包括上级目录的移动）反推.
+
+        只考虑序号小于 before 的操作，互换位置的计划也不会循环.
+        """
+        path = Path(path)
+        before = len(self.ops) if before is None else before
+        for ancestor in (path, *path.parents):
+            found = self._sources.get(ancestor)
+            if found is not None and found[0] < before:
+                index, src = found
+                return self.origin(src / path.relative_to(ancestor), index)
+        return path
+
+    def to_records(self) -> dict[str, Any]:
+        return {"dirs": sorted(map(str, self.dirs)), "ops": [op.to_record() for op in self.ops]}
+
+    @classmethod
+    def from_records(cls, data: dict[str, Any]) -> "MovePlan":
+        return cls([MoveOp.from_record(r) for r in data["ops"]], {Path(d) for d in data["dirs"]})
+
+    def validate(self, *, check_disk: bool = True) -> list[str]:
+        """检查冲突，O(n)：同一源被处理两次、两个源移到同一目标.
+
+        check_disk=True 时还检查目标是否已存在（且不会在此之前被移走）.
+        """
+        problems = []
+        sources: set[Path] = set()
+        targets: set[Path] = set()
+        for op in self.ops:
+            if op.dst is not None:
+                if op.dst in targets:
+                    problems.append(f"多个文件移动到同一目标: {op.dst}")
+                elif check_disk and op.dst not in sources and os.path.lexists(op.dst):
+                    problems.append(f"目标已存在: {op.dst}")
+                targets.add(op.dst)
+            if op.src in sources:
+                problems.append(f"重复处理: {op.src}")
+            sources.add(op.src)
+        return problems
+
+    def describe(self) -> Iterator[str]:
+        for directory in sorted(self.dirs):
+            yield f"创建目录: {directory}"
+        for op in self.ops:
+            if op.kind == MOVE:
+                yield f"移动: {op.src} -> {op.dst}"
+            elif op.kind == DELETE:
+                yield f"删除: {op.src}"
+            else:
+                yield f"删除空目录: {op.src}"
+
+    def execute(
+        self,
+        trash: Path | None = None,
+        journal: Journal | None = None,
+        workers: int = COPY_WORKERS,
+        show_progress: bool = True,
+        done: set[int] | frozenset[int] = frozenset(),
+    ) -> MoveResult:
+        """按顺序执行 done（日志中已完成的序号）以外的操作.
+
+        删除操作需要 trash（与被删除的文件在同一磁盘）.
+        """
+        todo = [(i, op) for i, op in enumerate(self.ops) if i not in done]
+        # 继续执行时只为剩余操作建目录，已被删除的空目录不会重新出现
+        removed = {op.src for i, op in enumerate(self.ops) if i in done and op.kind == RMDIR}
+        targets = (self.dirs - removed) | {op.dst.parent for _, op in todo if op.dst is not None}
+        created = sorted(d for d in targets if not d.exists())
+        if journal is not None:
+            journal.append({"created": [str(d) for d in created]})
+        for directory in created:
+            directory.mkdir(parents=True, exist_ok=True)
+        with _progress(len(todo), show_progress) as advance:
+            return _execute(todo, trash, workers, advance, journal)
+
+    def rollback(
+        self,
+        created: list[Path],
+        trash: Path | None,
+        done: set[int] | frozenset[int],
+        journal: Journal | None = None,
+        show_progress: bool = True,
+    ) -> MoveResult:
+        """按相反顺序撤销 done 中的操作，再删除执行时创建的空目录.
+
+        撤销成功的操作记入日志，撤销中断后再次撤销不会重复处理.
+        """
+        result = MoveResult()
+        with _progress(len(done), show_progress) as advance:
+            for i in sorted(done, reverse=True):
+                op = self.ops[i]
+                try:
+                    if op.kind == RMDIR:
+                        op.src.mkdir(parents=True, exist_ok=True)
+                    else:
+                        op.src.parent.mkdir(parents=True, exist_ok=True)
+                        shutil.move(_target(op, i, trash), op.src)
+                except OSError as e:
+                    result.failed.append((op.src, op.dst, str(e)))
+                    result.complete = False
+                else:
+                    result.moved += 1
+                    if journal is not None:
+                        journal.append({"undone": i}, sync=False)
+                advance()
+        if journal is not None:
+            journal.sync()
+        for directory in sorted(created, key=lambda d: len(d.parts), reverse=True):
+            try:
+                directory.rmdir()
+            except OSError:
+                # 不为空（撤销失败或有新文件）时保留
+                pass
+        return result
+
+
+def _trash_path(trash: Path | None, index: int, src: Path) -> Path:
+    if trash is None:
+        raise MovePlanError("删除操作需要回收目录")
+    return trash / str(index) / src.name
+
+
+def _target(op: MoveOp, index: int, trash: Path | None) -> Path:
+    return op.dst if op.dst is not None else _trash_path(trash, index, op.src)
+
+
+@contextmanager
+def _progress(total: int, show: bool) -> Iterator[Callable[[], None]]:
+    progress = Progress(
+        TextColumn("[bold]移动文件"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        disable=not show,
+    )
+    with progress:
+        task = progress.add_task("", total=total)
+        yield lambda: progress.advance(task)
+
+
+def _execute(
+    todo: list[tuple[int, MoveOp]],
+    trash: Path | None,
+    workers: int,
+    advance: Callable[[], None],
+    journal: Journal | None,
+) -> MoveResult:
+    result = MoveResult()
+    same_device: dict[tuple[Path, Path], bool] = {}
+    batch: list[tuple[int, Path, Path]] = []
+
+    def done(index: int) -> None:
+        # 只写入系统缓冲区，进程被杀掉也不会丢；每批结束时统一 fsync
+        if journal is not None:
+            journal.append({"done": index}, sync=False)
+        advance()
+
+    def flush() -> bool:
+        _move_batch(batch, same_device, workers, result, done)
+        batch.clear()
+        if journal is not None:
+            journal.sync()
+        return not result.failed
+
+    for i, op in todo:
+        if op.kind == MOVE and op.dst is not None:
+            batch.append((i, op.src, op.dst))
+            continue
+        # 删除、删除空目录依赖之前的移动，先执行完已收集的移动
+        if not flush():
+            break
+        error = _remove(op, i, trash)
+        if error is not None:
+            result.failed.append((op.src, None, error))
+            break
+        result.deleted += 1
+        done(i)
+    else:
+        flush()
+    if journal is not None:
+        journal.sync()
+    result.complete = not result.failed
+    return result
+
+
+def _remove(op: MoveOp, index: int, trash: Path | None) -> str | None:
+    try:
+        if op.kind == DELETE:
+            target = _trash_path(trash, index, op.src)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(op.src, target)
+        else:
+            op.src.rmdir()
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def _move_batch(
+    batch: list[tuple[int, Path, Path]],
+    same_device: dict[tuple[Path, Path], bool],
+    workers: int,
+    result: MoveResult,
+    done: Callable[[int], None],
+) -> None:
+    """执行一批移动，每完成一个调用 done(序号)；失败的只记入 result.
+
+    跨设备的移动先攒起来交给线程池；后面的操作要用到攒下的目标（或要占用攒下的源）时，
+    先把攒下的复制执行完，保证依赖关系与计划顺序一致.
+    """
+    copies: list[tuple[int, Path, Path]] = []
+    pending: set[Path] = set()
+    for i, src, dst in batch:
+        if _under(src, pending) or _under(dst, pending):
+            _copy_all(copies, workers, result, done)
+            copies.clear()
+            pending.clear()
+        pair = (src.parent, dst.parent)
+        if pair not in same_device:
+            same_device[pair] = _same_device(*pair)
+        if same_device[pair]:
+            try:
+                os.rename(src, dst)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    result.failed.append((src, dst, str(e)))
+                    continue
+                # 设备号相同但实际不能改名（部分网络盘、挂载点），退回复制
+            else:
+                result.moved += 1
+                done(i)
+                continue
+        copies.append((i, src, dst))
+        pending.update((src, dst))
+    _copy_all(copies, workers, result, done)
+
+
+def _under(path: Path, roots: set[Path]) -> bool:
+    return bool(roots) and any(p in roots for p in (path, *path.parents))
+
+
+def _copy_all(
+    copies: list[tuple[int, Path, Path]],
+    workers: int,
+    result: MoveResult,
+    done: Callable[[int], None],
+) -> None:
+    if not copies:
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = pool.map(_copy_move, [src for _, src, _ in copies], [dst for *_, dst in copies])
+        for (i, src, dst), error in zip(copies, errors):
+            if error is None:
+                result.copied += 1
+                done(i)
+            else:
+                result.failed.append((src, dst, error))
+
+
+def _same_device(src_dir: Path, dst_dir: Path) -> bool:
+    try:
+        return os.stat(src_dir).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+
+def _copy_move(src: Path, dst: Path) -> str | None:
+    try:
+        shutil.move(src, dst)
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def journal_path(root: Path) -> Path:
+    return cache_file("move-journal", root, ".jsonl")
+
+
+def run_plan(plan: MovePlan, root: Path, *, dry_run: bool = False) -> MoveResult | None:
+    """校验并执行计划；dry_run 时只打印计划（不访问磁盘）并返回 None.
+
+    执行前把计划写入日志，全部完成后删除日志和回收目录；
+    未完成时保留日志，下次用 recover 继续或撤销.
+    """
+    problems = plan.validate(check_disk=not dry_run)
+    if dry_run:
+        for line in plan.describe():
+            console.print(line, markup=False, highlight=False)
+        for problem in problems:
+            console.print(f"❌ {problem}", markup=False)
+        console.print(f"共 {len(plan)} 个操作，{len(problems)} 个冲突（未检查磁盘上已存在的目标）")
+        return None
+    if problems:
+        raise MovePlanError("\n".join(problems))
+    trash = Path(root) / TRASH_NAME
+    journal = Journal(journal_path(root))
+    journal.append({"plan": plan.to_records(), "trash": str(trash)})
+    result = plan.execute(trash, journal)
+    _finish(result, journal, trash)
+    return result
+
+
+def recover(root: Path, *, rollback: bool = False) -> MoveResult | None:
+    """继续或撤销 root 上次未完成的计划；没有未完成的计划时返回 None."""
+    path = journal_path(root)
+    if not path.exists():
+        return None
+    journal = Journal(path)
+    plan = None
+    trash = None
+    created: list[Path] = []
+    done: set[int] = set()
+    for record in journal.replay():
+        if "plan" in record:
+            plan = MovePlan.from_records(record["plan"])
+            trash = Path(record["trash"])
+        if "done" in record:
+            done.add(record["done"])
+        if "undone" in record:
+            done.discard(record["undone"])
+        created.extend(Path(d) for d in record.get("created", ()))
+    if plan is None:
+        journal.discard()
+        return None
+    if rollback:
+        result = plan.rollback(created, trash, done, journal)
+    else:
+        result = plan.execute(trash, journal, done=done)
+    _finish(result, journal, trash)
+    return result
+
+
+def _finish(result: MoveResult, journal: Journal, trash: Path | None) -> None:
+    if not result.complete:
+        journal.close()
+        return
+    if trash is not None:
+        shutil.rmtree(trash, ignore_errors=True)
+    journal.discard()
+
+
+def report(result: MoveResult) -> None:
+    total = result.moved + result.copied
+    console.print(
+        f"移动 {total} 个（其中跨磁盘复制 {result.copied} 个），"
+        f"删除 {result.deleted} 个，失败 {len(result.failed)} 个"
+    )
+    for src, dst, error in result.failed:
+        target = f" -> {dst}" if dst is not None else ""
+        console.print(f"移动失败: {src}{target}, 错误: {error}")
+    if not result.complete:
+        console.print("⚠️ 未全部完成：重新运行会继续执行，加 --rollback 撤销已完成的操作")
@@ -0,0 +1,157 @@
+"""set-private-images 的流水线：缩略图在进程池中生成，原图压缩在 I/O 线程池中进行.
+
+同时在流水线中的图片数量有上限（生成中 + 等待压缩），解码后的大图不会在内存中堆积.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Iterable
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
+
+from .archive_backends import ArchiveBackend, ArchiveError
+from .compression_planner import plan_file
+from .file_organizer import is_image_file
+from .thumbnail_cache import ThumbnailCache
+from .thumbnails import THUMBNAIL_SIZE, save_thumbnail
+
+PRIVATE_SUFFIX = ".priv"
+# 每个生成缩略图的进程最多对应几张在流水线中的图片
+IN_FLIGHT_PER_WORKER = 2
+
+
+def find_images(path: Path) -> list[Path]:
+    return [
+        p for p in path.rglob("*")
+        if is_image_file(str(p)) and "thumbnail" not in p.parts and "main_assets" not in p.parts
+    ]
+
+
+def archive_original(img_path: Path, backend: ArchiveBackend) -> Path:
+    """把原图压缩到 原图片名/main_assets/原图片名.priv 并删除原图；PNG/JPG 等已压缩的格式只存储."""
+    output = archive_path(img_path)
+    backend.update(output, img_path.parent, [img_path.name], plan_file(img_path).mode)
+    img_path.unlink()
+    return output
+
+
+def archive_path(img_path: Path) -> Path:
+    """同一目录中文件名相同、扩展名不同的图片（rock.bmp、rock.tif）压缩到同一个 .priv."""
+    return img_path.parent / img_path.stem / "main_assets" / f"{img_path.stem}{PRIVATE_SUFFIX}"
+
+
+def _targets(img_path: Path) -> Path:
+    base = img_path.parent / img_path.stem
+    (base / "main_assets").mkdir(parents=True, exist_ok=True)
+    (base / "thumbnail").mkdir(parents=True, exist_ok=True)
+    return base / "thumbnail" / img_path.name
+
+
+def set_private_images(
+    images: Iterable[Path],
+    backend: ArchiveBackend,
+    workers: int | None = None,
+    io_workers: int = 2,
+    cache: ThumbnailCache | None = None,
+) -> tuple[int, int]:
+    """为每张图片生成缩略图、压缩原图并删除原图，返回 (成功数, 失败数).
+
+    workers 为生成缩略图的进程数，io_workers 为压缩原图的线程数.
+    给出 cache 时先查缓存，命中的图片不再解码.
+    缩略图生成失败的图片不会被压缩或删除.
+    """
+    images = list(images)
+    workers = workers or os.cpu_count() or 1
+    # 获取槽位后才提交缩略图任务，压缩完成后释放
+    slots = threading.BoundedSemaphore(workers * IN_FLIGHT_PER_WORKER)
+    lock = threading.Lock()
+    # 同一个 .priv 同时只能有一个线程更新，否则会写坏压缩包
+    archive_locks: defaultdict[Path, threading.Lock] = defaultdict(threading.Lock)
+    counts = {"ok": 0, "failed": 0}
+    started = time.perf_counter()
+    progress = Progress(
+        TextColumn("[bold]私有化图片"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("{task.fields[rate]:.1f} 张/秒"),
+        TimeElapsedColumn(),
+    )
+
+    with (
+        progress,
+        ProcessPoolExecutor(max_workers=workers) as thumbs,
+        ThreadPoolExecutor(max_workers=io_workers) as io,
+    ):
+        task = progress.add_task("", total=len(images), rate=0.0)
+
+        def finish(ok: bool) -> None:
+            with lock:
+                counts["ok" if ok else "failed"] += 1
+                done = counts["ok"] + counts["failed"]
+            progress.update(task, completed=done, rate=done / (time.perf_counter() - started))
+            slots.release()
+
+        def archive(
+            img_path: Path, thumb: Future[tuple[int, int]], dst: Path, key: str | None
+        ) -> None:
+            # 无论哪一步抛出什么异常都要 finish，否则槽位不释放，最后的等待会一直卡住
+            ok = False
+            try:
+                try:
+                    thumb.result()
+                except Exception as e:
+                    progress.console.print(f"❌ Error creating thumbnail for {img_path}: {e}")
+                    return
+                if cache is not None and key is not None:
+                    try:
+                        cache.put(key, dst)
+                    except OSError as e:
+                        progress.console.print(f"⚠️ 无法写入缩略图缓存 {dst}: {e}")
+                with lock:
+                    archive_lock = archive_locks[archive_path(img_path)]
+                with archive_lock:
+                    archive_original(img_path, backend)
+                ok = True
+            except (ArchiveError, OSError) as e:
+                progress.console.print(f"❌ {backend.name} compression failed for {img_path}: {e}")
+            except Exception as e:
+                progress.console.print(f"❌ 处理失败 {img_path}: {e}")
+            finally:
+                finish(ok)
+
+        def on_thumbnail(
+            img_path: Path, dst: Path, key: str | None, thumb: Future[tuple[int, int]]
+        ) -> None:
+            # 在进程池的回调线程中执行，只负责把压缩任务交给 I/O 线程池
+            io.submit(archive, img_path, thumb, dst, key)
+
+        for img_path in images:
+            slots.acquire()
+            try:
+                dst = _targets(img_path)
+                key = None
+                if cache is not None:
+                    key = cache.key(img_path, f"thumbnail-{THUMBNAIL_SIZE}", dst.suffix)
+                    if cache.get(key, dst):
+                        # 命中缓存：不需要生成，直接进入压缩
+                        thumb: Future[tuple[int, int]] = Future()
+                        thumb.set_result((0, 0))
+                        io.submit(archive, img_path, thumb, dst, None)
+                        continue
+                thumb = thumbs.submit(save_thumbnail, img_path, dst)
+            except (OSError, BrokenProcessPool) as e:
+                # 进程池崩溃后每次提交都会失败，逐张计为失败，释放槽位以免卡住
+                progress.console.print(f"❌ Error preparing {img_path}: {e}")
+                finish(False)
+                continue
+            thumb.add_done_callback(partial(on_thumbnail, img_path, dst, key))
+        # 等待所有图片走完流水线；之后才能关闭线程池（回调仍可能提交压缩任务）
+        for _ in range(workers * IN_FLIGHT_PER_WORKER):
+            slots.acquire()
+    return counts["ok"], counts["failed"]
@@ -0,0 +1,180 @@
+"""解压/压缩共用的任务调度器.
+
+- 按大小从大到小调度，避免最后剩一个大任务拖尾
+- CPU 密集任务（如 7z -mx=9）与 I/O 密集任务（如 zip 流式解压）分别限制并发数
+- 每个设备同时在处理的字节数有上限，避免机械盘被并发随机读写拖垮
+- 多线程任务（如 7z -mmt=N）可以占用多个槽位，使并发任务的线程总数不超过核数
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from rich.console import Console
+
+CPU = "cpu"
+IO = "io"
+console = Console()
+
+
+@dataclass
+class Job:
+    name: str
+    size: int
+    run: Callable[[], Any]
+    kind: str = CPU
+    # 源文件所在设备（st_dev）；None 表示不受 I/O 字节上限约束
+    device: int | None = None
+    # 占用的并发槽位数，多线程任务按线程数计
+    slots: int = 1
+    result: Any = None
+    error: BaseException | None = None
+    elapsed: float = 0.0
+    context: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        """MB/s."""
+        return self.size / 1024 / 1024 / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def device_of(path: Path) -> int | None:
+    try:
+        return path.stat().st_dev
+    except OSError:
+        return None
+
+
+def parse_size(text: str | None) -> int | None:
+    """把 '512M'、'2G'、'1048576' 这类写法转换为字节数；格式不对时抛出 ValueError."""
+    if not text:
+        return None
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    value = text.strip().upper().removesuffix("B")
+    try:
+        if value and value[-1] in units:
+            size = int(float(value[:-1]) * units[value[-1]])
+        else:
+            size = int(value)
+    except ValueError:
+        raise ValueError(f"无法识别的大小: {text!r}，应为整数字节数或带 K/M/G/T 单位，如 512M、2G") from None
+    if size < 0:
+        raise ValueError(f"大小不能为负数: {text!r}")
+    return size
+
+
+class JobScheduler:
+    """按大小优先、分类限流、按设备限制在途字节数的线程池调度器.
+
+    jobs: CPU 密集任务的并发槽位上限；每个任务占用 job.slots 个槽位，
+        超过上限的任务在该类任务全部空闲时单独运行
+    io_jobs: I/O 密集任务的并发上限，默认与 jobs 相同
+    io_limit: 每个设备上同时处理的字节数上限；单个任务超过上限时在该设备空闲时单独运行
+    """
+
+    def __init__(
+        self,
+        jobs: int | None = None,
+        io_limit: int | None = None,
+        io_jobs: int | None = None,
+        *,
+        report: bool = True,
+    ) -> None:
+        self.limits = {CPU: jobs or os.cpu_count() or 1, IO: io_jobs or jobs or os.cpu_count() or 1}
+        self.io_limit = io_limit
+        self.report = report
+        self._pending: list[tuple[int, int, Job]] = []
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._running = {CPU: 0, IO: 0}
+        self._in_flight: dict[int, int] = {}
+        self.finished: list[Job] = []
+
+    def submit(self, job: Job) -> None:
+        with self._lock:
+            self._counter += 1
+            # 按大小降序，同样大小按提交顺序
+            bisect.insort(self._pending, (-job.size, self._counter, job))
+
+    def _fits(self, job: Job) -> bool:
+        running = self._running[job.kind]
+        if running and running + job.slots > self.limits[job.kind]:
+            return False
+        if self.io_limit is None or job.device is None:
+            return True
+        in_flight = self._in_flight.get(job.device, 0)
+        return in_flight == 0 or in_flight + job.size <= self.io_limit
+
+    def _take(self) -> Job | None:
+        with self._lock:
+            for i, (_, _, job) in enumerate(self._pending):
+                if self._fits(job):
+                    del self._pending[i]
+                    self._running[job.kind] += job.slots
+                    if job.device is not None:
+                        self._in_flight[job.device] = self._in_flight.get(job.device, 0) + job.size
+                    return job
+        return None
+
+    def _release(self, job: Job) -> None:
+        with self._lock:
+            self._running[job.kind] -= job.slots
+            if job.device is not None:
+                self._in_flight[job.device] -= job.size
+
+    @staticmethod
+    def _execute(job: Job) -> Job:
+        start = time.perf_counter()
+        try:
+            job.result = job.run()
+        except Exception as e:
+            job.error = e
+        job.elapsed = time.perf_counter() - start
+        return job
+
+    def as_completed(self) -> Iterator[Job]:
+        """运行所有任务，按完成顺序产出；迭代过程中可以继续 submit 新任务."""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.limits[CPU] + self.limits[IO]) as pool:
+            running: set[Future[Job]] = set()
+            while True:
+                while (job := self._take()) is not None:
+                    running.add(pool.submit(self._execute, job))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = future.result()
+                    self._release(job)
+                    self.finished.append(job)
+                    if self.report:
+                        self._report(job)
+                    yield job
+        if self.report and self.finished:
+            self._summary(time.perf_counter() - started)
+
+    def run(self) -> list[Job]:
+        return list(self.as_completed())
+
+    @staticmethod
+    def _report(job: Job) -> None:
+        status = "❌" if job.error else "⏱️"
+        error = f"，错误: {type(job.error).__name__}: {job.error}" if job.error else ""
+        console.print(
+            f"{status} {job.name}: {job.size / 1024 / 1024:.1f} MB，"
+            f"{job.elapsed:.1f}s，{job.throughput:.1f} MB/s{error}"
+        )
+
+    def _summary(self, wall: float) -> None:
+        total = sum(j.size for j in self.finished)
+        rate = total / 1024 / 1024 / wall if wall > 0 else 0.0
+        console.print(
+            f"📊 共 {len(self.finished)} 个任务，{total / 1024 / 1024:.1f} MB，"
+            f"耗时 {wall:.1f}s，总吞吐 {rate:.1f} MB/s"
+        )
@@ -1,102 +1,263 @@
+import os
 import shutil
-import subprocess
-from pathlib import Path
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
 
 from rich.console import Console
 
+from .dedup import files_identical
+from .move_plan import MovePlan
+from .tree_snapshot import TreeSnapshot, parallel_walk
+
 VIDEO_EXTENSIONS = {".mp4", ".srt", ".mkv", ".avi", ".mov", ".wmv", ".flv", ".webm"}
+USELESS_DIR_NAMES = {"__MACOSX", ".alg_meta"}
+# 最后一项是 compress 写在压缩包内的清单（archive_manifest.MANIFEST_NAME），解压时不需要
+USELESS_FILE_NAMES = {"._Thumbs.db", ".DS_Store", ".assetmanager-manifest.json"}
+CATEGORY_NAMES = (
+    "main_assets_has_subdirs",
+    "main_assets_multiple_files",
+    "main_assets_empty",
+    "thumbnail_has_subdirs",
+    "thumbnail_multiple_files",
+    "thumbnail_empty",
+    "container_has_extra_files",
+    "incorrect_special_structure",
+    "leaf_missing_special",
+)
 console = Console()
+# 警告输出到 stderr，避免混入 validate --format jsonl 的输出
+err_console = Console(stderr=True)
 
 
-def validate_structure(root: Path) -> dict[str, list[Path]]:
-    categories: dict[str, list[Path]] = {
-        "main_assets_has_subdirs": [],
-        "main_assets_multiple_files": [],
-        "main_assets_empty": [],
-        "thumbnail_has_subdirs": [],
-        "thumbnail_multiple_files": [],
-        "thumbnail_empty": [],
-        "container_has_extra_files": [],
-        "incorrect_special_structure": [],
-        "leaf_missing_special": [],
-    }
-
-    def _is_under_directory(path: Path, ancestor_dir_name: str) -> bool:
-        return any(parent.name == ancestor_dir_name for parent in path.parents)
-
-    for folder in root.rglob("*"):
-        if folder.is_file():
-            continue
-        subdirs = [d for d in folder.iterdir() if d.is_dir()]
-        files = [f for f in folder.iterdir() if f.is_file()]
-        subdir_names = {d.name for d in subdirs}
-        # 1. 检查特殊目录
-        if folder.name in {"main_assets", "thumbnail"}:
-            if subdirs:
-                if folder.name == "main_assets":
-                    categories["main_assets_has_subdirs"].append(folder)
-                else:
-                    categories["thumbnail_has_subdirs"].append(folder)
-            if len(files) > 1:
-                if folder.name == "main_assets":
-                    categories["main_assets_multiple_files"].append(folder)
-                else:
-                    categories["thumbnail_multiple_files"].append(folder)
-            if len(files) + len(subdirs) == 0:
-                if folder.name == "main_assets":
-                    categories["main_assets_empty"].append(folder)
-                else:
-                    categories["thumbnail_empty"].append(folder)
-            continue
-        # main_assets_others 中允许任意文件和子目录，这里跳过main_assets_others中的目录的检查
-        if _is_under_directory(folder, "main_assets_others"):
+def _matches(name: str, patterns: frozenset[str]) -> bool:
+    if name in patterns:
+        return True
+    return any(fnmatchcase(name, p) for p in patterns if any(c in p for c in "*?["))
+
+
+@dataclass(frozen=True)
+class JunkRules:
+    """无用文件/目录规则：整理时据此删除，解压时据此过滤条目，使其不落盘. 名字支持通配符."""
+
+    dir_names: frozenset[str] = frozenset(USELESS_DIR_NAMES)
+    file_names: frozenset[str] = frozenset(USELESS_FILE_NAMES)
+
+    def extended(self, names: Iterable[str] | None) -> "JunkRules":
+        """追加的名字同时作用于文件和目录."""
+        extra = frozenset(names or ())
+        return JunkRules(self.dir_names | extra, self.file_names | extra)
+
+    def is_junk_dir(self, name: str) -> bool:
+        return _matches(name, self.dir_names)
+
+    def is_junk_file(self, name: str) -> bool:
+        return _matches(name, self.file_names)
+
+    def is_junk_member(self, member: str) -> bool:
+        """作用于压缩包内的相对路径：任一级目录是无用目录，或文件名是无用文件."""
+        parts = PurePosixPath(member.replace("\\", "/")).parts
+        if not parts:
+            return False
+        return any(self.is_junk_dir(p) for p in parts) or self.is_junk_file(parts[-1])
+
+    def seven_zip_excludes(self) -> list[str]:
+        """7z 的递归排除参数，匹配的文件和目录（连同其内容）都不会被解出."""
+        return [f"-xr!{name}" for name in sorted(self.dir_names | self.file_names)]
+
+
+DEFAULT_JUNK_RULES = JunkRules()
+
+
+def check_folder(folder: Path, subdir_names: set[str], file_count: int) -> list[str]:
+    """按目录的直接子项判断其问题类型，返回命中的分类名."""
+    found: list[str] = []
+    # 1. 检查特殊目录
+    if folder.name in {"main_assets", "thumbnail"}:
+        if subdir_names:
+            found.append(f"{folder.name}_has_subdirs")
+        if file_count > 1:
+            found.append(f"{folder.name}_multiple_files")
+        if file_count + len(subdir_names) == 0:
+            found.append(f"{folder.name}_empty")
+        return found
+    # main_assets_others 中允许任意文件和子目录，这里跳过main_assets_others中的目录的检查
+    if any(parent.name == "main_assets_others" for parent in folder.parents):
+        return found
+    # 2. 如果不是特殊目录，检查是否包含多余文件
+    if file_count and folder.name != "main_assets_others":
+        found.append("container_has_extra_files")
+    # 3. 如果不是特殊目录，且包含 main_assets 或 thumbnail，检查其结构是否正确
+    expected1 = {"main_assets", "thumbnail"}
+    expected2 = {"main_assets", "thumbnail", "main_assets_others"}
+    if ("main_assets" in subdir_names) or ("thumbnail" in subdir_names):
+        if subdir_names not in (expected1, expected2):
+            found.append("incorrect_special_structure")
+    if not subdir_names and folder.name != "main_assets_others":
+        found.append("leaf_missing_special")
+    return found
+
+
+def _list_folder(folder: Path) -> tuple[tuple[set[str], int], list[Path]]:
+    subdir_names: set[str] = set()
+    descend: list[str] = []
+    file_count = 0
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    file_count += 1
+                    continue
+                subdir_names.add(entry.name)
+                # 不跟随目录符号链接，与 TreeSnapshot 一致
+                if not entry.is_symlink():
+                    descend.append(entry.name)
+    except OSError as e:
+        err_console.print(f"⚠️ 无法读取目录: {folder} - {e}")
+    return (subdir_names, file_count), [folder / name for name in sorted(descend)]
+
+
+def validate_structure(
+    root: Path, snapshot: TreeSnapshot | None = None, workers: int = 1
+) -> Iterator[tuple[str, Path]]:
+    """逐个产出 (问题分类, 目录)，按目录名排序的深度优先顺序，与 workers 数量无关.
+
+    不传 snapshot 时边列目录边检查，不在内存中保留整棵树.
+    """
+    if snapshot is not None:
+        for node in snapshot.walk():
+            if not node.is_dir:
+                continue
+            subdir_names = {c.name for c in node.children.values() if c.is_dir}
+            file_count = len(node.children) - len(subdir_names)
+            folder = node.path
+            for category in check_folder(folder, subdir_names, file_count):
+                yield category, folder
+        return
+    for folder, (subdir_names, file_count) in parallel_walk(Path(root), _list_folder, workers):
+        if folder == Path(root):
             continue
-        # 2. 如果不是特殊目录，检查是否包含多余文件
-        if files and folder.name != "main_assets_others":
-            categories["container_has_extra_files"].append(folder)
-        # 3. 如果不是特殊目录，且包含 main_assets 或 thumbnail，检查其结构是否正确
-        expected1 = {"main_assets", "thumbnail"}
-        expected2 = {"main_assets", "thumbnail", "main_assets_others"}
-        if ("main_assets" in subdir_names) or ("thumbnail" in subdir_names):
-            if subdir_names not in (expected1, expected2):
-                categories["incorrect_special_structure"].append(folder)
-        if not subdirs and folder.name != "main_assets_others":
-            categories["leaf_missing_special"].append(folder)
+        for category in check_folder(folder, subdir_names, file_count):
+            yield category, folder
+
+
+def group_findings(findings: Iterable[tuple[str, Path]]) -> dict[str, list[Path]]:
+    """把 validate_structure 的结果按分类汇总."""
+    categories: dict[str, list[Path]] = {name: [] for name in CATEGORY_NAMES}
+    for category, folder in findings:
+        categories[category].append(folder)
     return categories
 
 
-def fix_duplicate_named_dirs(path: Path) -> None:
-    for dir in sorted(path.rglob("*"), reverse=True):
-        if dir.is_dir() and dir.parent.name == dir.name:
+def fix_duplicate_named_dirs(
+    path: Path, snapshot: TreeSnapshot | None = None, plan: MovePlan | None = None
+) -> None:
+    """合并与父目录同名的目录. 给出 plan 时只记录操作并同步快照，不修改磁盘."""
+    snapshot = snapshot if snapshot is not None else TreeSnapshot(path)
+    for node in snapshot.walk(topdown=False):
+        if not node.is_dir or node.parent is None:
+            continue
+        dir = node.path
+        if dir.parent.name == dir.name:
             console.print(f"发现重复目录: {dir}")
-            merge_directories(dir, dir.parent)
+            merge_directories(dir, dir.parent, snapshot, plan)
+
+
+def _list_dir(path: Path, snapshot: TreeSnapshot | None) -> list[tuple[Path, bool]]:
+    node = snapshot.get(path) if snapshot is not None else None
+    if node is not None:
+        return [(child.path, child.is_dir) for child in node.subdirs() + node.files()]
+    return [(p, p.is_dir()) for p in path.glob("*")]
+
+
+def _exists(path: Path, snapshot: TreeSnapshot | None) -> bool:
+    if snapshot is not None and snapshot.get(path.parent) is not None:
+        return snapshot.get(path) is not None
+    return path.exists()
+
+
+def _move(src: Path, dst: Path, snapshot: TreeSnapshot | None, plan: MovePlan | None) -> None:
+    if plan is not None:
+        plan.add(src, dst)
+    else:
+        shutil.move(str(src), str(dst))
+    if snapshot is not None:
+        snapshot.move(src, dst)
+
+
+def _on_disk(path: Path, plan: MovePlan | None) -> Path:
+    return plan.origin(path) if plan is not None else path
+
 
+def _remove(path: Path, snapshot: TreeSnapshot | None) -> None:
+    if snapshot is not None:
+        snapshot.remove(path)
 
-def merge_directories(src_dir: Path, dst_dir: Path) -> None:
-    dst_dir.mkdir(parents=True, exist_ok=True)
-    for file in src_dir.glob("*"):
-        if file.is_file():
-            move_file_with_check(file, dst_dir)
-    for sub_dir in src_dir.glob("*"):
-        if sub_dir.is_dir():
+
+def _delete(path: Path, snapshot: TreeSnapshot | None, plan: MovePlan | None) -> None:
+    if plan is not None:
+        plan.delete(path)
+    elif path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+    _remove(path, snapshot)
+
+
+def _rmdir(path: Path, snapshot: TreeSnapshot | None, plan: MovePlan | None) -> None:
+    if plan is not None:
+        plan.rmdir(path)
+    else:
+        path.rmdir()
+    _remove(path, snapshot)
+
+
+def merge_directories(
+    src_dir: Path,
+    dst_dir: Path,
+    snapshot: TreeSnapshot | None = None,
+    plan: MovePlan | None = None,
+) -> None:
+    if plan is not None:
+        plan.ensure(dst_dir)
+    else:
+        dst_dir.mkdir(parents=True, exist_ok=True)
+    if snapshot is not None:
+        snapshot.mkdir(dst_dir)
+    entries = _list_dir(src_dir, snapshot)
+    for file, is_dir in entries:
+        if not is_dir:
+            move_file_with_check(file, dst_dir, snapshot, plan)
+    for sub_dir, is_dir in entries:
+        if is_dir:
             target_sub = dst_dir / sub_dir.name
-            if target_sub.exists():
+            if _exists(target_sub, snapshot):
                 console.print(f"⚠️ 已存在同名目录: {target_sub} -> 合并中")
-                merge_directories(sub_dir, target_sub)
+                merge_directories(sub_dir, target_sub, snapshot, plan)
             else:
-                shutil.move(str(sub_dir), str(target_sub))
+                _move(sub_dir, target_sub, snapshot, plan)
                 console.print(f"移动目录: {sub_dir.name}")
-    if not any(src_dir.iterdir()):
-        src_dir.rmdir()
+    if not _list_dir(src_dir, snapshot):
+        _rmdir(src_dir, snapshot, plan)
         console.print(f"🗑️ 删除空目录: {src_dir}")
 
 
-def move_file_with_check(src_file: Path, dst_dir: Path) -> None:
+def move_file_with_check(
+    src_file: Path,
+    dst_dir: Path,
+    snapshot: TreeSnapshot | None = None,
+    plan: MovePlan | None = None,
+) -> None:
     dst_file = dst_dir / src_file.name
-    if dst_file.exists():
-        if src_file.stat().st_size == dst_file.stat().st_size:
-            console.print(f"⚠️ 同名文件大小相同，删除源文件: {src_file}")
-            src_file.unlink()
+    if _exists(dst_file, snapshot):
+        # 大小相同不代表内容相同，用哈希缓存确认；计划中的文件可能还在原位置
+        # 不区分大小写的卷上，已有文件的名字可能只是大小写不同
+        existing = snapshot.get(dst_file) if snapshot is not None else None
+        dst_file = existing.path if existing is not None else dst_file
+        if files_identical(_on_disk(src_file, plan), _on_disk(dst_file, plan)):
+            console.print(f"⚠️ 同名文件内容相同，删除源文件: {src_file}")
+            _delete(src_file, snapshot, plan)
         else:
             base = src_file.stem
             ext = src_file.suffix
@@ -104,31 +265,40 @@ def move_file_with_check(src_file: Path, dst_dir: Path) -> None:
             while True:
                 new_name = f"{base}_{i}{ext}"
                 new_dst = dst_dir / new_name
-                if not new_dst.exists():
-                    console.print(f"⚠️ 同名文件大小不同，重命名为: {new_dst}")
-                    shutil.move(str(src_file), str(new_dst))
+                if not _exists(new_dst, snapshot):
+                    console.print(f"⚠️ 同名文件内容不同，重命名为: {new_dst}")
+                    _move(src_file, new_dst, snapshot, plan)
                     break
                 i += 1
     else:
-        shutil.move(str(src_file), str(dst_file))
+        _move(src_file, dst_file, snapshot, plan)
         console.print(f"移动文件: {src_file.name}")
 
 
-def delete_useless_files_and_dirs(path: Path) -> None:
-    for dir in path.rglob("*"):
-        if dir.is_dir() and (dir.name == "__MACOSX" or dir.name == ".alg_meta"):
+def delete_useless_files_and_dirs(
+    path: Path,
+    snapshot: TreeSnapshot | None = None,
+    rules: JunkRules = DEFAULT_JUNK_RULES,
+    plan: MovePlan | None = None,
+) -> None:
+    snapshot = snapshot if snapshot is not None else TreeSnapshot(path)
+    for node in snapshot.walk():
+        if node.is_dir and rules.is_junk_dir(node.name):
+            dir = node.path
             console.print(f"🗑️ 删除无用目录: {dir}")
-            shutil.rmtree(dir, ignore_errors=True)
-    for file in path.rglob("._Thumbs.db"):
-        console.print(f"🗑️ 删除无用文件: {file}")
-        file.unlink(missing_ok=True)
-    for file in path.rglob(".DS_Store"):
-        console.print(f"🗑️ 删除无用文件: {file}")
-        file.unlink(missing_ok=True)
-
-
-def delete_empty_dirs(path: Path) -> None:
-    for dir in sorted(path.rglob("*"), reverse=True):
-        if dir.is_dir() and not any(dir.iterdir()):
+            _delete(dir, snapshot, plan)
+        elif not node.is_dir and rules.is_junk_file(node.name):
+            file = node.path
+            console.print(f"🗑️ 删除无用文件: {file}")
+            _delete(file, snapshot, plan)
+
+
+def delete_empty_dirs(
+    path: Path, snapshot: TreeSnapshot | None = None, plan: MovePlan | None = None
+) -> None:
+    snapshot = snapshot if snapshot is not None else TreeSnapshot(path)
+    for node in snapshot.walk(topdown=False):
+        if node.is_dir and node.parent is not None and not node.children:
+            dir = node.path
             console.print(f"🗑️ 删除空目录: {dir}")
-            dir.rmdir()
+            _rmdir(dir, snapshot, plan)
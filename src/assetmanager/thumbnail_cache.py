@@ -0,0 +1,106 @@
+"""缩略图缓存：按源文件内容缓存生成结果，set-private-images 与 merge-images 共用.
+
+键 = 源文件内容哈希 + 生成方式（如缩略图尺寸、裁剪区域）+ 输出格式，文件移动或改名后仍能命中.
+内容哈希由 HashCache 按 (路径, 大小, mtime) 缓存，未变化的文件重跑时只需 stat.
+缓存文件放在用户缓存目录，超过容量上限时删除最久未使用的.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .cache import cache_dir
+from .dedup import HashCache, default_cache
+
+DEFAULT_MAX_BYTES = 1024**3
+
+
+class ThumbnailCache:
+    """磁盘上的 LRU 缓存. 可在多线程中共用（只在主进程中使用，子进程只负责生成）."""
+
+    def __init__(
+        self,
+        root: Path | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        hashes: HashCache | None = None,
+    ) -> None:
+        self.root = root or cache_dir() / "thumbnails"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hashes = hashes if hashes is not None else default_cache()
+        self.db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.commit()
+            self.db.close()
+
+    def key(self, src: Path, variant: str, suffix: str) -> str:
+        """variant 描述生成方式（不同尺寸、裁剪的结果分开缓存），suffix 为输出格式."""
+        raw = f"{self.hashes.full_hash(src)}\0{variant}\0{suffix.lower()}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str, dst: Path) -> bool:
+        """命中时把缓存的结果复制到 dst 并返回 True."""
+        with self._lock:
+            found = self.db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+            if found:
+                self.db.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+        if found:
+            try:
+                shutil.copyfile(self._path(key), dst)
+            except FileNotFoundError:
+                # 缓存文件被手动删除，当作未命中
+                with self._lock:
+                    self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            else:
+                self.hits += 1
+                return True
+        self.misses += 1
+        return False
+
+    def put(self, key: str, path: Path) -> None:
+        """把生成好的文件加入缓存，超过上限时删除最久未使用的条目."""
+        size = path.stat().st_size
+        if size > self.max_bytes:
+            return
+        target = self._path(key)
+        target.parent.mkdir(exist_ok=True)
+        # 先复制到临时文件再改名，其它线程不会读到写了一半的文件
+        tmp = target.with_name(f"{key}.{threading.get_ident()}.tmp")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, size, time.time())
+            )
+            self._evict()
+            self.db.commit()
+
+    def _evict(self) -> None:
+        (total,) = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY used").fetchall():
+            self._path(key).unlink(missing_ok=True)
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
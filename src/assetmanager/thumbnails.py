@@ -0,0 +1,72 @@
+"""缩略图：所有生成缩略图的地方共用.
+
+尽量少解码像素：JPEG 用 draft() 在解码时直接按 1/2、1/4、1/8 缩小；
+其它格式解码后先按整数倍 reduce()（很快），再用 LANCZOS 缩放到目标尺寸.
+16 位及浮点图片转成 8 位，缩略图只需要预览的精度.
+"""
+
+from pathlib import Path
+from typing import cast
+
+from PIL import Image
+
+THUMBNAIL_SIZE = 512
+# reduce() 之后至少保留目标尺寸的这么多倍，再做高质量缩放，避免锯齿
+REDUCING_GAP = 2.0
+
+
+def fit_size(size: tuple[int, int], max_size: int = THUMBNAIL_SIZE) -> tuple[int, int]:
+    """按比例缩放到长边不超过 max_size，不放大.
+
+    >>> fit_size((4096, 2048))
+    (512, 256)
+    >>> fit_size((100, 300), 50)
+    (17, 50)
+    """
+    width, height = size
+    scale = min(1.0, max_size / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def to_8bit(img: Image.Image) -> Image.Image:
+    """把 16 位、浮点、1 位和调色板图片转换为 8 位，其它模式原样返回."""
+    if img.mode.startswith("I;16"):
+        return img.point(lambda v: v / 256).convert("L")
+    if img.mode in {"I", "F"}:
+        # 单通道图片返回 (最小值, 最大值)，多通道时才是每个通道一组
+        low, high = cast("tuple[float, float]", img.getextrema())
+        scale = 255 / (high - low) if high > low else 0
+        return img.point(lambda v: (v - low) * scale).convert("L")
+    if img.mode == "1":
+        return img.convert("L")
+    if img.mode == "P":
+        return img.convert("RGBA" if "transparency" in img.info else "RGB")
+    return img
+
+
+def load_thumbnail(path: Path, max_size: int = THUMBNAIL_SIZE) -> Image.Image:
+    """打开图片并返回长边不超过 max_size 的缩略图（已加载，原文件已关闭）."""
+    with Image.open(path) as img:
+        box = fit_size(img.size, max_size)
+        # 只对 JPEG 生效：选择不小于 box 的最大缩小倍数，其它格式什么也不做
+        img.draft(None, box)
+        img.load()
+        thumb = to_8bit(img)
+        factor = int(min(thumb.width / box[0], thumb.height / box[1]) / REDUCING_GAP)
+        if factor > 1:
+            thumb = thumb.reduce(factor)
+        if thumb.size != box:
+            thumb = thumb.resize(box, Image.Resampling.LANCZOS)
+        if thumb is img:
+            # 没有缩放也没有转换时复制一份，with 结束时会关闭原图
+            thumb = img.copy()
+    return thumb
+
+
+def save_thumbnail(src: Path, dst: Path, max_size: int = THUMBNAIL_SIZE) -> tuple[int, int]:
+    """生成 src 的缩略图并保存到 dst（格式按 dst 的扩展名），返回缩略图尺寸."""
+    thumb = load_thumbnail(src, max_size)
+    if thumb.mode in {"RGBA", "LA"} and dst.suffix.lower() in {".jpg", ".jpeg"}:
+        thumb = thumb.convert("RGB" if thumb.mode == "RGBA" else "L")
+    thumb.save(dst)
+    return thumb.size
@@ -0,0 +1,118 @@
+"""持久化目录索引：记录每个目录的 mtime、子目录与验证结果，供增量 validate 复用."""
+
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from rich.console import Console
+
+from .cache import cache_file
+from .structure_validator import check_folder
+from .tree_snapshot import parallel_walk
+
+# mtime 距扫描时刻过近时不可信（同一时间片内可能还有改动），下次强制重扫
+MTIME_SETTLE_NS = 2_000_000_000
+console = Console(stderr=True)
+# dirs 表的一行：(path, mtime_ns, subdirs, links, file_count, verdict)，列表字段为 JSON
+DirRow = tuple[str, int, str, str, int, str]
+
+
+class TreeIndex:
+    """基于 SQLite 的目录索引.
+
+    目录的 mtime 只在其直接子项增删改名时变化，因此 mtime 未变的目录
+    可以直接复用上次的子目录列表与验证结果，只需 stat 一次，无需重新列目录.
+    """
+
+    def __init__(self, root: Path, db_path: Path | None = None) -> None:
+        self.root = Path(root)
+        self.db = sqlite3.connect(db_path or cache_file("tree-index", self.root))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " subdirs TEXT NOT NULL,"
+            " links TEXT NOT NULL,"
+            " file_count INTEGER NOT NULL,"
+            " verdict TEXT NOT NULL)"
+        )
+        self.reused = 0
+        self.rescanned = 0
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _key(self, folder: Path) -> str:
+        return folder.relative_to(self.root).as_posix()
+
+    def _visit(
+        self, folder: Path, rows: dict[str, tuple[int, str, str]]
+    ) -> tuple[tuple[str, DirRow | None, list[str]], list[Path]]:
+        """在工作线程中执行：stat 目录，mtime 变化时才重新列目录. 不访问数据库."""
+        key = self._key(folder)
+        try:
+            mtime_ns = folder.stat().st_mtime_ns
+        except OSError as e:
+            console.print(f"⚠️ 无法读取目录: {folder} - {e}")
+            return (key, None, []), []
+        row = rows.get(key)
+        if row is not None and row[0] == mtime_ns:
+            cached_subdirs, verdict = json.loads(row[1]), json.loads(row[2])
+            return (key, None, verdict), [folder / name for name in cached_subdirs]
+        subdirs: list[str] = []
+        links: list[str] = []
+        file_count = 0
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        file_count += 1
+                    # 不跟随目录符号链接，与 TreeSnapshot 一致
+                    elif entry.is_symlink():
+                        links.append(entry.name)
+                    else:
+                        subdirs.append(entry.name)
+        except OSError as e:
+            console.print(f"⚠️ 无法读取目录: {folder} - {e}")
+            return (key, None, []), []
+        subdirs.sort()
+        subdir_names = set(subdirs) | set(links)
+        verdict = [] if folder == self.root else check_folder(folder, subdir_names, file_count)
+        if time.time_ns() - mtime_ns < MTIME_SETTLE_NS:
+            mtime_ns = -1
+        new_row: DirRow = (key, mtime_ns, json.dumps(subdirs), json.dumps(links), file_count, json.dumps(verdict))
+        return (key, new_row, verdict), [folder / name for name in subdirs]
+
+    def validate(self, workers: int = 1) -> Iterator[tuple[str, Path]]:
+        """增量验证，逐个产出 (问题分类, 目录)；只重新列出 mtime 变化过的目录."""
+        # 一次性读入全部索引行，工作线程只读字典，写库统一在主线程完成
+        rows = {
+            path: (mtime_ns, subdirs, verdict)
+            for path, mtime_ns, subdirs, verdict in self.db.execute(
+                "SELECT path, mtime_ns, subdirs, verdict FROM dirs"
+            )
+        }
+        seen: set[str] = set()
+
+        def visit(folder: Path) -> tuple[tuple[str, DirRow | None, list[str]], list[Path]]:
+            return self._visit(folder, rows)
+
+        try:
+            for folder, (key, new_row, verdict) in parallel_walk(self.root, visit, workers):
+                seen.add(key)
+                if new_row is None:
+                    self.reused += 1
+                else:
+                    self.db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)", new_row)
+                    self.rescanned += 1
+                for category in verdict:
+                    yield category, folder
+            # 完整遍历后才能确定哪些目录已不存在
+            self.db.executemany(
+                "DELETE FROM dirs WHERE path = ?", [(key,) for key in rows.keys() - seen]
+            )
+        finally:
+            self.db.commit()
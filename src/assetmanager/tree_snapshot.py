@@ -0,0 +1,230 @@
+"""目录树快照：用 os.scandir 一次遍历整棵树，缓存类型与 stat，供 validate/arrange/extract 共用."""
+
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TypeVar
+
+from rich.console import Console
+
+console = Console(stderr=True)
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def parallel_walk(
+    root: T, visit: Callable[[T], tuple[R, list[T]]], workers: int = 1
+) -> Iterator[tuple[T, R]]:
+    """并行遍历目录树，按确定的深度优先顺序惰性产出 (项, 结果).
+
+    visit 在线程池中执行，返回 (结果, 需要继续遍历的子项)；每个目录的子项一返回
+    就全部预先提交，兄弟目录可以同时列出，网络共享盘上的延迟相互重叠.
+    产出顺序与 workers 无关；未消费的结果只保留当前路径上的兄弟目录，内存不随整棵树增长.
+    """
+    if workers <= 1:
+        stack = [root]
+        while stack:
+            item = stack.pop()
+            result, children = visit(item)
+            yield item, result
+            stack.extend(reversed(children))
+        return
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending: list[tuple[T, Future[tuple[R, list[T]]]]] = [(root, pool.submit(visit, root))]
+        while pending:
+            item, future = pending.pop()
+            result, children = future.result()
+            yield item, result
+            pending.extend((child, pool.submit(visit, child)) for child in reversed(children))
+    finally:
+        # 调用方提前停止消费时，丢弃尚未开始的预取任务
+        pool.shutdown(cancel_futures=True)
+
+
+def is_case_insensitive(path: Path) -> bool:
+    """判断 path 所在的卷是否不区分大小写（Windows、macOS 默认）：用大小写互换后的路径探测."""
+    path = Path(path).absolute()
+    for p in (path, *path.parents):
+        swapped = p.name.swapcase()
+        if swapped != p.name:
+            try:
+                return p.samefile(p.with_name(swapped))
+            except OSError:
+                return False
+    return os.name == "nt"
+
+
+class TreeNode:
+    """快照中的一个文件或目录. 根节点的 name 为根目录的完整路径."""
+
+    __slots__ = ("children", "is_dir", "mtime_ns", "name", "parent", "size")
+
+    def __init__(
+        self,
+        name: str,
+        parent: "TreeNode | None",
+        *,
+        is_dir: bool,
+        size: int = 0,
+        mtime_ns: int = 0,
+    ) -> None:
+        self.name = name
+        self.parent = parent
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.children: dict[str, TreeNode] = {}
+
+    @property
+    def path(self) -> Path:
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return Path(node.name, *reversed(parts))
+
+    def subdirs(self) -> list["TreeNode"]:
+        return [c for c in sorted(self.children.values(), key=_by_name) if c.is_dir]
+
+    def files(self) -> list["TreeNode"]:
+        return [c for c in sorted(self.children.values(), key=_by_name) if not c.is_dir]
+
+    def __repr__(self) -> str:
+        return f"TreeNode({str(self.path)!r}, is_dir={self.is_dir})"
+
+
+def _by_name(node: TreeNode) -> str:
+    return node.name
+
+
+def _node_from_entry(entry: os.DirEntry[str], parent: TreeNode) -> TreeNode:
+    try:
+        is_dir = entry.is_dir()
+        st = entry.stat()
+        size, mtime_ns = (0 if is_dir else st.st_size), st.st_mtime_ns
+    except OSError:
+        # 失效的符号链接等
+        is_dir, size, mtime_ns = False, 0, 0
+    return TreeNode(entry.name, parent, is_dir=is_dir, size=size, mtime_ns=mtime_ns)
+
+
+class TreeSnapshot:
+    """整棵目录树的内存快照.
+
+    构建时只遍历一次磁盘；之后调用方在磁盘上移动/删除条目时，
+    通过 move/remove/mkdir 同步快照，后续步骤无需再次遍历.
+    不区分大小写的卷上（case_sensitive=None 时自动探测）按 casefold 后的名字查找子项，
+    与磁盘上 Foo.txt 和 foo.txt 是同一个文件的行为一致.
+    """
+
+    def __init__(self, root: Path, workers: int = 1, case_sensitive: bool | None = None) -> None:
+        self.root_path = Path(root)
+        if case_sensitive is None:
+            case_sensitive = not is_case_insensitive(self.root_path)
+        self.case_sensitive = case_sensitive
+        st = self.root_path.stat()
+        self.root = TreeNode(str(self.root_path), None, is_dir=True, mtime_ns=st.st_mtime_ns)
+        for _ in parallel_walk(self.root, self._scan_dir, workers):
+            pass
+
+    def _key(self, name: str) -> str:
+        return name if self.case_sensitive else name.casefold()
+
+    def _scan_dir(self, node: TreeNode) -> tuple[None, list[TreeNode]]:
+        # 每个节点的 children 只由列出它的那个线程写入，无需加锁
+        subdirs = []
+        try:
+            with os.scandir(node.path) as it:
+                for entry in it:
+                    child = _node_from_entry(entry, node)
+                    node.children[self._key(child.name)] = child
+                    # 不跟随目录符号链接，避免循环
+                    if child.is_dir and not entry.is_symlink():
+                        subdirs.append(child)
+        except OSError as e:
+            console.print(f"⚠️ 无法读取目录: {node.path} - {e}")
+        return None, subdirs
+
+    def walk(self, *, topdown: bool = True) -> Iterator[TreeNode]:
+        """按名称排序深度优先遍历（不含根节点）.
+
+        topdown=True 时先父后子，遍历中被 remove 的目录不会再进入；
+        topdown=False 时先子后父，适合删除空目录等自底向上的操作.
+        """
+        if not topdown:
+            nodes = list(self.walk())
+            nodes.reverse()
+            yield from nodes
+            return
+        stack = sorted(self.root.children.values(), key=lambda n: n.name, reverse=True)
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.is_dir and self._attached(node):
+                stack.extend(sorted(node.children.values(), key=lambda n: n.name, reverse=True))
+
+    def _attached(self, node: TreeNode) -> bool:
+        while node.parent is not None:
+            if node.parent.children.get(self._key(node.name)) is not node:
+                return False
+            node = node.parent
+        return node is self.root
+
+    def get(self, path: Path) -> TreeNode | None:
+        try:
+            parts = Path(path).relative_to(self.root_path).parts
+        except ValueError:
+            return None
+        node = self.root
+        for part in parts:
+            child = node.children.get(self._key(part))
+            if child is None:
+                return None
+            node = child
+        return node
+
+    def mkdir(self, path: Path) -> TreeNode | None:
+        """在快照中登记目录（含缺失的父目录），路径不在根目录下时返回 None."""
+        try:
+            parts = Path(path).relative_to(self.root_path).parts
+        except ValueError:
+            return None
+        node = self.root
+        for part in parts:
+            child = node.children.get(self._key(part))
+            if child is None:
+                child = TreeNode(part, node, is_dir=True)
+                node.children[self._key(part)] = child
+            node = child
+        return node
+
+    def remove(self, path: Path) -> None:
+        node = self.get(path)
+        if node is not None and node.parent is not None:
+            del node.parent.children[self._key(node.name)]
+            node.parent = None
+
+    def move(self, src: Path, dst: Path) -> None:
+        """登记 src -> dst 的移动；src 不在快照中时按新条目从磁盘读取."""
+        node = self.get(src)
+        if node is not None and node.parent is not None:
+            del node.parent.children[self._key(node.name)]
+        new_parent = self.mkdir(Path(dst).parent)
+        if new_parent is None:
+            return
+        if node is None:
+            st = Path(dst).stat()
+            is_dir = Path(dst).is_dir()
+            node = TreeNode(
+                Path(dst).name,
+                new_parent,
+                is_dir=is_dir,
+                size=0 if is_dir else st.st_size,
+                mtime_ns=st.st_mtime_ns,
+            )
+        node.name = Path(dst).name
+        node.parent = new_parent
+        new_parent.children[self._key(node.name)] = node
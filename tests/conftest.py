@@ -0,0 +1,18 @@
+"""Shared test fixtures."""
+
+from collections.abc import Iterator
+
+import pytest
+
+from assetmanager.dedup import reset_default_cache
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(
+    tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[None]:
+    """Give every test its own cache directory and a fresh shared hash cache."""
+    monkeypatch.setenv("ASSETMANAGER_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+    reset_default_cache()
+    yield
+    reset_default_cache()
@@ -0,0 +1,57 @@
+"""Test the in-process archive backend."""
+
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from assetmanager.archive_backends import ArchiveBackend, ArchiveError, ZipBackend
+from assetmanager.compression_planner import Mode
+
+
+def test_zip_update_replaces_and_keeps(tmp_path: Path) -> None:
+    """Test that updating replaces listed members and keeps the others."""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("a1")
+    (tmp_path / "sub" / "b.txt").write_text("b")
+    archive = tmp_path / "out.zip"
+    backend = ZipBackend()
+    backend.update(archive, tmp_path, ["a.txt", "sub/b.txt"], Mode.MAX)
+    (tmp_path / "a.txt").write_text("a2")
+    backend.update(archive, tmp_path, ["a.txt"], Mode.STORE)
+    assert backend.read(archive, "a.txt") == b"a2"
+    assert backend.read(archive, "sub/b.txt") == b"b"
+    assert backend.read(archive, "missing") is None
+    assert sorted(m.name for m in backend.members(archive)) == ["a.txt", "sub/b.txt"]
+    assert backend.test(archive) is None
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.getinfo("a.txt").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("sub/b.txt").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_failed_zip_update_keeps_archive(tmp_path: Path) -> None:
+    """Test that a failed update leaves the existing archive untouched."""
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    archive = tmp_path / "out.zip"
+    backend = ZipBackend()
+    backend.update(archive, tmp_path, ["a.txt"], Mode.MAX)
+    before = archive.read_bytes()
+    with pytest.raises(ArchiveError):
+        backend.update(archive, tmp_path, ["b.txt", "missing.txt"], Mode.MAX)
+    assert archive.read_bytes() == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt", "b.txt", "out.zip"]
+
+
+def test_incomplete_backend_fails_at_instantiation() -> None:
+    """Test that a backend missing an abstract method cannot be instantiated."""
+
+    class NoTest(ArchiveBackend):
+        def update(self, *args: object, **kwargs: object) -> None: ...
+
+        def read(self, archive: Path, name: str) -> bytes | None: ...
+
+        def members(self, archive: Path) -> list: ...
+
+    with pytest.raises(TypeError):
+        NoTest()
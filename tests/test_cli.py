@@ -1,5 +1,7 @@
 """Test AssetManager CLI."""
 
+from pathlib import Path
+
 from typer.testing import CliRunner
 
 from assetmanager.cli import app
@@ -13,3 +15,24 @@ def test_fire() -> None:
     result = runner.invoke(app, ["--name", name])
     assert result.exit_code == 0
     assert name in result.stdout
+
+
+def test_invalid_size_is_a_usage_error(tmp_path: Path) -> None:
+    """Test that a malformed --io-limit is rejected as a bad parameter, not a traceback."""
+    result = runner.invoke(app, ["extract", str(tmp_path), "--io-limit", "lots"])
+    assert result.exit_code == 2
+    assert "lots" in result.output
+    assert not isinstance(result.exception, ValueError)
+
+
+def test_categorize_from_list_file(tmp_path: Path) -> None:
+    """Test that a path list is organized with the list file's directory as the plan root."""
+    (tmp_path / "assets").mkdir()
+    for name in ("rock.zprj", "rock.png"):
+        (tmp_path / "assets" / name).write_text(name)
+    listing = tmp_path / "list.txt"
+    listing.write_text("".join(f"{tmp_path / 'assets' / n}\n" for n in ("rock.zprj", "rock.png")))
+    result = runner.invoke(app, ["categorize", "--from-file", str(listing)])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "assets" / "rock" / "thumbnail" / "rock.png").is_file()
+    assert (tmp_path / "assets" / "rock" / "main_assets" / "rock.zprj").is_file()
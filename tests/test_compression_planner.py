@@ -0,0 +1,31 @@
+"""Test content-aware compression planning."""
+
+import os
+from pathlib import Path
+
+from assetmanager.compression_planner import Mode, plan_file, plan_folder
+
+
+def test_plan_modes(tmp_path: Path) -> None:
+    """Test that incompressible and known-compressed files are stored, text is compressed."""
+    (tmp_path / "noise.bin").write_bytes(os.urandom(200_000))
+    (tmp_path / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"\0" * 100_000)
+    (tmp_path / "scene.txt").write_bytes(b"vertex 0.0 1.0 2.0\n" * 20_000)
+    (tmp_path / "tiny.txt").write_bytes(b"x")
+    assert plan_file(tmp_path / "noise.bin").mode is Mode.STORE
+    assert plan_file(tmp_path / "image.png").mode is Mode.STORE
+    assert plan_file(tmp_path / "scene.txt").mode is not Mode.STORE
+    assert plan_file(tmp_path / "tiny.txt").mode is Mode.MAX
+
+
+def test_plan_folder(tmp_path: Path) -> None:
+    """Test that folder plans cover nested files, skip the archive and record empty dirs."""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "sub" / "a.bin").write_bytes(os.urandom(50_000))
+    (tmp_path / "out.7z").write_bytes(b"")
+    plan = plan_folder(tmp_path, exclude=tmp_path / "out.7z")
+    assert [p.path.name for p in plan.files] == ["a.bin"]
+    assert plan.empty_dirs == [tmp_path / "empty"]
+    assert plan.est_cpu == 0.0
+    assert plan.est_cpu_max > 0.0
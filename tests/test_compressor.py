@@ -0,0 +1,80 @@
+"""Test compressor scheduling and incremental updates."""
+
+import json
+import zlib
+from pathlib import Path
+
+from assetmanager.archive_backends import ZipBackend
+from assetmanager.archive_manifest import (
+    MANIFEST_NAME,
+    file_entry,
+    is_unchanged,
+    read_manifest,
+    verify_archive,
+    write_manifest,
+)
+from assetmanager.compressor import (
+    BYTES_PER_THREAD,
+    compress_folder,
+    should_compress,
+    threads_for,
+    verify_folder,
+)
+from assetmanager.structure_validator import DEFAULT_JUNK_RULES
+
+
+def test_threads_for() -> None:
+    """Test that big folders get a proportional share of cores and small folders one thread."""
+    big = 40 * BYTES_PER_THREAD
+    total = big + 10 * 1024
+    assert threads_for(big, total, 32) == 32
+    assert threads_for(10 * 1024, total, 32) == 1
+    assert threads_for(3 * BYTES_PER_THREAD, 2 * 3 * BYTES_PER_THREAD, 32) == 3
+    assert threads_for(0, 0, 8) == 1
+
+
+def test_should_compress_with_existing_archive(tmp_path: Path) -> None:
+    """Test that an archive alone is up to date but new files next to it trigger an update."""
+    folder = tmp_path / "asset" / "main_assets"
+    folder.mkdir(parents=True)
+    (folder / "asset.7z").write_bytes(b"")
+    assert not should_compress(folder)
+    (folder / "new.png").write_bytes(b"x")
+    assert should_compress(folder)
+
+
+def test_manifest_entries(tmp_path: Path) -> None:
+    """Test that manifest entries detect content changes and the manifest is never extracted."""
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"abc")
+    entry = file_entry(path)
+    assert entry["crc32"] == f"{zlib.crc32(b'abc'):08X}"
+    write_manifest(tmp_path / MANIFEST_NAME, {"a.bin": entry})
+    stored = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding="utf-8"))["members"]
+    assert is_unchanged(stored["a.bin"], entry)
+    path.write_bytes(b"abd")
+    assert not is_unchanged(stored["a.bin"], file_entry(path))
+    assert not is_unchanged(None, entry)
+    assert DEFAULT_JUNK_RULES.is_junk_member(f"sub/{MANIFEST_NAME}")
+
+
+def test_compress_update_and_verify_with_zip_backend(tmp_path: Path) -> None:
+    """Test a full compress, incremental update and verify cycle without 7z."""
+    folder = tmp_path / "asset" / "main_assets"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "a.bin").write_bytes(b"a" * 50_000)
+    (folder / "sub" / "b.txt").write_text("b")
+    backend = ZipBackend()
+    compressed = compress_folder(folder, verify=True, backend=backend)
+    assert compressed is not None
+    assert compressed.archive == folder / "asset.zip"
+    assert verify_folder(compressed)
+    assert [p.name for p in folder.iterdir()] == ["asset.zip"]
+    (folder / "c.txt").write_text("c")
+    compressed = compress_folder(folder, backend=backend)
+    assert compressed is not None
+    assert [p.path.name for p in compressed.plan.files] == ["c.txt"]
+    assert [p.name for p in folder.iterdir()] == ["asset.zip"]
+    manifest = read_manifest(folder / "asset.zip", backend)
+    assert sorted(manifest) == ["a.bin", "c.txt", "sub/b.txt"]
+    assert verify_archive(folder / "asset.zip", backend) == []
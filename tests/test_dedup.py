@@ -0,0 +1,41 @@
+"""Test content-hash deduplication."""
+
+from pathlib import Path
+
+from assetmanager.dedup import PARTIAL_BLOCK, HashCache, find_duplicates, link_duplicates
+from assetmanager.structure_validator import move_file_with_check
+
+
+def test_find_and_link_duplicates(tmp_path: Path) -> None:
+    """Test that only identical contents are grouped and can be hard-linked."""
+    big = b"a" * (3 * PARTIAL_BLOCK)
+    # 首尾块相同、中间不同，只有全文件哈希能区分
+    same_edges = b"a" * PARTIAL_BLOCK + b"b" * PARTIAL_BLOCK + b"a" * PARTIAL_BLOCK
+    files = {"a.bin": big, "b.bin": big, "c.bin": same_edges, "d.bin": b"x" * 10, "e.bin": b"y" * 10}
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+    cache = HashCache(tmp_path / "hashes.sqlite")
+    entries = [(tmp_path / name, len(data)) for name, data in files.items()]
+
+    groups = find_duplicates(entries, cache, workers=2)
+    assert groups == [[tmp_path / "a.bin", tmp_path / "b.bin"]]
+
+    assert link_duplicates(groups[0]) == len(big)
+    assert (tmp_path / "a.bin").samefile(tmp_path / "b.bin")
+    assert find_duplicates(entries, cache) == []
+    cache.close()
+
+
+def test_move_file_with_check_compares_content(tmp_path: Path) -> None:
+    """Test that same-size files with different content are kept."""
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.mkdir()
+    dst.mkdir()
+    (src / "a.png").write_bytes(b"1111")
+    (dst / "a.png").write_bytes(b"2222")
+    (src / "b.png").write_bytes(b"3333")
+    (dst / "b.png").write_bytes(b"3333")
+    move_file_with_check(src / "a.png", dst)
+    move_file_with_check(src / "b.png", dst)
+    assert sorted(p.name for p in dst.iterdir()) == ["a.png", "a_1.png", "b.png"]
+    assert not any(src.iterdir())
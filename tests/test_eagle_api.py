@@ -0,0 +1,64 @@
+"""Test the paginated Eagle API client against a local stand-in server."""
+
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from assetmanager.eagle_api import EagleApiError, EagleClient
+
+ITEMS = [{"id": f"item{i}"} for i in range(2500)]
+
+
+class _EagleHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 才能保持连接，用来确认客户端复用连接
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.requests.append((self.client_address, query))
+        if query.get("folders") != "F1":
+            body = {"status": "error", "data": "folder not found"}
+        else:
+            limit, page = int(query["limit"]), int(query["offset"])
+            body = {"status": "success", "data": ITEMS[page * limit : (page + 1) * limit]}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[ThreadingHTTPServer]:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _EagleHandler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_pages_concurrently_over_pooled_connections(server: ThreadingHTTPServer) -> None:
+    """Test that every page is fetched in order over at most `concurrency` connections."""
+    base_url = f"http://127.0.0.1:{server.server_port}/api"
+    with EagleClient(base_url, page_size=300, concurrency=3) as client:
+        assert list(client.list_items_in_folder("F1")) == ITEMS
+        offsets = sorted(int(q["offset"]) for _, q in server.requests)
+        first = next(client.iter_items(folders="F1"))
+        assert first == ITEMS[0]
+        with pytest.raises(EagleApiError):
+            list(client.list_items_in_folder("missing"))
+    # 第 8 页不满一页即停止，之后至多多请求 concurrency - 1 页，且每页只请求一次
+    assert offsets[:9] == list(range(9))
+    assert len(offsets) == len(set(offsets)) <= 11
+    assert len({address for address, _ in server.requests}) <= 3
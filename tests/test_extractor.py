@@ -0,0 +1,119 @@
+"""Test in-process archive extraction."""
+
+import io
+import zipfile
+from pathlib import Path
+
+from assetmanager.cache import cache_file
+from assetmanager.extractor import extract_all, extract_file
+from assetmanager.journal import Journal
+from assetmanager.structure_validator import DEFAULT_JUNK_RULES
+
+
+def _zip_bytes(members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_extract_nested_zips(tmp_path: Path) -> None:
+    """Test that nested archives are queued directly and archives are removed."""
+    inner = _zip_bytes({"rock/rock.fbx": b"mesh"})
+    (tmp_path / "pack.zip").write_bytes(
+        _zip_bytes({"inner.zip": inner, "readme.txt": b"hi", "../escape.txt": b"x"})
+    )
+    total, depth = extract_all(tmp_path, jobs=2)
+    assert (total, depth) == (2, 2)
+    assert (tmp_path / "pack" / "inner" / "rock" / "rock.fbx").read_bytes() == b"mesh"
+    assert (tmp_path / "pack" / "readme.txt").is_file()
+    assert not (tmp_path / "escape.txt").exists()
+    assert not list(tmp_path.rglob("*.zip"))
+
+
+def test_drive_qualified_members_are_rejected(tmp_path: Path) -> None:
+    """Test that members with a drive or anchor are skipped."""
+    (tmp_path / "pack.zip").write_bytes(
+        _zip_bytes({"C:evil/x.txt": b"x", "C:\\y.txt": b"y", "\\z.txt": b"z", "ok.txt": b"ok"})
+    )
+    assert extract_all(tmp_path, jobs=1) == (1, 1)
+    assert [p.name for p in (tmp_path / "pack").rglob("*")] == ["ok.txt"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["pack"]
+
+
+def test_resume_from_journal(tmp_path: Path) -> None:
+    """Test that an interrupted run resumes from the journal without a rescan."""
+    (tmp_path / "done").mkdir()
+    (tmp_path / "done" / "kept.txt").write_text("x")
+    (tmp_path / "partial.zip").write_bytes(_zip_bytes({"a.txt": b"a"}))
+    (tmp_path / "not_journaled.zip").write_bytes(_zip_bytes({"b.txt": b"b"}))
+    # 模拟上次运行在解压 partial.zip 途中被杀掉
+    (tmp_path / ".partial.zip.extracting").mkdir()
+    (tmp_path / ".partial.zip.extracting" / "half.txt").write_text("half")
+    journal = Journal(cache_file("extract-journal", tmp_path, ".jsonl"))
+    journal.append({"archive": str(tmp_path / "done.zip"), "state": "done"})
+    journal.append({"archive": str(tmp_path / "partial.zip"), "state": "started"})
+    journal.close()
+
+    assert extract_all(tmp_path, jobs=1) == (1, 1)
+    assert sorted(p.name for p in (tmp_path / "partial").iterdir()) == ["a.txt"]
+    assert not (tmp_path / ".partial.zip.extracting").exists()
+    assert (tmp_path / "not_journaled.zip").exists()
+    assert not cache_file("extract-journal", tmp_path, ".jsonl").exists()
+
+
+def test_resume_after_publish_before_delete(tmp_path: Path) -> None:
+    """Test that nested archives survive a crash between publishing and deleting the parent."""
+    (tmp_path / "outer.zip").write_bytes(_zip_bytes({"inner.zip": b"stale"}))
+    (tmp_path / "outer").mkdir()
+    (tmp_path / "outer" / "inner.zip").write_bytes(_zip_bytes({"c.txt": b"c"}))
+    (tmp_path / "other.zip").write_bytes(_zip_bytes({"d.txt": b"d"}))
+    journal = Journal(cache_file("extract-journal", tmp_path, ".jsonl"))
+    for archive, state in (
+        ("outer.zip", "queued"), ("other.zip", "queued"), ("outer/inner.zip", "queued"),
+        ("outer.zip", "published"),
+    ):
+        journal.append({"archive": str(tmp_path / archive), "state": state})
+    journal.close()
+
+    assert extract_all(tmp_path, jobs=1) == (2, 1)
+    assert not (tmp_path / "outer.zip").exists()
+    assert (tmp_path / "outer" / "inner" / "c.txt").read_bytes() == b"c"
+    assert (tmp_path / "other" / "d.txt").read_bytes() == b"d"
+
+
+def test_archives_sharing_a_stem(tmp_path: Path) -> None:
+    """Test that archives with the same stem keep separate staging dirs and nested queues."""
+    (tmp_path / "pack.ZIP").write_bytes(_zip_bytes({"mine.zip": b"m", "b.txt": b"b"}))
+    (tmp_path / "pack").mkdir()
+    (tmp_path / "pack" / "theirs.zip").write_bytes(b"t")
+    # 模拟 pack.zip 正在另一个线程中解压
+    (tmp_path / ".pack.zip.extracting").mkdir()
+    (tmp_path / ".pack.zip.extracting" / "a.txt").write_text("a")
+
+    assert extract_file(tmp_path / "pack.ZIP") == [tmp_path / "pack" / "mine.zip"]
+    assert (tmp_path / ".pack.zip.extracting" / "a.txt").read_text() == "a"
+    assert (tmp_path / "pack" / "b.txt").read_bytes() == b"b"
+
+
+def test_junk_is_skipped_before_extraction(tmp_path: Path) -> None:
+    """Test that junk-only archives are dropped and junk members never reach disk."""
+    (tmp_path / "mac.zip").write_bytes(_zip_bytes({"__MACOSX/._a": b"x", ".DS_Store": b"x"}))
+    (tmp_path / "pack.zip").write_bytes(
+        _zip_bytes({"a.txt": b"a", "__MACOSX/._a.txt": b"x", "sub/.DS_Store": b"x"})
+    )
+    assert extract_all(tmp_path, jobs=1) == (1, 1)
+    assert not (tmp_path / "mac.zip").exists()
+    assert not (tmp_path / "mac").exists()
+    assert [p.name for p in (tmp_path / "pack").rglob("*")] == ["a.txt"]
+
+
+def test_extra_junk_rules(tmp_path: Path) -> None:
+    """Test that user-supplied junk patterns are filtered during extraction."""
+    (tmp_path / "pack.zip").write_bytes(
+        _zip_bytes({"a.txt": b"a", "Thumbs.db": b"x", "cache/b.tmp": b"x", "desktop.ini": b"x"})
+    )
+    rules = DEFAULT_JUNK_RULES.extended(["Thumbs.db", "*.tmp", "desktop.ini"])
+    assert extract_all(tmp_path, jobs=1, rules=rules) == (1, 1)
+    assert sorted(p.name for p in (tmp_path / "pack").rglob("*") if p.is_file()) == ["a.txt"]
@@ -0,0 +1,191 @@
+"""Test categorize file moves."""
+
+import unicodedata
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from assetmanager import file_organizer, move_plan
+from assetmanager.file_organizer import (
+    GroupIndex,
+    organize_files,
+    organize_paths,
+    organize_tree,
+    read_path_list,
+)
+from assetmanager.move_plan import MovePlan, MovePlanError, TRASH_NAME, recover, run_plan
+
+
+def test_organize_multiple(tmp_path: Path) -> None:
+    """Test that files are grouped by stem and images go to thumbnail."""
+    for name in ("bar.png", "bar.zprj", "aaa.zprj"):
+        (tmp_path / name).write_text(name)
+    organize_files([str(p) for p in sorted(tmp_path.iterdir())])
+    assert (tmp_path / "bar" / "thumbnail" / "bar.png").read_text() == "bar.png"
+    assert (tmp_path / "bar" / "main_assets" / "bar.zprj").is_file()
+    assert (tmp_path / "aaa" / "main_assets" / "aaa.zprj").is_file()
+    assert (tmp_path / "aaa" / "thumbnail").is_dir()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["aaa", "bar"]
+
+
+def test_organize_tree_and_path_list(tmp_path: Path) -> None:
+    """Test recursive per-directory grouping and NUL-separated path lists."""
+    for name in ("a/bar.png", "a/bar.zprj", "a/b/bar.zprj", "done/main_assets/x.zprj", "done/y.zprj"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(name)
+    organize_tree(tmp_path, recursive=True, workers=3)
+    assert (tmp_path / "a" / "bar" / "thumbnail" / "bar.png").is_file()
+    assert (tmp_path / "a" / "bar" / "main_assets" / "bar.zprj").is_file()
+    assert (tmp_path / "a" / "b" / "bar" / "main_assets" / "bar.zprj").is_file()
+    # 已整理过的目录保持不变
+    assert (tmp_path / "done" / "y.zprj").is_file()
+
+    listing = tmp_path / "list"
+    listing.write_bytes(b"\0".join(bytes(tmp_path / "done" / n) for n in ("y.zprj", "y.png")))
+    (tmp_path / "done" / "y.png").write_text("y")
+    organize_paths(read_path_list(listing), tmp_path)
+    assert (tmp_path / "done" / "y" / "thumbnail" / "y.png").is_file()
+    assert (tmp_path / "done" / "y" / "main_assets" / "y.zprj").is_file()
+
+
+def test_normalized_grouping(tmp_path: Path) -> None:
+    """Test that case, NFD/NFC and preview suffixes collapse into one explained group."""
+    index = GroupIndex().update(
+        tmp_path / n for n in ("Rock.PNG", "rock.zprj", "rock_Preview.jpg", "石头.zprj", "石头.png")
+    )
+    index.add(tmp_path / unicodedata.normalize("NFD", "Café.png"))
+    index.add(tmp_path / "café.fbx")
+    assert sorted((name, len(files)) for _, name, files in index) == [
+        ("café", 2), ("rock", 3), ("石头", 2)
+    ]
+    reasons = {p.name: r for _, files in index.collisions() for p, r in files}
+    assert reasons["Rock.PNG"] == ["大小写"]
+    assert reasons["rock_Preview.jpg"] == ["去掉后缀 _preview"]
+    assert reasons[unicodedata.normalize("NFD", "Café.png")] == ["Unicode 规范化（NFD→NFC）", "大小写"]
+    assert "石头.png" not in reasons
+    assert len(GroupIndex(strip_suffixes=()).update([tmp_path / "a_preview.png", tmp_path / "a.zprj"])) == 2
+
+
+def test_organize_single_cross_device(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the single-file layout with every move forced through the copy pool."""
+    monkeypatch.setattr(move_plan, "_same_device", lambda *_: False)
+    (tmp_path / "model.blend").write_text("m")
+    (tmp_path / "preview.jpg").write_text("p")
+    (tmp_path / "textures").mkdir()
+    (tmp_path / "textures" / "a.png").write_text("t")
+    organize_files([str(tmp_path / "model.blend")])
+    assert (tmp_path / "main_assets" / "model.blend").is_file()
+    assert (tmp_path / "thumbnail" / "preview.jpg").is_file()
+    assert (tmp_path / "main_assets_others" / "textures" / "a.png").is_file()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "main_assets", "main_assets_others", "thumbnail"
+    ]
+
+
+def test_dry_run_and_collisions(tmp_path: Path) -> None:
+    """Test that a dry run touches nothing and colliding plans are rejected before any move."""
+    for name in ("bar.png", "bar.zprj"):
+        (tmp_path / name).write_text(name)
+    organize_files([str(tmp_path / "bar.png"), str(tmp_path / "bar.zprj")], dry_run=True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bar.png", "bar.zprj"]
+    plan = MovePlan()
+    plan.add(tmp_path / "bar.png", tmp_path / "x")
+    plan.add(tmp_path / "bar.zprj", tmp_path / "x")
+    assert plan.validate(check_disk=False) == [f"多个文件移动到同一目标: {tmp_path / 'x'}"]
+    with pytest.raises(MovePlanError):
+        run_plan(plan, tmp_path)
+    assert not (tmp_path / "x").exists()
+
+
+def test_interrupted_plan_resume_and_rollback(tmp_path: Path) -> None:
+    """Test that a failed run can be rolled back, and otherwise resumed from its journal."""
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "junk").write_text("j")
+    (tmp_path / "old").mkdir()
+    plan = MovePlan()
+    plan.add(tmp_path / "a.txt", tmp_path / "new" / "a.txt")
+    plan.delete(tmp_path / "junk")
+    plan.rmdir(tmp_path / "old")
+    plan.add(tmp_path / "late.txt", tmp_path / "new" / "late.txt")
+    first = run_plan(plan, tmp_path)
+    assert first is not None and not first.complete
+    assert not (tmp_path / "a.txt").exists()
+    assert not (tmp_path / "old").exists()
+
+    undone = recover(tmp_path, rollback=True)
+    assert undone is not None and undone.complete
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt", "junk", "old"]
+    assert recover(tmp_path) is None
+
+    assert not run_plan(plan, tmp_path).complete
+    (tmp_path / "late.txt").write_text("l")
+    resumed = recover(tmp_path)
+    assert resumed is not None and resumed.complete
+    assert sorted(p.name for p in (tmp_path / "new").iterdir()) == ["a.txt", "late.txt"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["new"]
+    assert not (tmp_path / TRASH_NAME).exists()
+
+
+def test_resume_and_rollback_nested_same_name_dirs(tmp_path: Path) -> None:
+    """Test that chained moves up a nested same-name tree resume and roll back from the journal."""
+    (tmp_path / "a" / "a" / "a").mkdir(parents=True)
+    (tmp_path / "a" / "a" / "a" / "f").write_text("f")
+
+    def interrupted() -> None:
+        plan = MovePlan()
+        plan.add(tmp_path / "a/a/a/f", tmp_path / "a/a/f")
+        plan.rmdir(tmp_path / "a/a/a")
+        plan.add(tmp_path / "a/a/f", tmp_path / "a/f")
+        plan.rmdir(tmp_path / "a/a")
+        plan.add(tmp_path / "late.txt", tmp_path / "a/late.txt")
+        result = run_plan(plan, tmp_path)
+        assert result is not None and not result.complete
+
+    interrupted()
+    undone = recover(tmp_path, rollback=True)
+    assert undone is not None and (undone.complete, undone.moved) == (True, 4)
+    assert (tmp_path / "a/a/a/f").read_text() == "f"
+    assert sorted(p.name for p in (tmp_path / "a").rglob("*")) == ["a", "a", "f"]
+
+    interrupted()
+    (tmp_path / "late.txt").write_text("l")
+    resumed = recover(tmp_path)
+    assert resumed is not None and resumed.complete
+    assert sorted(p.name for p in (tmp_path / "a").iterdir()) == ["f", "late.txt"]
+
+
+def test_cross_device_chain_keeps_plan_order(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a move depending on a deferred cross-device copy waits for it."""
+    monkeypatch.setattr(move_plan, "_same_device", lambda src, dst: dst.name != "b")
+    (tmp_path / "a.txt").write_text("a")
+    plan = MovePlan()
+    plan.add(tmp_path / "a.txt", tmp_path / "b" / "a.txt")
+    plan.add(tmp_path / "b" / "a.txt", tmp_path / "c" / "a.txt")
+    result = plan.execute(show_progress=False)
+    assert (result.complete, result.copied, result.moved) == (True, 1, 1)
+    assert (tmp_path / "c" / "a.txt").read_text() == "a"
+
+
+def test_path_list_is_grouped_in_chunks(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a streamed path list runs chunk by chunk without splitting a directory."""
+    monkeypatch.setattr(file_organizer, "CHUNK_OPS", 2)
+    names = ("a/x.zprj", "a/x.png", "a/y.zprj", "b/z.zprj", "b/z.png")
+    for name in names:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text(name)
+    read: list[Path] = []
+
+    def listing() -> Iterator[Path]:
+        for name in names:
+            read.append(tmp_path / name)
+            yield tmp_path / name
+
+    groups = file_organizer._stream_groups(listing())
+    assert sorted(next(groups)[1] for _ in range(2)) == ["x", "y"]
+    # 第一块在读到 b 的第一个文件时结束，之后的路径尚未读取
+    assert read == [tmp_path / n for n in names[:4]]
+    read.clear()
+    organize_paths(listing(), tmp_path)
+    assert (tmp_path / "a" / "x" / "thumbnail" / "x.png").is_file()
+    assert (tmp_path / "b" / "z" / "main_assets" / "z.zprj").is_file()
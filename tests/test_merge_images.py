@@ -0,0 +1,62 @@
+"""Test the in-process montage engine."""
+
+from pathlib import Path
+
+from PIL import Image
+
+from assetmanager.merge_images import create_thumbnail_montage
+
+
+def test_pillow_montage(tmp_path: Path) -> None:
+    """Test that big images are cropped, tiles are centered in equal cells and modes are mixed."""
+    big = Image.new("RGB", (4096, 4096), (0, 0, 255))
+    big.paste((255, 0, 0), (0, 0, 512, 512))
+    big.save(tmp_path / "big.png")
+    Image.new("RGBA", (256, 256), (0, 255, 0, 255)).save(tmp_path / "small.png")
+    Image.new("I;16", (512, 128), 65535).save(tmp_path / "depth.png")
+    Image.new("RGB", (100, 100), (255, 255, 255)).save(tmp_path / "photo.jpg")
+    paths = [tmp_path / name for name in ("big.png", "small.png", "depth.png", "photo.jpg")]
+    output = create_thumbnail_montage(paths, output_dir=str(tmp_path), workers=2)
+    with Image.open(output) as montage:
+        assert montage.size == (1024, 1024)
+        assert montage.getpixel((256, 256))[0] > 240
+        assert montage.getpixel((768, 256))[1] > 240
+        assert montage.getpixel((256, 768))[0] > 240
+        assert montage.getpixel((256, 600)) == (0, 0, 0)
+
+
+def test_paged_and_deep_zoom_layouts(tmp_path: Path) -> None:
+    """Test that pages hold whole cells and the Deep Zoom pyramid goes down to a 1x1 level."""
+    paths = []
+    for i in range(7):
+        paths.append(tmp_path / f"{i}.png")
+        Image.new("RGB", (300, 200), (i * 30, 0, 0)).save(paths[-1])
+    pages = create_thumbnail_montage(paths, output_dir=str(tmp_path), layout="pages", page_size=700)
+    sizes = []
+    for page in sorted(pages.iterdir()):
+        with Image.open(page) as img:
+            sizes.append(img.size)
+    assert sizes == [(600, 600), (300, 200)]
+
+    dzi = create_thumbnail_montage(paths, output_dir=str(tmp_path), layout="dzi")
+    assert 'Width="600" Height="800"' in dzi.read_text(encoding="utf-8")
+    files = dzi.with_name(f"{dzi.stem}_files")
+    assert sorted(p.name for p in (files / "10").iterdir()) == [
+        f"{c}_{r}.jpg" for c in range(3) for r in range(4)
+    ]
+    with Image.open(files / "10" / "2_3.jpg") as corner:
+        assert corner.size == (88, 32)
+    with Image.open(files / "0" / "0_0.jpg") as top:
+        assert top.size == (1, 1)
+
+
+def test_outputs_in_the_same_second_get_unique_names(tmp_path: Path) -> None:
+    """Test that repeated runs never reuse or collide on the timestamped output name."""
+    Image.new("RGB", (64, 64)).save(tmp_path / "a.png")
+    out = tmp_path / "out"
+    outputs = [
+        create_thumbnail_montage([tmp_path / "a.png"], output_dir=str(out), layout=layout)
+        for layout in ("pages", "pages", "dzi", "dzi", "single", "single")
+    ]
+    assert len(set(outputs)) == len(outputs)
+    assert all(p.exists() for p in outputs)
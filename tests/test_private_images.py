@@ -0,0 +1,71 @@
+"""Test the set-private-images pipeline."""
+
+import shutil
+import zipfile
+from pathlib import Path
+
+from PIL import Image
+
+from assetmanager.archive_backends import ZipBackend
+from assetmanager.dedup import HashCache
+from assetmanager.private_images import find_images, set_private_images
+from assetmanager.thumbnail_cache import ThumbnailCache
+
+
+def test_pipeline(tmp_path: Path) -> None:
+    """Test that thumbnails are made, originals archived and removed, and bad images kept."""
+    for i in range(5):
+        Image.new("RGB", (1024, 256 * (i + 1)), (i * 40, 0, 0)).save(tmp_path / f"img{i}.png")
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    images = find_images(tmp_path)
+    assert set_private_images(images, ZipBackend(), workers=2) == (5, 1)
+    for i in range(5):
+        with Image.open(tmp_path / f"img{i}" / "thumbnail" / f"img{i}.png") as thumb:
+            assert max(thumb.size) <= 512
+        assert (tmp_path / f"img{i}" / "main_assets" / f"img{i}.priv").is_file()
+        assert not (tmp_path / f"img{i}.png").exists()
+    assert (tmp_path / "broken.jpg").exists()
+
+
+def test_same_stem_images_share_archive(tmp_path: Path) -> None:
+    """Test that images with the same stem are archived one after another into one .priv."""
+    Image.new("RGB", (3000, 3000), (200, 0, 0)).save(tmp_path / "rock.bmp")
+    Image.new("RGB", (3000, 3000), (0, 200, 0)).save(tmp_path / "rock.tif")
+    assert set_private_images(find_images(tmp_path), ZipBackend(), workers=2, io_workers=2) == (2, 0)
+    with zipfile.ZipFile(tmp_path / "rock" / "main_assets" / "rock.priv") as zf:
+        assert sorted(zf.namelist()) == ["rock.bmp", "rock.tif"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["rock"]
+
+
+def test_thumbnail_cache(tmp_path: Path) -> None:
+    """Test that a rerun on the same content hits the cache and the cache stays under its cap."""
+    library = tmp_path / "library"
+    library.mkdir()
+    for i in range(3):
+        Image.new("RGB", (800, 600), (i * 80, 0, 0)).save(tmp_path / f"img{i}.png")
+    cache = ThumbnailCache(tmp_path / "cache", hashes=HashCache(tmp_path / "hashes.sqlite"))
+    for run in range(2):
+        for i in range(3):
+            shutil.copy(tmp_path / f"img{i}.png", library / f"run{run}_{i}.png")
+        assert set_private_images(find_images(library), ZipBackend(), workers=1, cache=cache) == (3, 0)
+    assert (cache.hits, cache.misses) == (3, 3)
+    with Image.open(library / "run1_2" / "thumbnail" / "run1_2.png") as thumb:
+        assert thumb.size == (512, 384)
+    entry = next((tmp_path / "cache").glob("*/*"))
+    cache.max_bytes = entry.stat().st_size
+    cache.put("0" * 64, entry)
+    assert len(list((tmp_path / "cache").glob("*/*"))) == 1
+    cache.close()
+
+
+class _BrokenBackend(ZipBackend):
+    def update(self, *args: object, **kwargs: object) -> None:
+        raise RuntimeError("database is locked")
+
+
+def test_unexpected_archive_error_does_not_hang(tmp_path: Path) -> None:
+    """Test that an unexpected exception while archiving counts as a failure."""
+    for i in range(3):
+        Image.new("RGB", (64, 64)).save(tmp_path / f"img{i}.png")
+    assert set_private_images(find_images(tmp_path), _BrokenBackend(), workers=1) == (0, 3)
+    assert len(list(tmp_path.glob("*.png"))) == 3
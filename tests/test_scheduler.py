@@ -0,0 +1,74 @@
+"""Test the shared job scheduler."""
+
+import threading
+import time
+
+import pytest
+
+from assetmanager.scheduler import CPU, IO, Job, JobScheduler, parse_size
+
+
+def test_largest_jobs_run_first() -> None:
+    """Test that pending jobs are taken in descending size order."""
+    scheduler = JobScheduler(jobs=1, report=False)
+    for size in (1, 5, 3):
+        scheduler.submit(Job(str(size), size, lambda s=size: s, CPU))
+    assert [job.result for job in scheduler.run()] == [5, 3, 1]
+
+
+def test_io_limit_per_device() -> None:
+    """Test that bytes in flight per device stay under the limit."""
+    active = {0: 0, 1: 0}
+    peak = {0: 0, 1: 0}
+    lock = threading.Lock()
+
+    def work(device: int) -> None:
+        with lock:
+            active[device] += 1
+            peak[device] = max(peak[device], active[device])
+        time.sleep(0.02)
+        with lock:
+            active[device] -= 1
+
+    scheduler = JobScheduler(jobs=4, io_limit=15, report=False)
+    for i in range(6):
+        scheduler.submit(Job(str(i), 10, lambda d=i % 2: work(d), IO, device=i % 2))
+    scheduler.run()
+    assert peak == {0: 1, 1: 1}
+    assert parse_size("2G") == 2 * 1024**3
+
+
+def test_slots_limit_concurrent_threads() -> None:
+    """Test that multi-slot jobs share the slot limit and oversized jobs run alone."""
+    active = 0
+    peaks = []
+    lock = threading.Lock()
+
+    def work(slots: int) -> None:
+        nonlocal active
+        with lock:
+            active += slots
+            peaks.append(active)
+        time.sleep(0.02)
+        with lock:
+            active -= slots
+
+    scheduler = JobScheduler(jobs=4, report=False)
+    for i, slots in enumerate((6, 3, 2, 1, 1)):
+        scheduler.submit(Job(str(i), 10 - i, lambda s=slots: work(s), CPU, slots=slots))
+    assert all(job.error is None for job in scheduler.run())
+    assert peaks[0] == 6
+    assert max(peaks[1:]) == 4
+
+
+def test_failed_job_reports_error(capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that the per-job report line includes the exception."""
+
+    def fail() -> None:
+        raise OSError("disk full")
+
+    scheduler = JobScheduler(jobs=1)
+    scheduler.submit(Job("a.zip", 1024, fail))
+    [job] = scheduler.run()
+    assert isinstance(job.error, OSError)
+    assert "OSError: disk full" in capsys.readouterr().out
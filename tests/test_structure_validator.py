@@ -0,0 +1,90 @@
+"""Test the directory snapshot and structure validator."""
+
+from pathlib import Path
+
+from assetmanager.structure_validator import (
+    delete_empty_dirs,
+    delete_useless_files_and_dirs,
+    fix_duplicate_named_dirs,
+    group_findings,
+    merge_directories,
+    validate_structure,
+)
+from assetmanager.move_plan import MovePlan, run_plan
+from assetmanager.tree_snapshot import TreeSnapshot
+
+
+def _make_asset(folder: Path, main: str = "asset.zprj", thumb: str = "asset.png") -> None:
+    (folder / "main_assets").mkdir(parents=True)
+    (folder / "thumbnail").mkdir()
+    (folder / "main_assets" / main).write_bytes(b"main")
+    (folder / "thumbnail" / thumb).write_bytes(b"thumb")
+
+
+def test_validate_structure(tmp_path: Path) -> None:
+    """Test that problems are reported per category."""
+    _make_asset(tmp_path / "good")
+    _make_asset(tmp_path / "extra")
+    (tmp_path / "extra" / "stray.txt").write_text("x")
+    (tmp_path / "leaf").mkdir()
+    report = group_findings(validate_structure(tmp_path))
+    assert report["container_has_extra_files"] == [tmp_path / "extra"]
+    assert report["leaf_missing_special"] == [tmp_path / "leaf"]
+    assert report["main_assets_multiple_files"] == []
+
+
+def test_arrange_steps_share_snapshot(tmp_path: Path) -> None:
+    """Test that cleanup steps keep the snapshot in sync with the disk."""
+    _make_asset(tmp_path / "rock" / "rock")
+    (tmp_path / "rock" / "__MACOSX").mkdir()
+    (tmp_path / "rock" / ".DS_Store").write_text("x")
+    (tmp_path / "empty" / "nested").mkdir(parents=True)
+    snapshot = TreeSnapshot(tmp_path)
+    delete_useless_files_and_dirs(tmp_path, snapshot)
+    fix_duplicate_named_dirs(tmp_path, snapshot)
+    delete_empty_dirs(tmp_path, snapshot)
+    assert (tmp_path / "rock" / "main_assets" / "asset.zprj").is_file()
+    assert not (tmp_path / "rock" / "rock").exists()
+    assert not (tmp_path / "empty").exists()
+    fresh = TreeSnapshot(tmp_path)
+    assert [n.path for n in snapshot.walk()] == [n.path for n in fresh.walk()]
+
+
+def test_planned_merge_of_nested_same_name_dirs(tmp_path: Path) -> None:
+    """Test that a planned merge compares files that are still at their original location."""
+    (tmp_path / "B" / "B" / "B").mkdir(parents=True)
+    (tmp_path / "B" / "f.txt").write_text("outer")
+    (tmp_path / "B" / "B" / "B" / "f.txt").write_text("inner")
+    (tmp_path / "B" / "g.txt").write_text("same")
+    (tmp_path / "B" / "B" / "B" / "g.txt").write_text("same")
+    plan = MovePlan()
+    fix_duplicate_named_dirs(tmp_path, TreeSnapshot(tmp_path), plan)
+    assert plan.origin(tmp_path / "B" / "B" / "f.txt") == tmp_path / "B" / "B" / "B" / "f.txt"
+    assert run_plan(plan, tmp_path, dry_run=True) is None
+    result = run_plan(plan, tmp_path)
+    assert result is not None and result.complete
+    assert (tmp_path / "B" / "f.txt").read_text() == "outer"
+    assert (tmp_path / "B" / "f_1.txt").read_text() == "inner"
+    assert sorted(p.name for p in (tmp_path / "B").iterdir()) == ["f.txt", "f_1.txt", "g.txt"]
+
+
+def test_merge_on_case_insensitive_volume(tmp_path: Path) -> None:
+    """Test that destination checks ignore case when the volume does."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "dst").mkdir()
+    (tmp_path / "src" / "Readme.TXT").write_text("new")
+    (tmp_path / "dst" / "README.txt").write_text("old")
+    snapshot = TreeSnapshot(tmp_path, case_sensitive=False)
+    assert snapshot.get(tmp_path / "DST" / "readme.txt") is not None
+    plan = MovePlan()
+    merge_directories(tmp_path / "src", tmp_path / "dst", snapshot, plan)
+    assert [op.dst for op in plan.ops if op.dst is not None] == [tmp_path / "dst" / "Readme_1.TXT"]
+
+
+def test_validate_structure_parallel_is_deterministic(tmp_path: Path) -> None:
+    """Test that the report does not depend on the worker count."""
+    for i in range(20):
+        _make_asset(tmp_path / f"group{i % 3}" / f"asset{i}")
+        (tmp_path / f"group{i % 3}" / f"asset{i}" / "thumbnail" / "extra.png").write_text("x")
+    (tmp_path / "group1" / "stray.txt").write_text("x")
+    assert list(validate_structure(tmp_path, workers=8)) == list(validate_structure(tmp_path))
@@ -0,0 +1,24 @@
+"""Test the shared thumbnail loader."""
+
+from pathlib import Path
+
+from PIL import Image
+
+from assetmanager.thumbnails import load_thumbnail, save_thumbnail
+
+
+def test_reduced_decoding(tmp_path: Path) -> None:
+    """Test that JPEG, 16-bit and palette images all come out 8-bit and within the box."""
+    Image.new("RGB", (4000, 3000), (200, 10, 10)).save(tmp_path / "big.jpg", quality=90)
+    Image.new("I;16", (2048, 1024), 40000).save(tmp_path / "depth.png")
+    Image.new("P", (300, 600)).save(tmp_path / "small.gif")
+    with Image.open(tmp_path / "big.jpg") as img:
+        img.draft(None, (512, 384))
+        assert img.size == (1000, 750)
+    thumb = load_thumbnail(tmp_path / "big.jpg")
+    assert thumb.size == (512, 384)
+    assert thumb.getpixel((0, 0))[0] > 180
+    depth = load_thumbnail(tmp_path / "depth.png")
+    assert (depth.mode, depth.size) == ("L", (512, 256))
+    assert depth.getpixel((0, 0)) == 40000 // 256
+    assert save_thumbnail(tmp_path / "small.gif", tmp_path / "small.png") == (256, 512)
@@ -0,0 +1,33 @@
+"""Test the incremental tree index."""
+
+from pathlib import Path
+
+import pytest
+
+from assetmanager import tree_index
+from assetmanager.structure_validator import group_findings, validate_structure
+from assetmanager.tree_index import TreeIndex
+
+
+def test_incremental_validate(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that unchanged directories are reused and changed ones are rescanned."""
+    monkeypatch.setattr(tree_index, "MTIME_SETTLE_NS", 0)
+    root = tmp_path / "library"
+    for name in ("a", "b"):
+        (root / name / "main_assets").mkdir(parents=True)
+        (root / name / "thumbnail").mkdir()
+        (root / name / "main_assets" / "x.zprj").write_text("x")
+    db_path = tmp_path / "index.sqlite"
+
+    index = TreeIndex(root, db_path)
+    assert list(index.validate()) == list(validate_structure(root))
+    assert index.rescanned == 7
+    index.close()
+
+    (root / "b" / "thumbnail").rmdir()
+    index = TreeIndex(root, db_path)
+    report = group_findings(index.validate())
+    index.close()
+    assert report == group_findings(validate_structure(root))
+    assert report["incorrect_special_structure"] == [root / "b"]
+    assert index.rescanned == 1